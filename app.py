@@ -1,11 +1,13 @@
 from app import create_app
 from app.models import db
+from app.utils.autocomplete import get_index
 
 app = create_app('DevelopmentConfig')
 
 with app.app_context():
     # db.drop_all()
     db.create_all()
+    get_index() # Build the part description autocomplete index at worker start
 
 app.run()
     
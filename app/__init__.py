@@ -1,6 +1,12 @@
-from flask import Flask
+from flask import Flask, jsonify
 from app.models import db
 from app.extensions import ma, limiter, cache
+from app.utils.compiled_schema import compile_all
+from app.utils.stock import reconcile_stock_command
+from app.utils.search import rebuild_search_index_command
+from app.utils.workload import rebuild_workload_command
+from app.utils.schema import upgrade_db_command
+from app.utils.passwords import PasswordHasherBusy
 from app.blueprints.customers import customers_bp
 from app.blueprints.mechanics import mechanics_bp
 from app.blueprints.service_tickets import service_tickets_bp
@@ -34,5 +40,17 @@ def create_app(config_name):
     app.register_blueprint(part_descriptions_bp, url_prefix='/part_descriptions')
     app.register_blueprint(serialized_parts_bp, url_prefix='/serialized_parts')
     app.register_blueprint(swagger_bp, url_prefix=SWAGGER_URL)
+    app.cli.add_command(reconcile_stock_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_workload_command)
+    app.cli.add_command(upgrade_db_command)
+    compile_all()
+
+    # Password hashing pool and its queue are full: shed the request instead of queueing it.
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(err):
+        response = jsonify({"status": "error", "message": "Too many sign-in requests, please try again shortly."})
+        response.headers["Retry-After"] = "1"
+        return response, 503
     
     return app
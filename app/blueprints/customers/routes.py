@@ -1,13 +1,18 @@
 from flask import request, jsonify
+from datetime import date
 from app.blueprints.customers import customers_bp
-from app.blueprints.customers.schemas import customer_schema, customers_schema, login_schema, my_tickets_schema
+from app.blueprints.customers.schemas import customer_schema, customers_schema, login_schema
+from app.blueprints.service_tickets.schemas import service_ticket_relationship_loaders, compiled_customer_tickets_schema
 from marshmallow import ValidationError
-from app.models import Customer, db
+from app.models import Customer, ServiceTicket, db
 from sqlalchemy import select, delete
 from app.extensions import limiter
 from app.extensions import cache
+from app.utils.pagination import MAX_PER_PAGE, is_keyset_request, keyset_args, keyset_paginate
+from app.utils.conditional import make_etag, is_not_modified, not_modified, with_etag, is_conditional_request
+from app.utils.tagged_cache import list_etag
 from app.utils.util import encode_token, token_required
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.passwords import hash_password, verify_password
 
 # -------------------- Login Route --------------------
 # This route allows customers to log in using their email and password.
@@ -23,7 +28,7 @@ def login():
     query = select(Customer).where(Customer.email == email)
     customer = db.session.execute(query).scalars().first()
 
-    if customer and check_password_hash(customer.password, password):
+    if customer and verify_password(customer.password, password):
         token = encode_token(customer.id, role="user")
         response = {
             "status": "success",
@@ -45,7 +50,7 @@ def create_customer():
         email_exist = db.session.execute(select(Customer).where(Customer.email == customer_data['email'])).scalar_one_or_none()
         if email_exist:
             return jsonify({"status":"error","message": "A customer with this email already exists!"}), 400
-        customer_data['password'] = generate_password_hash(customer_data['password'])
+        customer_data['password'] = hash_password(customer_data['password'])
     except ValidationError as err:
         return jsonify(err.messages), 400
     
@@ -58,8 +63,9 @@ def create_customer():
 # This route retrieves all customers.
 # Cached for 30 seconds to improve performance.
 # Rate limited to 10 requests per hour to prevent abuse.
+# Pass `cursor` (or `after_id`) to seek on the primary key instead of OFFSET; cursor pages carry no ETag.
 @customers_bp.route("/",methods=['GET'])
-@cache.cached(timeout=30)
+@cache.cached(timeout=30, query_string=True, unless=is_conditional_request)
 @limiter.limit("10/hour")
 def get_customers():
     page = request.args.get('page', 1, type=int)
@@ -67,14 +73,27 @@ def get_customers():
     if page < 1 or per_page < 1:
         return jsonify({"status": "error", "message": "Page and per_page must be greater than 0."}), 400
     query = select(Customer)
+    if is_keyset_request():
+        try:
+            customers, next_cursor = keyset_paginate(query, [Customer.id], per_page, **keyset_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({
+            "customers": customers_schema.dump(customers),
+            "per_page": min(per_page, MAX_PER_PAGE),
+            "next_cursor": next_cursor
+        }), 200
+    etag = list_etag(Customer)
+    if is_not_modified(etag):
+        return not_modified(etag)
     pagination = db.paginate(query, page=page, per_page=per_page)
-    return jsonify({
+    return with_etag(jsonify({
         "customers": customers_schema.dump(pagination.items),
         "total": pagination.total,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages
-    }), 200
+    }), etag), 200
 
 # -------------------- Get a Specific Customer --------------------
 # This route retrieves a specific customer by their ID.
@@ -87,7 +106,10 @@ def get_customer(customer_id):
     customer = db.session.execute(query).scalars().first()
     if customer == None:
         return jsonify({"status":"error","message":"Invalid customer"}), 404
-    return customer_schema.jsonify(customer), 200
+    etag = make_etag(request.full_path, customer.updated_at)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return with_etag(customer_schema.jsonify(customer), etag), 200
 
 # -------------------- Update a Customer --------------------
 # This route allows updating a customer's details by their ID.
@@ -103,13 +125,14 @@ def update_customer():
         return jsonify({"status":"error","message":"Invalid customer"}), 404
     try:
         customer_data = customer_schema.load(request.json)
-        customer_data['password'] = generate_password_hash(customer_data['password'])
     except ValidationError as err:
         return jsonify(err.messages), 400
     if customer_data['email'] != customer.email:
         email_exist = db.session.execute(select(Customer).where(Customer.email == customer_data['email'])).scalar_one_or_none()
         if email_exist:
             return jsonify({"status":"error", "message": "A customer with this email already exists"}), 400
+    # Hash only once the cheap checks have passed: one KDF run per update.
+    customer_data['password'] = hash_password(customer_data['password'])
     for field, value in customer_data.items():
         setattr(customer, field, value)
     db.session.commit()
@@ -132,18 +155,51 @@ def delete_customer():
     return jsonify({"status":"success","message": f"Succesfully deleted customer {request.userid}"}), 200
 
 # -------------------- Get a Customer's Tickets --------------------
-# This route retrieves all service tickets for a specific customer by their ID.
+# This route retrieves the logged in customer's service tickets.
+# Without `per_page`, `cursor` or `after_id` every ticket is returned, as before.
+# With any of them the tickets are cursor paginated, most recent first: pass
+# `next_cursor` back as `cursor` for the next page.
+# `start_date` / `end_date` (inclusive, YYYY-MM-DD) filter on the service date.
+# Mechanics and items are eager loaded in batches.
 @customers_bp.route("/my-tickets", methods=['GET'])
 @limiter.exempt
 @token_required
 def get_customer_tickets():
-    query = select(Customer).where(Customer.id == request.userid)
-    customer = db.session.execute(query).scalars().first()
+    paginated = 'per_page' in request.args or is_keyset_request()
+    per_page = request.args.get('per_page', 10, type=int)
+    try:
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+    customer = db.session.get(Customer, request.userid)
     if customer is None:
         return jsonify({"status":"error","message":"Invalid customer"}), 404
-    
-    data = my_tickets_schema.dump(customer)
+
+    query = (
+        select(ServiceTicket)
+        .where(ServiceTicket.customer_id == customer.id)
+        .options(service_ticket_relationship_loaders["mechanics"], service_ticket_relationship_loaders["ticket_items"])
+    )
+    if start_date:
+        query = query.where(ServiceTicket.service_date >= start_date)
+    if end_date:
+        query = query.where(ServiceTicket.service_date <= end_date)
+    if paginated:
+        try:
+            tickets, next_cursor = keyset_paginate(query, [ServiceTicket.service_date, ServiceTicket.id], per_page, **keyset_args(), descending=True)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    else:
+        tickets = db.session.execute(query.order_by(ServiceTicket.id)).scalars().all()
+
+    # Same shape as MyTicketsSchema, but the tickets are dumped on their own
+    # so the customer's loaded collection is never replaced by a page.
+    data = {"id": customer.id, "service_tickets": compiled_customer_tickets_schema.dump(tickets)}
     data["customer"] = customer_schema.dump(customer)
+    if paginated:
+        data["per_page"] = min(per_page, MAX_PER_PAGE)
+        data["next_cursor"] = next_cursor
     return jsonify(data), 200
 
 
@@ -5,6 +5,7 @@ class CustomerSchema(ma.SQLAlchemyAutoSchema):
     password = fields.String(load_only=True, required=True)
     class Meta:
         model = Customer
+        exclude = ("updated_at",)
 
 class MyTicketsSchema(ma.SQLAlchemyAutoSchema):
     service_tickets = fields.Nested("ServiceTicketSchema", many=True, exclude=["customer"])
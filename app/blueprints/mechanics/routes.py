@@ -1,12 +1,71 @@
-from flask import request, jsonify
+from flask import request, jsonify, url_for
+from datetime import date
 from app.blueprints.mechanics import mechanics_bp
-from app.blueprints.mechanics.schemas import mechanic_schema, mechanics_schema, mechanic_schema_with_tickets, mechanics_schema_with_tickets, login_schema
+from app.blueprints.mechanics.schemas import mechanic_schema, mechanics_schema, login_schema, compiled_mechanics_schema
+from app.blueprints.service_tickets.schemas import sparse_service_ticket_schema, service_ticket_columns
 from marshmallow import ValidationError
-from app.models import Mechanic, db
-from sqlalchemy import select, delete
+from app.models import Mechanic, MechanicWorkload, ServiceTicket, service_mechanic, db
+from sqlalchemy import select, delete, func
 from app.extensions import cache, limiter
+from app.utils.pagination import MAX_PER_PAGE, is_keyset_request, keyset_args, keyset_paginate
+from app.utils.tagged_cache import cached_by_tags, entity_tags, list_etag
+from app.utils.workload import mechanic_workload
+from app.utils.conditional import make_etag, latest_update, row_versions, is_not_modified, not_modified, with_etag, is_conditional_request
 from app.utils.util import encode_token, mechanic_required
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.passwords import hash_password, verify_password
+
+MAX_POPULAR_MECHANICS = 100
+RECENT_TICKETS = 10
+MAX_RECENT_TICKETS = 100
+
+# -------------------- Recent Tickets Helper --------------------
+# Mechanic reads embed only each mechanic's `limit` most recent tickets: one
+# ROW_NUMBER() per mechanic over service_mechanic picks them for the whole
+# page, and a GROUP BY counts the rest. The full history is paginated at
+# /mechanics/<id>/tickets, so the response stays the same size with tenure.
+def recent_ticket_limit():
+    limit = request.args.get('recent_tickets', RECENT_TICKETS, type=int)
+    if not 0 <= limit <= MAX_RECENT_TICKETS:
+        raise ValueError(f"recent_tickets must be between 0 and {MAX_RECENT_TICKETS}.")
+    return limit
+
+def dump_with_recent_tickets(mechanics, limit):
+    ids = [mechanic.id for mechanic in mechanics]
+    recent = {mechanic_id: [] for mechanic_id in ids}
+    counts = {}
+    if ids:
+        assigned = service_mechanic.c
+        if limit:
+            position = func.row_number().over(
+                partition_by=assigned.mechanic_id,
+                order_by=(ServiceTicket.service_date.desc(), ServiceTicket.id.desc())
+            ).label("position")
+            ranked = (
+                select(assigned.mechanic_id, assigned.ticket_id, position)
+                .join(ServiceTicket, ServiceTicket.id == assigned.ticket_id)
+                .where(assigned.mechanic_id.in_(ids))
+                .subquery()
+            )
+            query = (
+                select(ranked.c.mechanic_id, ServiceTicket)
+                .join(ranked, ranked.c.ticket_id == ServiceTicket.id)
+                .where(ranked.c.position <= limit)
+                .order_by(ranked.c.mechanic_id, ranked.c.position)
+            )
+            for mechanic_id, ticket in db.session.execute(query):
+                recent[mechanic_id].append(ticket)
+        counts = dict(db.session.execute(
+            select(assigned.mechanic_id, func.count()).where(assigned.mechanic_id.in_(ids)).group_by(assigned.mechanic_id)
+        ).all())
+    # The windowed tickets are dumped on their own and attached to each
+    # mechanic's output; the mechanics' loaded collections are left alone.
+    tickets_schema = sparse_service_ticket_schema(service_ticket_columns, many=True)
+    data = compiled_mechanics_schema.dump(mechanics)
+    for item in data:
+        item["service_tickets"] = tickets_schema.dump(recent[item["id"]])
+        item["ticket_count"] = counts.get(item["id"], 0)
+        item["tickets_url"] = url_for("mechanics_bp.get_mechanic_tickets", id=item["id"])
+    return data
 
 # -------------------- Login Route --------------------
 # This route allows mechanic to log in using their email and password.
@@ -22,7 +81,7 @@ def login():
     query = select(Mechanic).where(Mechanic.email == email)
     mechanic = db.session.execute(query).scalars().first()
 
-    if mechanic and check_password_hash(mechanic.password, password):
+    if mechanic and verify_password(mechanic.password, password):
         token = encode_token(mechanic.id, role="mechanic")
         return jsonify({"status": "success", "message": "Successfully logged in.", "token": token}), 200
     else:
@@ -39,7 +98,7 @@ def create_mechanic():
         email_exist = db.session.execute(select(Mechanic).where(Mechanic.email == mechanic_data['email'])).scalars().first()
         if email_exist:
             return jsonify({"status":"error", "message": "A mechanic with this email already exists!"}), 400
-        mechanic_data['password'] = generate_password_hash(mechanic_data['password'])
+        mechanic_data['password'] = hash_password(mechanic_data['password'])
     except ValidationError as err:
         return jsonify(err.messages), 400
     
@@ -52,37 +111,104 @@ def create_mechanic():
 # This route retrieves all mechanics.
 # Cached for 60 seconds to improve performance.
 # Pagination is implemented to limit the number of mechanics returned in a single request.
+# Pass `cursor` (or `after_id`) to seek on the primary key instead of OFFSET; cursor pages carry no ETag.
 @mechanics_bp.route("/",methods=['GET'])
-@cache.cached(timeout=60)
+@cache.cached(timeout=60, query_string=True, unless=is_conditional_request)
 @limiter.exempt
 def get_mechanics():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     if page < 1 or per_page < 1:
         return jsonify({"status": "error", "message": "Page and per_page must be greater than 0."}), 400
+    try:
+        recent_limit = recent_ticket_limit()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     
     query = select(Mechanic)
+    if is_keyset_request():
+        try:
+            mechanics, next_cursor = keyset_paginate(query, [Mechanic.id], per_page, **keyset_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({
+            "mechanics": dump_with_recent_tickets(mechanics, recent_limit),
+            "per_page": min(per_page, MAX_PER_PAGE),
+            "next_cursor": next_cursor
+        }), 200
+    etag = list_etag(Mechanic, ServiceTicket, service_mechanic)
+    if is_not_modified(etag):
+        return not_modified(etag)
     pagination = db.paginate(query, page=page, per_page=per_page)
-    return jsonify({
-        "mechanics": mechanics_schema_with_tickets.dump(pagination.items),
+    return with_etag(jsonify({
+        "mechanics": dump_with_recent_tickets(pagination.items, recent_limit),
         "total": pagination.total,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages
-    }), 200
+    }), etag), 200
+
+# -------------------- Mechanic Version Helper --------------------
+# The mechanic's own updated_at plus the newest updated_at and the count of its
+# tickets (the count moves when a ticket is unassigned or deleted), read through
+# service_mechanic in one round trip.
+def mechanic_versions(mechanic_id):
+    return row_versions(
+        latest_update(Mechanic, Mechanic.id == mechanic_id),
+        latest_update(ServiceTicket, service_mechanic.c.mechanic_id == mechanic_id, join=(service_mechanic, service_mechanic.c.ticket_id == ServiceTicket.id)),
+        select(func.count()).select_from(service_mechanic).where(service_mechanic.c.mechanic_id == mechanic_id).scalar_subquery()
+    )
 
 # -------------------- Get a Specific Mechanic --------------------
-# This route retrieves a specific mechanic by their ID.
+# This route retrieves a specific mechanic by their ID with their most recent tickets.
 # Cached for 30 seconds to reduce database lookups.
 @mechanics_bp.route("/<int:id>",methods=['GET'])
 @limiter.exempt
-@cache.cached(timeout=30)
+@cache.cached(timeout=30, query_string=True, unless=is_conditional_request)
 def get_mechanic(id):
-    query = select(Mechanic).where(Mechanic.id == id)
-    mechanic = db.session.execute(query).scalars().first()
-    if mechanic == None:
+    try:
+        recent_limit = recent_ticket_limit()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    versions = mechanic_versions(id)
+    if versions[0] is None:
         return jsonify({"status": "error", "message":"Invalid mechanic"}), 404
-    return mechanic_schema_with_tickets.jsonify(mechanic), 200
+    etag = make_etag(request.full_path, *versions)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    mechanic = db.session.get(Mechanic, id)
+    return with_etag(jsonify(dump_with_recent_tickets([mechanic], recent_limit)[0]), etag), 200
+
+# -------------------- Get a Mechanic's Tickets --------------------
+# This route pages through every ticket of a mechanic, most recent first.
+# Pagination is implemented to limit the number of tickets returned in a single request.
+@mechanics_bp.route("/<int:id>/tickets", methods=['GET'])
+@limiter.exempt
+def get_mechanic_tickets(id):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    if page < 1 or per_page < 1:
+        return jsonify({"status": "error", "message": "Page and per_page must be greater than 0."}), 400
+    versions = mechanic_versions(id)
+    if versions[0] is None:
+        return jsonify({"status": "error", "message":"Invalid mechanic"}), 404
+    etag = make_etag(request.full_path, *versions)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    query = (
+        select(ServiceTicket)
+        .join(service_mechanic, service_mechanic.c.ticket_id == ServiceTicket.id)
+        .where(service_mechanic.c.mechanic_id == id)
+        .order_by(ServiceTicket.service_date.desc(), ServiceTicket.id.desc())
+    )
+    pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
+    return with_etag(jsonify({
+        "tickets": sparse_service_ticket_schema(service_ticket_columns, many=True).dump(pagination.items),
+        "total": pagination.total,
+        "page": pagination.page,
+        "per_page": pagination.per_page,
+        "pages": pagination.pages
+    }), etag), 200
 
 # -------------------- Update a Mechanic --------------------
 # This route allows updating a mechanic's details by their ID.
@@ -100,13 +226,14 @@ def update_mechanic():
         return jsonify({"status": "error", "message":"Invalid mechanic"}), 404
     try:
         mechanic_data = mechanic_schema.load(request.json) 
-        mechanic_data['password'] = generate_password_hash(mechanic_data['password'])  
     except ValidationError as err:
         return jsonify(err.messages), 400
     if mechanic_data['email'] != mechanic.email:
         email_exist = db.session.execute(select(Mechanic).where(Mechanic.email == mechanic_data['email'])).scalar_one_or_none()
         if email_exist:
             return jsonify({"status": "error", "message": "A mechanic with this email already exists"}), 400
+    # Hash only once the cheap checks have passed: one KDF run per update.
+    mechanic_data['password'] = hash_password(mechanic_data['password'])
     for field, value in mechanic_data.items():
         setattr(mechanic, field, value)
     db.session.commit()
@@ -132,24 +259,73 @@ def delete_mechanic():
     return jsonify({"status": "success", "message": f"Succesfully deleted mechanic {request.userid}"}), 200
 
 # -------------------- Get Popular Mechanics --------------------
-# This route retrieves the mechanics based on the number of service tickets they have handled.
-# Cached for 60 seconds to improve performance.
+# This route retrieves the top `limit` mechanics by the number of service tickets they have handled,
+# optionally only counting tickets serviced between `start_date` and `end_date`.
+# Counting is one GROUP BY over service_mechanic, outer-joined to every mechanic (idle ones count 0).
+# Cached for 60 seconds; mechanic, ticket and assignment writes invalidate it.
 @mechanics_bp.route("/popular", methods=['GET'])
-@cache.cached(timeout=60)
+@cached_by_tags(timeout=60, tags=lambda: entity_tags(Mechanic) + entity_tags(ServiceTicket) + [service_mechanic.name])
 def popular_mechanics():
-    query = select(Mechanic)
-    mechanics = db.session.execute(query).scalars().all()
-    mechanics.sort(key=lambda mechanic: len(mechanic.service_tickets), reverse=True)
-    
-    # Build response with tickets_count
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= MAX_POPULAR_MECHANICS:
+        return jsonify({"status": "error", "message": f"limit must be between 1 and {MAX_POPULAR_MECHANICS}."}), 400
+    try:
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+
+    counts = select(service_mechanic.c.mechanic_id, func.count().label("ticket_counts")).group_by(service_mechanic.c.mechanic_id)
+    if start_date or end_date:
+        counts = counts.join(ServiceTicket, ServiceTicket.id == service_mechanic.c.ticket_id)
+        if start_date:
+            counts = counts.where(ServiceTicket.service_date >= start_date)
+        if end_date:
+            counts = counts.where(ServiceTicket.service_date <= end_date)
+    counts = counts.subquery()
+    # Outer join so mechanics without tickets still rank (with 0), ties by id.
+    ticket_counts = func.coalesce(counts.c.ticket_counts, 0)
+    query = (
+        select(Mechanic, ticket_counts)
+        .outerjoin(counts, counts.c.mechanic_id == Mechanic.id)
+        .order_by(ticket_counts.desc(), Mechanic.id)
+        .limit(limit)
+    )
+
     response = []
-    for mechanic in mechanics:
-        data = mechanic_schema_with_tickets.dump(mechanic)
-        data["ticket_counts"] = len(mechanic.service_tickets) if mechanic.service_tickets else 0
+    for mechanic, count in db.session.execute(query):
+        data = mechanic_schema.dump(mechanic)
+        data["ticket_counts"] = count
         response.append(data)
     return jsonify(response), 200
 
 
+# -------------------- Get Mechanic Workload --------------------
+# This route returns each mechanic's ticket count for today, this week and the last 30 days,
+# plus any `start_date`..`end_date` window, as of `as_of` (default today).
+# Counts come from the per-day workload rollups, so the cost follows the number of days, not tickets.
+# Cached for 60 seconds; mechanic, ticket and assignment writes invalidate it.
+@mechanics_bp.route("/workload", methods=['GET'])
+@cached_by_tags(timeout=60, tags=lambda: entity_tags(Mechanic) + entity_tags(ServiceTicket) + entity_tags(MechanicWorkload) + [service_mechanic.name])
+@limiter.exempt
+def get_mechanic_workload():
+    try:
+        as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else date.today()
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+    if (start_date is None) != (end_date is None) or (start_date and start_date > end_date):
+        return jsonify({"status": "error", "message": "start_date and end_date must be given together, with start_date first."}), 400
+    mechanic_id = request.args.get('mechanic_id', type=int)
+    return jsonify({
+        "as_of": as_of.isoformat(),
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+        "mechanics": mechanic_workload(as_of, start_date, end_date, mechanic_id)
+    }), 200
+
+
 # -------------------- Search Mechanics --------------------
 # This route allows searching for mechanics by their name.
 # Cached for 30 seconds to improve performance.
@@ -172,5 +348,9 @@ def search_mechanics():
     if filters:
         query = query.where(*filters)
 
+    try:
+        recent_limit = recent_ticket_limit()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     mechanics = db.session.execute(query).scalars().all()
-    return mechanics_schema_with_tickets.jsonify(mechanics), 200
\ No newline at end of file
+    return jsonify(dump_with_recent_tickets(mechanics, recent_limit)), 200
\ No newline at end of file
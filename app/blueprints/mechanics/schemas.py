@@ -1,15 +1,20 @@
 from app.models import Mechanic
 from app.extensions import ma
 from marshmallow import fields
+from app.utils.compiled_schema import CompiledSchema
 
 class MechanicSchema(ma.SQLAlchemyAutoSchema):
     service_tickets = fields.Nested("ServiceTicketSchema", many=True, exclude=["mechanics","ticket_items","customer"]) 
     password = fields.String(load_only=True, required=True)
     class Meta:
         model = Mechanic
+        exclude = ("updated_at",)
      
 mechanic_schema = MechanicSchema(exclude=["service_tickets"])
 mechanics_schema = MechanicSchema(many=True, exclude=["service_tickets"]) 
 mechanic_schema_with_tickets =  MechanicSchema()
 mechanics_schema_with_tickets =  MechanicSchema(many=True)
-login_schema = MechanicSchema(exclude=["name","phone","salary"])
\ No newline at end of file
+login_schema = MechanicSchema(exclude=["name","phone","salary"])
+compiled_mechanic_schema_with_tickets = CompiledSchema(mechanic_schema_with_tickets)
+compiled_mechanics_schema_with_tickets = CompiledSchema(mechanics_schema_with_tickets)
+compiled_mechanics_schema = CompiledSchema(mechanics_schema)
\ No newline at end of file
@@ -5,8 +5,16 @@ from marshmallow import ValidationError
 from app.models import PartDescription, db
 from sqlalchemy import select, delete
 from app.extensions import cache, limiter
+from app.utils.tagged_cache import cached_by_tags, entity_tags, list_etag
+from app.utils.search import ranked_part_descriptions
+from app.utils.autocomplete import get_index
+from app.utils.pagination import MAX_PER_PAGE, is_keyset_request, keyset_args, keyset_paginate
+from app.utils.conditional import make_etag, is_not_modified, not_modified, with_etag
 # from app.utils.util import token_required
 
+SEARCH_RESULTS = 50
+MAX_AUTOCOMPLETE_RESULTS = 50
+
 # -------------------- Create a Part Description --------------------
 # This route allows the creation of a new part description.
 # Rate limited to 10 requests per hour to prevent spamming.
@@ -27,6 +35,7 @@ def create_part_description():
 # This route retrieves all part descriptions.
 # Cached for 30 seconds to improve performance.
 # Rate limited to 10 requests per minute to prevent excessive requests.
+# Pass `cursor` (or `after_id`) to seek on the primary key instead of OFFSET; cursor pages carry no ETag.
 @part_descriptions_bp.route("/",methods=['GET'])
 # @cache.cached(timeout=30)
 @limiter.limit("10/hour")
@@ -34,28 +43,44 @@ def get_part_descriptions():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     query = select(PartDescription)
+    if is_keyset_request():
+        try:
+            items, next_cursor = keyset_paginate(query, [PartDescription.id], per_page, **keyset_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({
+            "items": part_descriptions_schema.dump(items),
+            "per_page": min(per_page, MAX_PER_PAGE),
+            "next_cursor": next_cursor
+        }), 200
+    etag = list_etag(PartDescription)
+    if is_not_modified(etag):
+        return not_modified(etag)
     pagination = db.paginate(query, page=page, per_page=per_page)
-    return jsonify({
+    return with_etag(jsonify({
         "items": part_descriptions_schema.dump(pagination.items),
         "total": pagination.total,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages
-    }), 200
+    }), etag), 200
     
 
 # -------------------- Get a Specific Part Descriptions --------------------
 # This route retrieves a specific part description by their ID.
-# Cached for 30 seconds to reduce database lookups.
+# Cached for 10 minutes; writes to this part description invalidate it.
 @part_descriptions_bp.route("/<int:part_description_id>",methods=['GET'])
 @limiter.exempt
-# @cache.cached(timeout=30)
+@cached_by_tags(timeout=600, tags=lambda part_description_id: entity_tags(PartDescription, part_description_id))
 def get_part_description(part_description_id):
     query = select(PartDescription).where(PartDescription.id == part_description_id)
     part_description = db.session.execute(query).scalars().first()
     if part_description == None:
         return jsonify({"status":"error","message":"Invalid part description"}), 404
-    return part_description_schema.jsonify(part_description), 200
+    etag = make_etag(request.full_path, part_description.updated_at)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return with_etag(part_description_schema.jsonify(part_description), etag), 200
 
 # -------------------- Update a Part Description --------------------
 # This route allows updating a part description by its ID.
@@ -99,23 +124,49 @@ def delete_part_description(part_description_id):
     return jsonify({"status": "success","message": "Successfully deleted part description"}), 200
 
 # -------------------- Search Part Descriptions --------------------
-# This route allows searching for part descriptions by name.
+# This route searches part descriptions by name and/or brand (or `q` for either)
+# through the engine's full-text index, best matches first. Terms match word prefixes.
+# Pass `page`/`per_page` for a paginated response; otherwise the top results are returned as a list.
 # Rate limited to 15 requests per minute.
 @part_descriptions_bp.route("/search", methods=['GET'])
 @limiter.limit("15/minute")
 def search_part_descriptions():
+    q = request.args.get('q')
     name = request.args.get('name')
     brand = request.args.get('brand')
-    if not name and not brand:
+    if not q and not name and not brand:
         return jsonify({"status":"error","message": "Please provide a name or brand to search"}), 400
-    query = select(PartDescription)
-    filters = []
-    if name:
-        filters.append(PartDescription.name.ilike(f"%{name}%"))
-    if brand:
-        filters.append(PartDescription.brand.ilike(f"%{brand}%"))
-    if filters:
-        query = query.where(*filters)
-        
-    part_descriptions = db.session.execute(query).scalars().all()
-    return part_descriptions_schema.jsonify(part_descriptions), 200
\ No newline at end of file
+    ranked = ranked_part_descriptions(q=q, name=name, brand=brand)
+    if ranked is None:
+        return jsonify([]), 200
+    query = select(PartDescription).join(ranked, ranked.c.id == PartDescription.id).order_by(ranked.c.rank, PartDescription.id)
+    if 'page' not in request.args and 'per_page' not in request.args:
+        part_descriptions = db.session.execute(query.limit(SEARCH_RESULTS)).scalars().all()
+        return part_descriptions_schema.jsonify(part_descriptions), 200
+    pagination = db.paginate(query, page=request.args.get('page', 1, type=int), per_page=request.args.get('per_page', 10, type=int))
+    return jsonify({
+        "items": part_descriptions_schema.dump(pagination.items),
+        "total": pagination.total,
+        "page": pagination.page,
+        "per_page": pagination.per_page,
+        "pages": pagination.pages
+    }), 200
+
+# -------------------- Autocomplete Part Descriptions --------------------
+# This route suggests part descriptions whose name or brand has a word starting
+# with `prefix`, served from this worker's in-memory prefix index.
+# Names starting with the prefix come first, then later name words, then brands.
+# Exempt from rate limiting: search boxes call it on every keystroke.
+@part_descriptions_bp.route("/autocomplete", methods=['GET'])
+@limiter.exempt
+def autocomplete_part_descriptions():
+    prefix = request.args.get('prefix', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_AUTOCOMPLETE_RESULTS)
+    return jsonify(get_index().search(prefix, limit)), 200
+
+# -------------------- Autocomplete Index Stats --------------------
+# This route reports the size and memory footprint of this worker's prefix index.
+@part_descriptions_bp.route("/autocomplete/stats", methods=['GET'])
+@limiter.exempt
+def autocomplete_stats():
+    return jsonify(get_index().stats()), 200
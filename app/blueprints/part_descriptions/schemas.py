@@ -1,10 +1,14 @@
 from app.models import PartDescription
 from app.extensions import ma
-from marshmallow import fields
+from marshmallow import fields, validate
 
 class PartDescriptionSchema(ma.SQLAlchemyAutoSchema):
+    reorder_point = fields.Int(validate=validate.Range(min=0))
+    lead_time_days = fields.Int(allow_none=True, validate=validate.Range(min=1))
     class Meta:
         model = PartDescription
+        exclude = ("updated_at",)
+        dump_only = ("available_count", "total_count")
      
 part_description_schema = PartDescriptionSchema()
 part_descriptions_schema = PartDescriptionSchema(many=True)
\ No newline at end of file
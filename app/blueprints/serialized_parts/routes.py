@@ -1,13 +1,25 @@
 from flask import request, jsonify
+from datetime import date
 from app.blueprints.serialized_parts import serialized_parts_bp
-from app.blueprints.serialized_parts.schemas import serialized_part_schema, serialized_parts_schema, serialized_part_schema_no_ticket, serialized_parts_schema_no_ticket
+from app.blueprints.serialized_parts.schemas import serialized_part_schema, serialized_parts_schema, serialized_part_schema_no_ticket, compiled_serialized_part_schema_no_ticket, compiled_serialized_parts_schema_no_ticket, receive_parts_schema, serialized_part_load_options
 from app.blueprints.part_descriptions.schemas import part_description_schema
 from marshmallow import ValidationError
-from app.models import SerializedPart, PartDescription, ServiceTicket, db
-from sqlalchemy import select, delete
+from app.models import SerializedPart, PartDescription, ServiceTicket, db, adjust_stock
+from sqlalchemy import select, delete, insert, func
 from app.extensions import cache, limiter
+from app.utils.pagination import MAX_PER_PAGE, is_keyset_request, keyset_args, keyset_paginate
+from app.utils.stock import stock_counts
+from app.utils.search import ranked_part_descriptions
+from app.utils.reorder import reorder_report
+from app.utils.valuation import stock_valuation, consumption_value
+from app.utils.tagged_cache import cached_by_tags, entity_tags, list_etag
+from app.utils.conditional import make_etag, is_not_modified, not_modified, with_etag
 # from app.utils.util import role_required
 
+MAX_RECEIVE_UNITS = 10000
+SEARCH_RESULTS = 50
+MAX_REORDER_WINDOW_DAYS = 3650
+
 # -------------------- Create a Serialized Part --------------------
 # This route allows the creation of a new serialized part.
 # Rate limited to 10 requests per hour to prevent spamming.
@@ -33,23 +45,104 @@ def create_serialized_part():
     data["status"] = "success"
     return jsonify(data), 201
 
+# -------------------- Receive Serialized Parts --------------------
+# This route receives a delivery of serialized parts in one call.
+# Accepts {"desc_id", "quantity"} or a list of them (or of [desc_id, quantity] pairs).
+# Part descriptions are validated with one IN (...) query and every unit is
+# inserted by a single executemany in one transaction; nothing is saved if any line fails.
+# Rate limited to 10 requests per minute.
+@serialized_parts_bp.route("/receive", methods=['POST'])
+@limiter.limit("10/minute")
+def receive_serialized_parts():
+    payload = request.get_json(silent=True)
+    lines = payload if isinstance(payload, list) else [payload]
+    lines = [{"desc_id": line[0], "quantity": line[1]} if isinstance(line, list) and len(line) == 2 else line for line in lines]
+    if not lines or not all(isinstance(line, dict) for line in lines):
+        return jsonify({"status": "error", "message": "Expected {desc_id, quantity} or a non-empty list of them."}), 400
+    try:
+        lines = receive_parts_schema.load(lines)
+    except ValidationError as e:
+        return jsonify({"status": "error", "message": "Invalid delivery", "errors": e.messages}), 400
+    quantity = sum(line['quantity'] for line in lines)
+    if quantity > MAX_RECEIVE_UNITS:
+        return jsonify({"status": "error", "message": f"A maximum of {MAX_RECEIVE_UNITS} serialized parts can be received at once."}), 400
+
+    desc_ids = {line['desc_id'] for line in lines}
+    found = set(db.session.execute(select(PartDescription.id).where(PartDescription.id.in_(desc_ids))).scalars())
+    errors = {index: {"desc_id": ["Part description not found"]} for index, line in enumerate(lines) if line['desc_id'] not in found}
+    if errors:
+        return jsonify({"status": "error", "message": "Invalid delivery", "errors": errors}), 404
+
+    # Counters first: each UPDATE row-locks its description until commit.
+    for line in lines:
+        adjust_stock(line['desc_id'], available=line['quantity'], total=line['quantity'])
+    rows = [{"desc_id": line['desc_id']} for line in lines for _ in range(line['quantity'])]
+    if db.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        # One executemany, batched into multi-row INSERT ... RETURNING.
+        ids = db.session.execute(
+            insert(SerializedPart).returning(SerializedPart.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+    else:
+        # MySQL has no RETURNING, and with innodb_autoinc_lock_mode=2 a
+        # multi-row INSERT's ids increase but need not be consecutive. Read
+        # them back instead: while this transaction holds the description
+        # locks no other writer can commit units of them, so every unit of
+        # these descriptions above the current highest id is one of ours.
+        ours = SerializedPart.desc_id.in_(desc_ids)
+        floor = db.session.execute(select(func.max(SerializedPart.id)).where(ours)).scalar() or 0
+        db.session.execute(insert(SerializedPart.__table__).values(rows))
+        by_desc = {}
+        for desc_id, id in db.session.execute(select(SerializedPart.desc_id, SerializedPart.id).where(ours, SerializedPart.id > floor).order_by(SerializedPart.id)):
+            by_desc.setdefault(desc_id, []).append(id)
+        # Rows were inserted line by line, so each description's ids come back in line order.
+        by_desc = {desc_id: iter(unit_ids) for desc_id, unit_ids in by_desc.items()}
+        ids = [next(by_desc[row["desc_id"]]) for row in rows]
+
+    received, offset = [], 0
+    for line in lines:
+        line_ids = ids[offset:offset + line['quantity']]
+        received.append({"desc_id": line['desc_id'], "quantity": line['quantity'], "first_id": line_ids[0], "last_id": line_ids[-1]})
+        offset += line['quantity']
+    db.session.commit()
+    return jsonify({
+        "status": "success",
+        "message": f"Successfully received {quantity} serialized part(s)",
+        "first_id": ids[0],
+        "last_id": ids[-1],
+        "received": received
+    }), 201
+
 # -------------------- Get All Serialized Parts --------------------
 # This route retrieves all serialized parts.
-# Cached for 60 seconds to improve performance.
+# Cached for 5 minutes; any committed serialized part or description write invalidates it.
+# Pass `cursor` (or `after_id`) to seek on the primary key instead of OFFSET; cursor pages carry no ETag.
 @serialized_parts_bp.route("/",methods=['GET'])
-# @cache.cached(timeout=60)
+@cached_by_tags(timeout=300, tags=lambda: entity_tags(SerializedPart) + entity_tags(PartDescription))
 def get_serialized_parts():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     query = select(SerializedPart)
+    if is_keyset_request():
+        try:
+            items, next_cursor = keyset_paginate(query, [SerializedPart.id], per_page, **keyset_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({
+            "items": compiled_serialized_parts_schema_no_ticket.dump(items),
+            "per_page": min(per_page, MAX_PER_PAGE),
+            "next_cursor": next_cursor
+        }), 200
+    etag = list_etag(SerializedPart, PartDescription)
+    if is_not_modified(etag):
+        return not_modified(etag)
     pagination = db.paginate(query, page=page, per_page=per_page)
-    return jsonify({
-        "items": serialized_parts_schema_no_ticket.dump(pagination.items),
+    return with_etag(jsonify({
+        "items": compiled_serialized_parts_schema_no_ticket.dump(pagination.items),
         "total": pagination.total,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages
-    }), 200  
+    }), etag), 200  
 
 # -------------------- Get a Specific Serialized Part --------------------
 # This route retrieves a specific serialized part by their ID.
@@ -62,18 +155,48 @@ def get_mechanic(id):
     serialized_part = db.session.execute(query).scalars().first()
     if serialized_part == None:
         return jsonify({"message":"Invalid serialized part description"}), 404
-    return serialized_part_schema_no_ticket.jsonify(serialized_part), 200
+    description_updated_at = db.session.execute(select(PartDescription.updated_at).where(PartDescription.id == serialized_part.desc_id)).scalar()
+    etag = make_etag(request.full_path, serialized_part.updated_at, description_updated_at)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return with_etag(compiled_serialized_part_schema_no_ticket.jsonify(serialized_part), etag), 200
 
 # -------------------- Search Serialized Parts --------------------
-# This route allows searching for serialized parts by name.
+# This route searches serialized parts by their description's name and/or brand
+# (or `q` for either), joining through the catalog search index, best matches first.
+# Pass `in_stock=true` to only return units not on a ticket.
+# Pass `page`/`per_page` for a paginated response; otherwise the top results are returned as a list.
 # Rate limited to 15 requests per minute.
 @serialized_parts_bp.route("/search", methods=['GET'])
 @limiter.limit("15/minute")
 def search_serialized_parts():
+    q = request.args.get('q')
     name = request.args.get('name')
-    query = select(SerializedPart).where(SerializedPart.name.like(f'%{name}%'))
-    serialized_parts = db.session.execute(query).scalars().all()
-    return serialized_parts_schema.jsonify(serialized_parts), 200
+    brand = request.args.get('brand')
+    if not q and not name and not brand:
+        return jsonify({"status": "error", "message": "Please provide a name or brand to search"}), 400
+    ranked = ranked_part_descriptions(q=q, name=name, brand=brand)
+    if ranked is None:
+        return jsonify([]), 200
+    query = (
+        select(SerializedPart)
+        .join(ranked, ranked.c.id == SerializedPart.desc_id)
+        .options(*serialized_part_load_options)
+        .order_by(ranked.c.rank, SerializedPart.id)
+    )
+    if request.args.get('in_stock', '').lower() in ('1', 'true', 'yes'):
+        query = query.where(SerializedPart.ticket_id.is_(None))
+    if 'page' not in request.args and 'per_page' not in request.args:
+        serialized_parts = db.session.execute(query.limit(SEARCH_RESULTS)).scalars().all()
+        return serialized_parts_schema.jsonify(serialized_parts), 200
+    pagination = db.paginate(query, page=request.args.get('page', 1, type=int), per_page=request.args.get('per_page', 10, type=int))
+    return jsonify({
+        "items": serialized_parts_schema.dump(pagination.items),
+        "total": pagination.total,
+        "page": pagination.page,
+        "per_page": pagination.per_page,
+        "pages": pagination.pages
+    }), 200
 
 # -------------------- Update a Serialized Part --------------------
 # This route allows updating a serialized part by its ID.
@@ -129,48 +252,129 @@ def delete_serialized_part(id):
     return jsonify({"status": "success","message": f"Successfully deleted serialized part {id}"}), 200
 
 # -------------------- Get All Stock --------------------
-# This route retrieves all stock of serialized parts.
-# Cached for 60 seconds to improve performance.
+# This route retrieves the in-stock count of every part description.
+# Stock is counted in the database with one aggregate over serialized_parts
+# grouped by desc_id, so no serialized part rows are loaded.
+# Supports `name`/`brand` filters and `min_stock`/`max_stock` bounds.
+# Pass `page`/`per_page` for a paginated response; otherwise the full list is returned.
+# Cached for 5 minutes; any committed serialized part or description write invalidates it.
 # Rate limited to 10 requests per minute.
 @serialized_parts_bp.route("/inventory", methods=['GET'])
-# @cache.cached(timeout=60)
+@cached_by_tags(timeout=300, tags=lambda: entity_tags(SerializedPart) + entity_tags(PartDescription))
 # @limiter.limit("10 per minute")
 def get_all_stock():
-    query = select(PartDescription)
-    parts_description = db.session.execute(query).scalars().all()
-    
-    stock = []
-    if parts_description:
-        for part_description in parts_description:
-            part_items = part_description.serial_items
-            count = 0
-            for part in part_items:
-                if not part.ticket_id:
-                    count += 1
-            stock.append({
-                "part_description": part_description_schema.dump(part_description),
-                "stock": count
-            })
-    return jsonify(stock), 200
+    name = request.args.get('name')
+    brand = request.args.get('brand')
+    try:
+        min_stock = int(request.args['min_stock']) if 'min_stock' in request.args else None
+        max_stock = int(request.args['max_stock']) if 'max_stock' in request.args else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "min_stock and max_stock must be integers."}), 400
+    paginated = 'page' in request.args or 'per_page' in request.args
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(request.args.get('per_page', 10, type=int), 1)
+
+    etag = list_etag(SerializedPart, PartDescription)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    counts = stock_counts()
+    stock = func.coalesce(counts.c.available, 0)
+    query = select(PartDescription, stock).outerjoin(counts, counts.c.desc_id == PartDescription.id)
+    if name:
+        query = query.where(PartDescription.name.ilike(f"%{name}%"))
+    if brand:
+        query = query.where(PartDescription.brand.ilike(f"%{brand}%"))
+    if min_stock is not None:
+        query = query.where(stock >= min_stock)
+    if max_stock is not None:
+        query = query.where(stock <= max_stock)
+    query = query.order_by(PartDescription.id)
+
+    if paginated:
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+        query = query.limit(per_page).offset((page - 1) * per_page)
+
+    items = [
+        {"part_description": part_description_schema.dump(part_description), "stock": count}
+        for part_description, count in db.session.execute(query).all()
+    ]
+    if not paginated:
+        return with_etag(jsonify(items), etag), 200
+    return with_etag(jsonify({
+        "items": items,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": -(-total // per_page)
+    }), etag), 200
   
 # -------------------- Get Individual Stock --------------------
 # This route allows getting the stock of a specific part by its ID.
-# Cached for 30 seconds to reduce database lookups.
+# Reads the denormalized available_count instead of counting units.
+# Cached for 5 minutes; stock changes on this part invalidate it.
 # Rate limited to 10 requests per minute.  
 @serialized_parts_bp.route("/inventory/<int:part_id>", methods=['GET'])
-# @cache.cached(timeout=30)
 @limiter.limit("10/minute")
+@cached_by_tags(timeout=300, tags=lambda part_id: entity_tags(PartDescription, part_id))
 def get_individual_stock(part_id):
     
     part_description = db.session.get(PartDescription, part_id)
     if not part_description:
         return jsonify({"status": "error","message":"Part description not found"}), 404
-    
-    parts = part_description.serial_items
-    count = 0
-    for part in parts:
-        if not part.ticket_id:
-            count += 1
-    return jsonify({"part_description": part_description_schema.dump(part_description), "stock": count }), 200
-    
-    
+    # Stock changes bump the description's updated_at along with its counters.
+    etag = make_etag(request.full_path, part_description.updated_at)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return with_etag(jsonify({"part_description": part_description_schema.dump(part_description), "stock": part_description.available_count}), etag), 200
+
+# -------------------- Reorder Report --------------------
+# This route lists parts whose stock has fallen to their reorder threshold,
+# based on consumption over a sliding window of service dates.
+# Pass `all=true` to include every part description with its rates.
+# Cached for 5 minutes; stock, catalog and ticket writes invalidate it.
+@serialized_parts_bp.route("/reorder", methods=['GET'])
+@limiter.limit("30/minute")
+@cached_by_tags(timeout=300, tags=lambda: entity_tags(SerializedPart) + entity_tags(PartDescription) + entity_tags(ServiceTicket))
+def get_reorder_report():
+    try:
+        as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else date.today()
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+    window_days = request.args.get('window_days', 90, type=int)
+    lead_days = request.args.get('lead_days', 14, type=int)
+    if not 1 <= window_days <= MAX_REORDER_WINDOW_DAYS or lead_days < 1:
+        return jsonify({"status": "error", "message": f"window_days must be between 1 and {MAX_REORDER_WINDOW_DAYS} and lead_days must be positive."}), 400
+    include_all = request.args.get('all', '').lower() in ('1', 'true', 'yes')
+    return jsonify({
+        "as_of": as_of.isoformat(),
+        "window_days": window_days,
+        "lead_days": lead_days,
+        "items": reorder_report(as_of, window_days, lead_days, include_all=include_all)
+    }), 200
+
+# -------------------- Stock Valuation Report --------------------
+# This route reports the value of parts in stock, grouped by part or brand.
+# Cached for 5 minutes; stock and catalog writes invalidate it.
+@serialized_parts_bp.route("/valuation", methods=['GET'])
+@limiter.limit("30/minute")
+@cached_by_tags(timeout=300, tags=lambda: entity_tags(SerializedPart) + entity_tags(PartDescription))
+def get_stock_valuation():
+    group_by = request.args.get('group_by', 'part')
+    if group_by not in ('part', 'brand'):
+        return jsonify({"status": "error", "message": "group_by must be 'part' or 'brand'."}), 400
+    return jsonify(stock_valuation(group_by)), 200
+
+# -------------------- Consumed Parts Value Report --------------------
+# This route reports the value of parts put on tickets per month of service date.
+# Cached for 5 minutes; stock, catalog and ticket writes invalidate it.
+@serialized_parts_bp.route("/consumption-value", methods=['GET'])
+@limiter.limit("30/minute")
+@cached_by_tags(timeout=300, tags=lambda: entity_tags(SerializedPart) + entity_tags(PartDescription) + entity_tags(ServiceTicket))
+def get_consumption_value():
+    try:
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+    return jsonify(consumption_value(start_date, end_date)), 200
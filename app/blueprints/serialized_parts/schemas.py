@@ -1,6 +1,8 @@
-from app.models import SerializedPart
+from app.models import SerializedPart, ServiceTicket
+from sqlalchemy.orm import joinedload, selectinload
 from app.extensions import ma
-from marshmallow import fields
+from marshmallow import fields, validate
+from app.utils.compiled_schema import CompiledSchema
 
 class SerializedPartSchema(ma.SQLAlchemyAutoSchema):
     description = fields.Nested("PartDescriptionSchema")
@@ -8,8 +10,27 @@ class SerializedPartSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = SerializedPart
         include_fk = True
+        exclude = ("updated_at",)
 
 serialized_part_schema = SerializedPartSchema()
 serialized_parts_schema = SerializedPartSchema(many=True)
 serialized_part_schema_no_ticket = SerializedPartSchema(exclude=["ticket"])
-serialized_parts_schema_no_ticket = SerializedPartSchema(many=True, exclude=["ticket"])
\ No newline at end of file
+serialized_parts_schema_no_ticket = SerializedPartSchema(many=True, exclude=["ticket"])
+compiled_serialized_part_schema_no_ticket = CompiledSchema(serialized_part_schema_no_ticket)
+compiled_serialized_parts_schema_no_ticket = CompiledSchema(serialized_parts_schema_no_ticket)
+
+# Loader plan for everything SerializedPartSchema dumps (description, and the
+# ticket with its customer and mechanics), so a page is a fixed number of queries.
+serialized_part_load_options = (
+    joinedload(SerializedPart.description),
+    selectinload(SerializedPart.ticket).joinedload(ServiceTicket.customer),
+    selectinload(SerializedPart.ticket).selectinload(ServiceTicket.mechanics),
+)
+
+class ReceivePartsSchema(ma.Schema):
+    desc_id = fields.Int(required=True)
+    quantity = fields.Int(required=True, validate=validate.Range(min=1))
+    class Meta:
+        fields = ("desc_id", "quantity")
+
+receive_parts_schema = ReceivePartsSchema(many=True)
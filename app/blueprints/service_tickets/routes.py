@@ -1,15 +1,134 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response, stream_with_context
+from datetime import date
+from decimal import Decimal
 from app.blueprints.service_tickets import service_tickets_bp
-from app.blueprints.service_tickets.schemas import service_ticket_schema, service_tickets_schema, return_service_ticket_schema, edit_service_ticket_schema
+from app.blueprints.service_tickets.schemas import service_ticket_schema, service_tickets_schema, return_service_ticket_schema, edit_service_ticket_schema, auto_assign_schema, compiled_service_ticket_schema, compiled_service_tickets_schema, service_ticket_load_options, sparse_service_ticket_plan
 from app.blueprints.mechanics.schemas import mechanics_schema
 from app.blueprints.part_descriptions.schemas import part_description_schema, part_descriptions_schema
 from app.blueprints.serialized_parts.schemas import serialized_part_schema, serialized_parts_schema
 from marshmallow import ValidationError
-from app.models import Customer, ServiceTicket, Mechanic, PartDescription, SerializedPart, db
-from sqlalchemy import select, delete
+from app.models import Customer, ServiceTicket, Mechanic, PartDescription, SerializedPart, service_mechanic, db, utcnow, adjust_stock, adjust_workload
+from sqlalchemy import select, delete, insert, update, and_, func, exists
+from collections import Counter
 from app.extensions import cache, limiter
+from app.utils.pagination import MAX_PER_PAGE, is_keyset_request, keyset_args, keyset_paginate
+from app.utils.assignment import pick_mechanic, pick_mechanics
+from app.utils.conditional import latest_update, row_versions, make_etag, is_not_modified, not_modified, with_etag
+from app.utils.tagged_cache import list_etag
 # from app.utils.util import encode_token
 
+MAX_BULK_TICKETS = 1000
+EXPORT_BATCH_SIZE = 500
+
+# -------------------- Mechanic Assignment Helpers --------------------
+# Resolves requested mechanic ids in one query: which ids exist and which of
+# them are already on the ticket. Only the requested ids are read, so the cost
+# depends on the size of the change, not on how many mechanics the ticket has.
+def resolve_mechanic_ids(ticket_id, mechanic_ids):
+    if not mechanic_ids:
+        return set(), set()
+    query = (
+        select(Mechanic.id, service_mechanic.c.ticket_id)
+        .outerjoin(service_mechanic, and_(service_mechanic.c.mechanic_id == Mechanic.id, service_mechanic.c.ticket_id == ticket_id))
+        .where(Mechanic.id.in_(set(mechanic_ids)))
+    )
+    rows = db.session.execute(query).all()
+    return {row[0] for row in rows}, {row[0] for row in rows if row[1] is not None}
+
+def assigned_mechanic_ids(ticket_id):
+    return set(db.session.execute(select(service_mechanic.c.mechanic_id).where(service_mechanic.c.ticket_id == ticket_id)).scalars())
+
+# Marks a ticket as changed after Core statements that bypass the ORM, so its
+# ETag moves with its mechanics and items.
+def touch_ticket(ticket_id):
+    db.session.execute(update(ServiceTicket).where(ServiceTicket.id == ticket_id).values(updated_at=utcnow()), execution_options={"synchronize_session": False})
+
+# Applies the diff as bulk statements on the association table, and shifts
+# the mechanics' workload rollups for the ticket's service day to match.
+def apply_mechanic_changes(ticket_id, add_ids=(), remove_ids=()):
+    if not add_ids and not remove_ids:
+        return
+    touch_ticket(ticket_id)
+    service_date = db.session.execute(select(ServiceTicket.service_date).where(ServiceTicket.id == ticket_id)).scalar_one()
+    if add_ids:
+        db.session.execute(insert(service_mechanic), [{"ticket_id": ticket_id, "mechanic_id": mechanic_id} for mechanic_id in add_ids])
+    if remove_ids:
+        db.session.execute(delete(service_mechanic).where(service_mechanic.c.ticket_id == ticket_id, service_mechanic.c.mechanic_id.in_(remove_ids)))
+    for mechanic_id in add_ids:
+        adjust_workload(mechanic_id, service_date, 1)
+    for mechanic_id in remove_ids:
+        adjust_workload(mechanic_id, service_date, -1)
+
+# -------------------- Part Reservation Helper --------------------
+# Claims `quantity` free units of a part description for a ticket inside the
+# database, so two counters can never be handed the same unit. Postgres and
+# MySQL lock the candidate rows with SKIP LOCKED; SQLite runs one conditional
+# UPDATE ... WHERE ticket_id IS NULL under its write lock. Returns the number
+# of units claimed; the caller must roll back when it is short.
+def reserve_parts(ticket_id, desc_id, quantity):
+    free_units = (
+        select(SerializedPart.id)
+        .where(SerializedPart.desc_id == desc_id, SerializedPart.ticket_id.is_(None))
+        .order_by(SerializedPart.id)
+        .limit(quantity)
+    )
+    if db.session.get_bind().dialect.name in ('postgresql', 'mysql', 'mariadb'):
+        part_ids = db.session.execute(free_units.with_for_update(skip_locked=True)).scalars().all()
+        if len(part_ids) < quantity:
+            return len(part_ids)
+        claim = update(SerializedPart).where(SerializedPart.id.in_(part_ids))
+    else:
+        claim = update(SerializedPart).where(SerializedPart.id.in_(free_units.scalar_subquery()), SerializedPart.ticket_id.is_(None))
+    result = db.session.execute(claim.values(ticket_id=ticket_id), execution_options={"synchronize_session": False})
+    touch_ticket(ticket_id)
+    adjust_stock(desc_id, available=-result.rowcount)
+    return result.rowcount
+
+# -------------------- Ticket Version Helpers --------------------
+# Detail ETags are built from the ticket's own updated_at plus those of the rows
+# it embeds, read through the ticket's indexed foreign keys. Assignment and
+# cart changes touch the ticket itself, which covers rows leaving it.
+def ticket_part_versions(ticket_id):
+    return (
+        latest_update(SerializedPart, SerializedPart.ticket_id == ticket_id),
+        latest_update(PartDescription, SerializedPart.ticket_id == ticket_id, join=(SerializedPart, SerializedPart.desc_id == PartDescription.id)),
+    )
+
+def ticket_versions(ticket_id):
+    return row_versions(
+        latest_update(ServiceTicket, ServiceTicket.id == ticket_id),
+        latest_update(Customer, ServiceTicket.id == ticket_id, join=(ServiceTicket, ServiceTicket.customer_id == Customer.id)),
+        latest_update(Mechanic, service_mechanic.c.ticket_id == ticket_id, join=(service_mechanic, service_mechanic.c.mechanic_id == Mechanic.id)),
+        *ticket_part_versions(ticket_id)
+    )
+
+# -------------------- Ticket Totals Helper --------------------
+# Sums part prices per ticket in SQL: one SUM(price) GROUP BY ticket_id join
+# over serialized_parts, without loading any ORM objects.
+def ticket_totals(ticket_ids):
+    if not ticket_ids:
+        return {}
+    query = (
+        select(SerializedPart.ticket_id, func.count(SerializedPart.id), func.sum(PartDescription.price))
+        .join(PartDescription, SerializedPart.desc_id == PartDescription.id)
+        .where(SerializedPart.ticket_id.in_(ticket_ids))
+        .group_by(SerializedPart.ticket_id)
+    )
+    return {ticket_id: (count, total) for ticket_id, count, total in db.session.execute(query)}
+
+# Ids come from the loaded tickets (paired with their dumps by position), so a
+# sparse `fields` list without `id` still gets its totals.
+def add_ticket_totals(tickets, tickets_data):
+    totals = ticket_totals([ticket.id for ticket in tickets])
+    for ticket, ticket_data in zip(tickets, tickets_data):
+        count, total = totals.get(ticket.id, (0, Decimal("0.00")))
+        ticket_data['parts_count'] = count
+        ticket_data['parts_total'] = total
+    return tickets_data
+
+def is_truthy(value):
+    return (value or "").lower() in ("1", "true", "yes")
+
 # -------------------- Create a New Service Ticket --------------------
 # This route allows the creation of a new service ticket.
 # Rate limited to 10 requests per hour to prevent spamming.
@@ -33,46 +152,232 @@ def create_ticket():
         vin=ticket_data['vin']
     )
     
-    mechanic_ids = ticket_data.get('mechanic_ids', [])
-    for mechanic_id in mechanic_ids:
-        query = select(Mechanic).where(Mechanic.id==mechanic_id)
-        mechanic = db.session.execute(query).scalar()
-        if mechanic:
-            new_service_ticket.mechanics.append(mechanic)
-        else:
-            return jsonify({"status": "error", "message": "Invalid mechanic id"}), 400 
+    mechanic_ids = list(dict.fromkeys(ticket_data.get('mechanic_ids', [])))
+    mechanics = {}
+    if mechanic_ids:
+        mechanics = {mechanic.id: mechanic for mechanic in db.session.execute(select(Mechanic).where(Mechanic.id.in_(mechanic_ids))).scalars()}
+    if len(mechanics) != len(mechanic_ids):
+        return jsonify({"status": "error", "message": "Invalid mechanic id"}), 400
     db.session.add(new_service_ticket)
+    for mechanic_id in mechanic_ids:
+        new_service_ticket.mechanics.append(mechanics[mechanic_id])
+    # Auto assign adds the least-loaded mechanic for the service date
+    if ticket_data.get('auto_assign'):
+        mechanic_id = pick_mechanic(ticket_data['service_date'], exclude={mechanic.id for mechanic in new_service_ticket.mechanics})
+        if mechanic_id is None:
+            return jsonify({"status": "error", "message": "No mechanic available to assign."}), 400
+        new_service_ticket.mechanics.append(db.session.get(Mechanic, mechanic_id))
     db.session.commit() 
     return return_service_ticket_schema.jsonify(new_service_ticket), 201
 
+# -------------------- Bulk Create Service Tickets --------------------
+# This route creates many service tickets from one array payload.
+# Customers and mechanics are validated with one IN (...) query each and every
+# ticket is inserted in a single transaction; nothing is saved if any item fails.
+# Items with `auto_assign` also get the least-loaded mechanic of their service date.
+@service_tickets_bp.route("/bulk", methods=['POST'])
+@limiter.limit("10/hour")
+def create_tickets_bulk():
+    if not isinstance(request.json, list) or not request.json:
+        return jsonify({"status": "error", "message": "Expected a non-empty list of service tickets."}), 400
+    if len(request.json) > MAX_BULK_TICKETS:
+        return jsonify({"status": "error", "message": f"A maximum of {MAX_BULK_TICKETS} service tickets can be created at once."}), 400
+    try:
+        tickets_data = service_tickets_schema.load(request.json)
+    except ValidationError as e:
+        return jsonify({"status": "error", "message": "Invalid service tickets", "errors": e.messages}), 400
+
+    customer_ids = {ticket_data['customer_id'] for ticket_data in tickets_data}
+    mechanic_ids = {mechanic_id for ticket_data in tickets_data for mechanic_id in ticket_data.get('mechanic_ids', [])}
+    found_customers = set(db.session.execute(select(Customer.id).where(Customer.id.in_(customer_ids))).scalars())
+    mechanics = {}
+    if mechanic_ids:
+        mechanics = {mechanic.id: mechanic for mechanic in db.session.execute(select(Mechanic).where(Mechanic.id.in_(mechanic_ids))).scalars()}
+
+    errors = {}
+    for index, ticket_data in enumerate(tickets_data):
+        if ticket_data['customer_id'] not in found_customers:
+            errors[index] = {"customer_id": ["Invalid customer id"]}
+        missing = [mechanic_id for mechanic_id in ticket_data.get('mechanic_ids', []) if mechanic_id not in mechanics]
+        if missing:
+            errors.setdefault(index, {})["mechanic_ids"] = [f"Invalid mechanic id {mechanic_id}" for mechanic_id in missing]
+    if errors:
+        return jsonify({"status": "error", "message": "Invalid service tickets", "errors": errors}), 400
+
+    new_service_tickets = []
+    for ticket_data in tickets_data:
+        new_service_ticket = ServiceTicket(
+            service_date=ticket_data['service_date'],
+            service_desc=ticket_data['service_desc'],
+            customer_id=ticket_data['customer_id'],
+            vin=ticket_data['vin']
+        )
+        db.session.add(new_service_ticket)
+        for mechanic_id in dict.fromkeys(ticket_data.get('mechanic_ids', [])):
+            new_service_ticket.mechanics.append(mechanics[mechanic_id])
+        new_service_tickets.append(new_service_ticket)
+    db.session.flush()
+    # Auto assign picks per service date once the explicit assignments are in
+    # the rollups, skipping mechanics already on each ticket.
+    auto_assigned = {}
+    for index, ticket_data in enumerate(tickets_data):
+        if ticket_data.get('auto_assign'):
+            auto_assigned.setdefault(ticket_data['service_date'], []).append(new_service_tickets[index])
+    for service_date, tickets in auto_assigned.items():
+        picks = pick_mechanics(service_date, len(tickets), exclude=[{mechanic.id for mechanic in ticket.mechanics} for ticket in tickets])
+        if None in picks or len(picks) < len(tickets):
+            db.session.rollback()
+            return jsonify({"status": "error", "message": "No mechanic available to assign."}), 400
+        for ticket, mechanic_id in zip(tickets, picks):
+            ticket.mechanics.append(db.session.get(Mechanic, mechanic_id))
+    ids = [ticket.id for ticket in new_service_tickets]
+    db.session.commit()
+    return jsonify({"status": "success", "message": f"Successfully created {len(ids)} service tickets", "ids": ids}), 201
+
 # -------------------- Get All Service Tickets --------------------
 # This route retrieves all service tickets.
 # Cached for 60 seconds to improve performance.
+# Nested customer, mechanics and items are eager loaded in batches per page.
+# Pass `cursor` (or `after_id`) to seek on (service_date, id) instead of OFFSET; cursor pages carry no ETag.
+# Pass `fields` and/or `include` to select only some columns and relationships.
+# Pass `with_totals=true` to add parts_count and parts_total to every ticket.
 @service_tickets_bp.route("/", methods=['GET'])
 # @cache.cached(timeout=60)
 @limiter.exempt
 def get_service_tickets():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    query = select(ServiceTicket)
+    try:
+        schema, options = sparse_service_ticket_plan(request.args.get('fields'), request.args.get('include'), many=True)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if schema is None:
+        schema, options = compiled_service_tickets_schema, service_ticket_load_options
+    with_totals = is_truthy(request.args.get('with_totals'))
+    query = select(ServiceTicket).options(*options).order_by(ServiceTicket.id)
+    if is_keyset_request():
+        try:
+            tickets, next_cursor = keyset_paginate(query, [ServiceTicket.service_date, ServiceTicket.id], per_page, **keyset_args())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        tickets_data = schema.dump(tickets)
+        return jsonify({
+            "tickets": add_ticket_totals(tickets, tickets_data) if with_totals else tickets_data,
+            "per_page": min(per_page, MAX_PER_PAGE),
+            "next_cursor": next_cursor
+        }), 200
+    etag = list_etag(ServiceTicket, Customer, Mechanic, SerializedPart, PartDescription, service_mechanic)
+    if is_not_modified(etag):
+        return not_modified(etag)
     pagination = db.paginate(query, page=page, per_page=per_page)
-    return jsonify({
-        "tickets": service_tickets_schema.dump(pagination.items),
+    tickets_data = schema.dump(pagination.items)
+    return with_etag(jsonify({
+        "tickets": add_ticket_totals(pagination.items, tickets_data) if with_totals else tickets_data,
         "total": pagination.total,
         "page": pagination.page,
         "per_page": pagination.per_page,
         "pages": pagination.pages
-    }), 200
+    }), etag), 200
+
+# -------------------- Export Service Tickets --------------------
+# This route streams service tickets as newline-delimited JSON.
+# Rows are fetched through a server-side cursor in batches and written out one
+# line at a time, so memory stays flat regardless of the export size.
+# Filters: `start_date`, `end_date` (inclusive, YYYY-MM-DD) and `customer_id`.
+@service_tickets_bp.route("/export", methods=['GET'])
+@limiter.limit("10/hour")
+def export_service_tickets():
+    try:
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must use the YYYY-MM-DD format."}), 400
+    # Reject a malformed customer_id rather than dropping the filter and exporting every customer.
+    try:
+        customer_id = int(request.args['customer_id']) if 'customer_id' in request.args else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "customer_id must be an integer."}), 400
+    try:
+        schema, options = sparse_service_ticket_plan(request.args.get('fields'), request.args.get('include'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if schema is None:
+        schema, options = compiled_service_ticket_schema, service_ticket_load_options
+
+    query = select(ServiceTicket).options(*options).order_by(ServiceTicket.service_date, ServiceTicket.id)
+    if start_date:
+        query = query.where(ServiceTicket.service_date >= start_date)
+    if end_date:
+        query = query.where(ServiceTicket.service_date <= end_date)
+    if customer_id is not None:
+        query = query.where(ServiceTicket.customer_id == customer_id)
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for ticket in result.scalars():
+            yield current_app.json.dumps(schema.dump(ticket)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 # -------------------- Get Individual Service Ticket --------------------
 # This route retrieves specific service ticket.
+# Pass `fields` and/or `include` to select only some columns and relationships.
 @service_tickets_bp.route("/<int:service_ticket_id>", methods=['GET'])
 @limiter.exempt
 def get_service_ticket(service_ticket_id):
-    ticket = db.session.get(ServiceTicket,service_ticket_id)
-    if ticket:
-        return service_ticket_schema.jsonify(ticket), 200
-    return jsonify({"status":"error", "message":"Invalid ticket id"}), 404
+    try:
+        schema, options = sparse_service_ticket_plan(request.args.get('fields'), request.args.get('include'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if schema is None:
+        schema, options = compiled_service_ticket_schema, service_ticket_load_options
+    versions = ticket_versions(service_ticket_id)
+    if versions[0] is None:
+        return jsonify({"status":"error", "message":"Invalid ticket id"}), 404
+    etag = make_etag(request.full_path, *versions)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    ticket = db.session.get(ServiceTicket, service_ticket_id, options=options)
+    return with_etag(schema.jsonify(ticket), etag), 200
+
+# -------------------- Get Service Ticket Invoice --------------------
+# This route returns the parts invoice of a service ticket.
+# Lines and totals are aggregated in SQL (GROUP BY part description).
+@service_tickets_bp.route("/<int:ticket_id>/invoice", methods=['GET'])
+@limiter.exempt
+def get_service_ticket_invoice(ticket_id):
+    ticket = db.session.get(ServiceTicket, ticket_id)
+    if not ticket:
+        return jsonify({"status":"error", "message":"Invalid ticket id"}), 404
+    etag = make_etag(request.full_path, ticket.updated_at, *row_versions(*ticket_part_versions(ticket_id)))
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    query = (
+        select(PartDescription.id, PartDescription.name, PartDescription.brand, PartDescription.price, func.count(SerializedPart.id))
+        .join(SerializedPart, SerializedPart.desc_id == PartDescription.id)
+        .where(SerializedPart.ticket_id == ticket_id)
+        .group_by(PartDescription.id, PartDescription.name, PartDescription.brand, PartDescription.price)
+        .order_by(PartDescription.id)
+    )
+    items = []
+    for desc_id, name, brand, price, quantity in db.session.execute(query):
+        items.append({
+            "desc_id": desc_id,
+            "name": name,
+            "brand": brand,
+            "unit_price": price,
+            "quantity": quantity,
+            "line_total": price * quantity
+        })
+    return with_etag(jsonify({
+        "ticket_id": ticket.id,
+        "customer_id": ticket.customer_id,
+        "service_date": ticket.service_date.isoformat(),
+        "items": items,
+        "parts_count": sum(item["quantity"] for item in items),
+        "total": sum((item["line_total"] for item in items), Decimal("0.00"))
+    }), etag), 200
 
 # -------------------- Update Service Ticket --------------------
 # This route allows the editing of service tickets.
@@ -97,22 +402,18 @@ def update_service_ticket(ticket_id):
         return jsonify({"status": "error", "message": "Invalid customer id"}), 400
     
     for field, value in ticket_data.items():
-        if not field == "mechanic_ids":
+        if field not in ("mechanic_ids", "auto_assign"):
             setattr(service_ticket, field, value)
             
-    mechanic_ids = ticket_data.get('mechanic_ids', [])
+    mechanic_ids = list(dict.fromkeys(ticket_data.get('mechanic_ids', [])))
+    existing_ids, assigned_ids = resolve_mechanic_ids(ticket_id, mechanic_ids)
     for mechanic_id in mechanic_ids:
-        query = select(Mechanic).where(Mechanic.id==mechanic_id)
-        mechanic = db.session.execute(query).scalar()
-        
-        if not mechanic:
+        if mechanic_id not in existing_ids:
             return jsonify({"status": "error", "message": "Invalid mechanic id"}), 400 
-        
-        if mechanic and mechanic not in service_ticket.mechanics:
-            service_ticket.mechanics.append(mechanic)
-        else:
+        if mechanic_id in assigned_ids:
             return jsonify({"status": "error", "message": f"The mechanic {mechanic_id} already exists in this ticket."}), 400
-        
+
+    apply_mechanic_changes(ticket_id, add_ids=mechanic_ids)
     db.session.commit()
     
     return return_service_ticket_schema.jsonify(service_ticket), 201
@@ -137,24 +438,29 @@ def edit_service_tickets(id):
     if not service_ticket:
         return jsonify({"status": "error", "message": "Service ticket not found"}), 404
     
+    add_ids = list(dict.fromkeys(add_ids))
+    remove_ids = list(dict.fromkeys(remove_ids))
+    existing_ids, assigned_ids = resolve_mechanic_ids(id, add_ids + remove_ids)
     for mechanic_id in add_ids:
-        query = select(Mechanic).where(Mechanic.id==mechanic_id)
-        mechanic = db.session.execute(query).scalars().first()
-        
-        if mechanic and mechanic not in service_ticket.mechanics:
-            service_ticket.mechanics.append(mechanic)
-        else:
+        if mechanic_id not in existing_ids or mechanic_id in assigned_ids:
             return jsonify({"status": "error", "message": f"The mechanic {mechanic_id} already exists in this ticket."}), 400
-    
     for mechanic_id in remove_ids:
-        query = select(Mechanic).where(Mechanic.id==mechanic_id)
-        mechanic = db.session.execute(query).scalars().first()
-        
-        if mechanic and mechanic in service_ticket.mechanics:
-            service_ticket.mechanics.remove(mechanic)
-        else:
+        if mechanic_id not in assigned_ids and mechanic_id not in add_ids:
             return jsonify({"status": "error", "message": f"The mechanic {mechanic_id} not exist in this ticket."}), 400
 
+    # Auto assign adds the least-loaded mechanic not already on (or leaving) the ticket
+    if ticket_data.get('auto_assign'):
+        mechanic_id = pick_mechanic(service_ticket.service_date, exclude=assigned_mechanic_ids(id) | set(add_ids) | set(remove_ids))
+        if mechanic_id is None:
+            return jsonify({"status": "error", "message": "No mechanic available to assign."}), 400
+        add_ids.append(mechanic_id)
+
+    add_set, remove_set = set(add_ids), set(remove_ids)
+    apply_mechanic_changes(
+        id,
+        add_ids=[mechanic_id for mechanic_id in add_ids if mechanic_id not in remove_set],
+        remove_ids=[mechanic_id for mechanic_id in remove_ids if mechanic_id not in add_set]
+    )
     db.session.commit()
     return return_service_ticket_schema.jsonify(service_ticket), 200
 
@@ -203,6 +509,66 @@ def remove_mechanic(ticket_id, mechanic_id):
         return jsonify({"status": "error", "message": "Mechanic not included on this ticket."}), 400
     return jsonify({"status": "error", "message": "Service ticket or mechanic not found."}), 404
 
+# -------------------- Auto Assign a Mechanic to Service Ticket --------------------
+# This route adds the least-loaded mechanic for the ticket's service date.
+# Rate limited to 10 requests per hour.
+@service_tickets_bp.route("/<int:ticket_id>/auto-assign", methods=['PUT'])
+@limiter.limit("10/hour")
+def auto_assign_mechanic(ticket_id):
+    ticket = db.session.get(ServiceTicket, ticket_id)
+    if not ticket:
+        return jsonify({"status": "error", "message": "Service ticket not found"}), 404
+    mechanic_id = pick_mechanic(ticket.service_date, exclude=assigned_mechanic_ids(ticket_id))
+    if mechanic_id is None:
+        return jsonify({"status": "error", "message": "No mechanic available to assign."}), 400
+    apply_mechanic_changes(ticket_id, add_ids=[mechanic_id])
+    db.session.commit()
+    return jsonify({
+        'status': 'success',
+        'message': f"Mechanic {mechanic_id} successfully assigned to ticket",
+        'service_ticket': service_ticket_schema.dump(ticket)
+    }), 200
+
+# -------------------- Auto Assign a Day's Service Tickets --------------------
+# This route gives every ticket of `service_date` without a mechanic the least-loaded
+# mechanic at that point, spreading the day's intake evenly. One insert covers all tickets.
+# Rate limited to 10 requests per hour.
+@service_tickets_bp.route("/auto-assign", methods=['POST'])
+@limiter.limit("10/hour")
+def auto_assign_day():
+    try:
+        service_date = auto_assign_schema.load(request.json)['service_date']
+    except ValidationError as e:
+        return jsonify(e.messages), 400
+
+    unassigned = (
+        select(ServiceTicket.id)
+        .where(ServiceTicket.service_date == service_date, ~exists().where(service_mechanic.c.ticket_id == ServiceTicket.id))
+        .order_by(ServiceTicket.id)
+    )
+    ticket_ids = db.session.execute(unassigned).scalars().all()
+    mechanic_ids = pick_mechanics(service_date, len(ticket_ids))
+    if ticket_ids and not mechanic_ids:
+        return jsonify({"status": "error", "message": "No mechanic available to assign."}), 400
+    assignments = [
+        {"ticket_id": ticket_id, "mechanic_id": mechanic_id} for ticket_id, mechanic_id in zip(ticket_ids, mechanic_ids)
+    ]
+
+    if assignments:
+        db.session.execute(insert(service_mechanic), assignments)
+        db.session.execute(
+            update(ServiceTicket).where(ServiceTicket.id.in_([row["ticket_id"] for row in assignments])).values(updated_at=utcnow()),
+            execution_options={"synchronize_session": False}
+        )
+        for mechanic_id, count in Counter(row["mechanic_id"] for row in assignments).items():
+            adjust_workload(mechanic_id, service_date, count)
+    db.session.commit()
+    return jsonify({
+        "status": "success",
+        "message": f"Assigned {len(assignments)} service tickets",
+        "assignments": assignments
+    }), 200
+
 # -------------------- Add Part to Service Ticket --------------------
 # Rate limited to 10 requests per hour.
 @service_tickets_bp.route("/<int:ticket_id>/add-part/<int:part_id>", methods=['PUT'])
@@ -251,7 +617,7 @@ def remove_part_from_ticket(ticket_id, part_id):
 
 # -------------------- Add parts to cart to a Serivce Ticket --------------------
 # This route allows adding parts to a service ticket's cart.
-# It checks if the part is not already assigned to another ticket before adding it to the cart.
+# Free units are reserved in the database so concurrent requests never share a unit.
 @service_tickets_bp.route("/<int:ticket_id>/add-to-cart/<int:part_id>", methods=['PUT'])
 @limiter.exempt
 def add_to_cart(ticket_id, part_id):
@@ -265,15 +631,13 @@ def add_to_cart(ticket_id, part_id):
     # Get quantity from JSON body, default to 1 if not provided
     data = request.get_json(silent=True) or {}
     quantity = data.get('quantity', 1)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        return jsonify({"status":"error","message": "Quantity must be a positive integer."}), 400
 
-    # Find available serialized parts for this description
-    available_parts = [p for p in part_desc.serial_items if not p.ticket_id]
-    if len(available_parts) < quantity:
-        return jsonify({"status":"error","message": f"Only {len(available_parts)} stock(s) available for this part."}), 400
-
-    # Add the requested quantity of parts to the ticket
-    for part in available_parts[:quantity]:
-        ticket.ticket_items.append(part)
+    # Fail fast on the stock counter, then reserve the requested quantity; all or nothing
+    if part_desc.available_count < quantity or reserve_parts(ticket_id, part_id, quantity) < quantity:
+        db.session.rollback()
+        return jsonify({"status":"error","message": f"Only {part_desc.available_count} stock(s) available for this part."}), 400
     db.session.commit()
 
     return jsonify({
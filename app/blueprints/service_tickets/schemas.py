@@ -1,9 +1,13 @@
-from app.models import ServiceTicket
+from app.models import ServiceTicket, SerializedPart
 from app.extensions import ma
 from marshmallow import fields
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from functools import lru_cache
+from app.utils.compiled_schema import CompiledSchema
 class ServiceTicketSchema(ma.SQLAlchemyAutoSchema):
     
     mechanic_ids = fields.List(fields.Int()) 
+    auto_assign = fields.Boolean(load_only=True)
     mechanics = fields.Nested("MechanicSchema", many=True, exclude=["service_tickets"])
     customer = fields.Nested("CustomerSchema")
     ticket_items = fields.Nested("SerializedPartSchema", many=True, exclude=["ticket"])
@@ -11,15 +15,62 @@ class ServiceTicketSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = ServiceTicket
         include_fk = True 
-        fields = ("id", "service_date", "service_desc", "vin", "customer_id", "customer", "mechanic_ids", "mechanics", "ticket_items")
+        fields = ("id", "service_date", "service_desc", "vin", "customer_id", "customer", "mechanic_ids", "auto_assign", "mechanics", "ticket_items")
 
 class EditServiceTicketSchema(ma.Schema):
     add_mechanic_ids = fields.List(fields.Int())
     remove_mechanic_ids = fields.List(fields.Int())
+    auto_assign = fields.Boolean()
     class Meta:
-        fields = ("add_mechanic_ids", "remove_mechanic_ids")
+        fields = ("add_mechanic_ids", "remove_mechanic_ids", "auto_assign")
         
+class AutoAssignSchema(ma.Schema):
+    service_date = fields.Date(required=True)
+    class Meta:
+        fields = ("service_date",)
+        
+# Loader plan for every relationship ServiceTicketSchema dumps, so reads are
+# served in a fixed number of queries instead of one per nested row.
+service_ticket_relationship_loaders = {
+    "customer": joinedload(ServiceTicket.customer),
+    "mechanics": selectinload(ServiceTicket.mechanics),
+    "ticket_items": selectinload(ServiceTicket.ticket_items).joinedload(SerializedPart.description),
+}
+service_ticket_load_options = tuple(service_ticket_relationship_loaders.values())
+
+service_ticket_columns = ("id", "service_date", "service_desc", "vin", "customer_id")
+
+@lru_cache(maxsize=64)
+def sparse_service_ticket_schema(only, many=False):
+    return CompiledSchema(ServiceTicketSchema(only=only, many=many), register=False)
+
+# Builds the schema and loader options for the `fields` / `include` query
+# parameters. Only the requested columns are selected (id and service_date are
+# always loaded for cursors) and only the included relationships are loaded.
+# Returns (None, None) when neither parameter is given.
+def sparse_service_ticket_plan(fields_param, include_param, many=False):
+    if fields_param is None and include_param is None:
+        return None, None
+    requested_fields = tuple(dict.fromkeys(name.strip() for name in (fields_param or "").split(",") if name.strip()))
+    includes = tuple(dict.fromkeys(name.strip() for name in (include_param or "").split(",") if name.strip()))
+    unknown = [name for name in requested_fields if name not in service_ticket_columns]
+    unknown += [name for name in includes if name not in service_ticket_relationship_loaders]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    if not requested_fields:
+        requested_fields = service_ticket_columns
+
+    columns = dict.fromkeys(("id", "service_date") + requested_fields)
+    options = [load_only(*(getattr(ServiceTicket, name) for name in columns))]
+    options += [service_ticket_relationship_loaders[name] for name in includes]
+    return sparse_service_ticket_schema(requested_fields + includes, many), options
+
 service_ticket_schema = ServiceTicketSchema()
 service_tickets_schema = ServiceTicketSchema(many=True) 
 return_service_ticket_schema = ServiceTicketSchema(exclude=["customer_id"])
-edit_service_ticket_schema = EditServiceTicketSchema()
\ No newline at end of file
+customer_tickets_schema = ServiceTicketSchema(many=True, exclude=["customer"])
+edit_service_ticket_schema = EditServiceTicketSchema()
+auto_assign_schema = AutoAssignSchema()
+compiled_service_ticket_schema = CompiledSchema(service_ticket_schema)
+compiled_service_tickets_schema = CompiledSchema(service_tickets_schema)
+compiled_customer_tickets_schema = CompiledSchema(customer_tickets_schema)
\ No newline at end of file
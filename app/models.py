@@ -1,6 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from datetime import date
+from sqlalchemy import event, inspect, select, update, insert, delete
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+from datetime import date, datetime, timezone
 from typing import List
 
 class Base(DeclarativeBase):
@@ -8,11 +11,22 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Microsecond precision everywhere (MySQL DATETIME defaults to whole seconds),
+# so two writes in the same second still produce different ETags.
+Timestamp = db.DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
 service_mechanic = db.Table(
     "service_mechanic",
     Base.metadata,
     db.Column("ticket_id",db.ForeignKey("service_tickets.id")),
-    db.Column("mechanic_id",db.ForeignKey("mechanics.id"))
+    db.Column("mechanic_id",db.ForeignKey("mechanics.id")),
+    # Covers per-mechanic counts and the join back to the ticket's service date.
+    db.Index("ix_service_mechanic_mechanic_ticket", "mechanic_id", "ticket_id"),
+    # Covers a ticket's mechanics (detail ETags and loaders).
+    db.Index("ix_service_mechanic_ticket", "ticket_id")
 )
 
 class Customer(Base):
@@ -22,6 +36,7 @@ class Customer(Base):
     email: Mapped[str] = mapped_column(db.String(100),unique=True, nullable=False)
     phone: Mapped[str] = mapped_column(db.String(100), nullable=False)
     password: Mapped[str] = mapped_column(db.String(255), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, default=utcnow, onupdate=utcnow, index=True, nullable=False)
 
     service_tickets: Mapped[List["ServiceTicket"]] = db.relationship(back_populates="customer" ,cascade="all, delete")
     
@@ -34,17 +49,21 @@ class Mechanic(Base):
     password: Mapped[str] = mapped_column(db.String(255), nullable=False)
     phone: Mapped[str] = mapped_column(db.String(100), nullable=False)
     salary: Mapped[float] = mapped_column(db.Numeric(10, 2), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, default=utcnow, onupdate=utcnow, index=True, nullable=False)
     
     service_tickets: Mapped[List["ServiceTicket"]] = db.relationship(secondary=service_mechanic,back_populates="mechanics")
 
 class ServiceTicket(Base):
     __tablename__ = "service_tickets"
+    # Serves a customer's tickets newest first, one index range per page.
+    __table_args__ = (db.Index("ix_service_tickets_customer_date", "customer_id", "service_date", "id"),)
     
     id: Mapped[int] = mapped_column(primary_key=True)
     vin: Mapped[str] = mapped_column(db.String(255), nullable=False)
-    service_date: Mapped[date] = mapped_column(nullable=False)
+    service_date: Mapped[date] = mapped_column(nullable=False, index=True)
     service_desc: Mapped[str] = mapped_column(db.String(255), nullable=False)
     customer_id: Mapped[int] = mapped_column(db.ForeignKey("customers.id"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, default=utcnow, onupdate=utcnow, index=True, nullable=False)
     
     customer: Mapped["Customer"] = db.relationship(back_populates="service_tickets")
     mechanics: Mapped[List["Mechanic"]] = db.relationship(secondary=service_mechanic, back_populates="service_tickets")
@@ -57,15 +76,213 @@ class PartDescription(Base):
     name: Mapped[str] = mapped_column(db.String(255), nullable=False)
     brand: Mapped[str] = mapped_column(db.String(255), nullable=False)
     price: Mapped[float] = mapped_column(db.Numeric(10, 2), nullable=False)
+    # Denormalized stock counters, kept in step with serialized_parts by the
+    # flush hooks below and by adjust_stock() for Core-level writes.
+    available_count: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
+    total_count: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
+    # Reorder thresholds: reorder once stock falls to reorder_point (or to the
+    # demand expected over the supplier's lead time, whichever is higher).
+    reorder_point: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
+    lead_time_days: Mapped[int] = mapped_column(nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, default=utcnow, onupdate=utcnow, index=True, nullable=False)
     
     serial_items : Mapped[List["SerializedPart"]] = db.relationship(back_populates="description")
 
 class SerializedPart(Base):
     __tablename__ = "serialized_parts"
+    # Covers the per-description stock aggregate and in-stock lookups.
+    __table_args__ = (db.Index("ix_serialized_parts_desc_ticket", "desc_id", "ticket_id"),)
     
     id: Mapped[int] = mapped_column(primary_key=True)
     desc_id: Mapped[int] = mapped_column(db.ForeignKey('part_descriptions.id'), nullable=False)
-    ticket_id: Mapped[int] = mapped_column(db.ForeignKey('service_tickets.id'), nullable=True)
+    ticket_id: Mapped[int] = mapped_column(db.ForeignKey('service_tickets.id'), nullable=True, index=True)
+    updated_at: Mapped[datetime] = mapped_column(Timestamp, default=utcnow, onupdate=utcnow, index=True, nullable=False)
     
     description: Mapped["PartDescription"] = db.relationship(back_populates="serial_items")
-    ticket: Mapped["ServiceTicket"] = db.relationship(back_populates="ticket_items")
\ No newline at end of file
+    ticket: Mapped["ServiceTicket"] = db.relationship(back_populates="ticket_items")
+
+class MechanicWorkload(Base):
+    __tablename__ = "mechanic_workloads"
+    # Tickets per mechanic per service day, kept in step with service_mechanic
+    # by the flush hook below and by adjust_workload() for Core-level writes.
+
+    mechanic_id: Mapped[int] = mapped_column(db.ForeignKey("mechanics.id"), primary_key=True)
+    service_date: Mapped[date] = mapped_column(primary_key=True, index=True)
+    ticket_count: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
+
+# Collection-only changes (e.g. ticket.mechanics.append) emit no UPDATE on the
+# owning row, so onupdate never fires for them. Touch updated_at explicitly on
+# every modified object so it tracks everything its read routes return.
+@event.listens_for(Session, "before_flush")
+def touch_updated_at(session, flush_context, instances):
+    now = utcnow()
+    for obj in session.dirty:
+        if hasattr(obj, "updated_at") and session.is_modified(obj):
+            obj.updated_at = now
+
+
+# -------------------- Stock Counters --------------------
+# Shifts a part description's stock counters with one atomic UPDATE, so
+# concurrent writers never lose an increment. Use it after Core-level
+# INSERT/UPDATE/DELETE on serialized_parts, which the flush hooks can't see.
+def adjust_stock(desc_id, available=0, total=0, connection=None):
+    if not available and not total:
+        return
+    statement = (
+        update(PartDescription.__table__)
+        .where(PartDescription.__table__.c.id == desc_id)
+        .values(
+            available_count=PartDescription.__table__.c.available_count + available,
+            total_count=PartDescription.__table__.c.total_count + total,
+            updated_at=utcnow()
+        )
+    )
+    (connection or db.session).execute(statement)
+
+# ORM writes to SerializedPart are tallied per description during the flush
+# and applied once per description when it completes. This also covers parts
+# released implicitly when their ticket (or its customer) is deleted.
+def _record_stock(target, desc_id, available, total):
+    deltas = Session.object_session(target).info.setdefault("stock_deltas", {})
+    pending_available, pending_total = deltas.get(desc_id, (0, 0))
+    deltas[desc_id] = (pending_available + available, pending_total + total)
+
+@event.listens_for(SerializedPart, "after_insert")
+def count_inserted_part(mapper, connection, target):
+    _record_stock(target, target.desc_id, int(target.ticket_id is None), 1)
+
+@event.listens_for(SerializedPart, "after_delete")
+def count_deleted_part(mapper, connection, target):
+    state = inspect(target)
+    desc_id = state.attrs.desc_id.history.deleted or [target.desc_id]
+    ticket_id = state.attrs.ticket_id.history.deleted or [target.ticket_id]
+    _record_stock(target, desc_id[0], -int(ticket_id[0] is None), -1)
+
+@event.listens_for(SerializedPart, "after_update")
+def count_updated_part(mapper, connection, target):
+    state = inspect(target)
+    desc_history = state.attrs.desc_id.history
+    ticket_history = state.attrs.ticket_id.history
+    if not desc_history.has_changes() and not ticket_history.has_changes():
+        return
+    old_desc = desc_history.deleted[0] if desc_history.deleted else target.desc_id
+    old_ticket = ticket_history.deleted[0] if ticket_history.deleted else target.ticket_id
+    _record_stock(target, old_desc, -int(old_ticket is None), -1)
+    _record_stock(target, target.desc_id, int(target.ticket_id is None), 1)
+
+@event.listens_for(Session, "after_flush")
+def apply_stock_deltas(session, flush_context):
+    deltas = session.info.pop("stock_deltas", None)
+    for desc_id, (available, total) in (deltas or {}).items():
+        adjust_stock(desc_id, available, total, connection=session.connection())
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_stock_deltas(session, previous_transaction):
+    session.info.pop("stock_deltas", None)
+
+
+# -------------------- Mechanic Workload Rollups --------------------
+# Shifts one (mechanic, service day) bucket with a single atomic upsert (or,
+# without one, an update retried after a losing insert), so concurrent
+# assignments never lose an increment. Use it after Core-level
+# INSERT/DELETE on service_mechanic, which the flush hook can't see. Shifts
+# are also listed in session.info["workload_changes"] for in-process readers
+# that apply them once the transaction commits.
+def adjust_workload(mechanic_id, service_date, delta, session=None):
+    if not delta:
+        return
+    session = session or db.session
+    connection = session.connection()
+    table = MechanicWorkload.__table__
+    values = {"mechanic_id": mechanic_id, "service_date": service_date, "ticket_count": delta}
+    dialect = connection.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(table).values(values)
+        statement = statement.on_duplicate_key_update(ticket_count=table.c.ticket_count + statement.inserted.ticket_count)
+    elif dialect in ("postgresql", "sqlite"):
+        statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.mechanic_id, table.c.service_date],
+            set_={"ticket_count": table.c.ticket_count + statement.excluded.ticket_count}
+        )
+    else:
+        # No upsert: update, else insert in a savepoint. If another transaction
+        # created the bucket in between, the insert hits the primary key and
+        # the update is retried against that row.
+        statement = None
+        bucket = (table.c.mechanic_id == mechanic_id) & (table.c.service_date == service_date)
+        increment = update(table).where(bucket).values(ticket_count=table.c.ticket_count + delta)
+        if not connection.execute(increment).rowcount:
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(values))
+            except IntegrityError:
+                connection.execute(increment)
+    if statement is not None:
+        connection.execute(statement)
+    session.info.setdefault("workload_changes", []).append((mechanic_id, service_date, delta))
+
+def _committed(state, key):
+    history = state.attrs[key].history
+    return (history.deleted or history.unchanged or history.added or [None])[0]
+
+# ORM assignment changes (ticket.mechanics or mechanic.service_tickets, ticket
+# creation and deletion, service_date edits) are read from attribute history
+# once the flush has written them, then applied in the same transaction.
+@event.listens_for(Session, "after_flush")
+def apply_workload_changes(session, flush_context):
+    changes = {}  # ticket -> {mechanic: +1 added / -1 removed}
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, ServiceTicket):
+            history = inspect(obj).attrs.mechanics.history
+            pairs = [(obj, mechanic, 1) for mechanic in history.added] + [(obj, mechanic, -1) for mechanic in history.deleted]
+        elif isinstance(obj, Mechanic):
+            history = inspect(obj).attrs.service_tickets.history
+            pairs = [(ticket, obj, 1) for ticket in history.added] + [(ticket, obj, -1) for ticket in history.deleted]
+        else:
+            continue
+        for ticket, mechanic, sign in pairs:
+            changes.setdefault(ticket, {})[mechanic] = sign
+
+    # Rollups of mechanics deleted in this flush are dropped with them.
+    deleted_mechanic_ids = {obj.id for obj in session.deleted if isinstance(obj, Mechanic)}
+    deltas = {}
+    def record(mechanic_ids, service_date, delta):
+        for mechanic_id in mechanic_ids:
+            if mechanic_id not in deleted_mechanic_ids:
+                deltas[(mechanic_id, service_date)] = deltas.get((mechanic_id, service_date), 0) + delta
+
+    tickets = dict.fromkeys([*changes, *(obj for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, ServiceTicket))])
+    for ticket in tickets:
+        state = inspect(ticket)
+        if state.session is not session:  # appended to a collection but never added
+            continue
+        old_date = _committed(state, "service_date")
+        if ticket in session.deleted:
+            history = state.attrs.mechanics.history
+            record([mechanic.id for mechanic in (*history.unchanged, *history.deleted)], old_date, -1)
+        elif ticket in session.new or old_date == ticket.service_date:
+            for mechanic, sign in changes.get(ticket, {}).items():
+                record([mechanic.id], ticket.service_date, sign)
+        else:
+            # The ticket moved to another day: every assignment moves with it.
+            pending = {mechanic.id: sign for mechanic, sign in changes.get(ticket, {}).items()}
+            after = set(session.connection().execute(
+                select(service_mechanic.c.mechanic_id).where(service_mechanic.c.ticket_id == ticket.id)
+            ).scalars())
+            before = {mechanic_id for mechanic_id in after if pending.get(mechanic_id) != 1}
+            before |= {mechanic_id for mechanic_id, sign in pending.items() if sign == -1}
+            record(before, old_date, -1)
+            record(after, ticket.service_date, 1)
+
+    for (mechanic_id, service_date), delta in deltas.items():
+        adjust_workload(mechanic_id, service_date, delta, session=session)
+
+@event.listens_for(Mechanic, "before_delete")
+def drop_mechanic_workload(mapper, connection, target):
+    connection.execute(delete(MechanicWorkload.__table__).where(MechanicWorkload.__table__.c.mechanic_id == target.id))
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_workload_changes(session, previous_transaction):
+    session.info.pop("workload_changes", None)
+
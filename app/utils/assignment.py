@@ -0,0 +1,78 @@
+import heapq
+from sqlalchemy import and_, func, select
+from app.models import db, Mechanic, MechanicWorkload
+
+# Loads come straight from the mechanic_workloads rollups, which every
+# assignment change keeps up to date in the same transaction. A mechanic's
+# load for a day is the number of tickets they hold on that service_date;
+# tickets have no closed state, so every ticket on the day counts as open.
+LOCKING_DIALECTS = ("postgresql", "mysql", "mariadb")
+
+
+def _loads_query(service_date, exclude=()):
+    # One row per mechanic, joined to its rollup for the day through the
+    # (mechanic_id, service_date) primary key; no rollup row means no tickets.
+    load = func.coalesce(MechanicWorkload.ticket_count, 0)
+    query = (
+        select(Mechanic.id, load.label("load"))
+        .outerjoin(MechanicWorkload, and_(
+            MechanicWorkload.mechanic_id == Mechanic.id,
+            MechanicWorkload.service_date == service_date
+        ))
+        .order_by(load, Mechanic.id)
+    )
+    if exclude:
+        query = query.where(Mechanic.id.not_in(exclude))
+    return query
+
+
+def _lock(query, skip_locked=False):
+    # Lock the picked mechanic rows until the assignment commits. The rollup
+    # sits on the nullable side of the join, so only mechanics are locked.
+    if db.session.get_bind().dialect.name in LOCKING_DIALECTS:
+        return query.with_for_update(of=Mechanic, skip_locked=skip_locked)
+    return query
+
+
+def pick_mechanic(service_date, exclude=()):
+    """Least-loaded mechanic id for `service_date` (not in `exclude`), or None.
+
+    Ties go to the lowest id. Where row locks are supported, mechanics picked
+    by transactions still in flight are skipped, so concurrent requests spread
+    out instead of piling onto the same mechanic; when every candidate is
+    locked the pick waits for one instead.
+    """
+    query = _loads_query(service_date, exclude).limit(1)
+    mechanic_id = db.session.execute(_lock(query, skip_locked=True)).scalar()
+    if mechanic_id is None:
+        mechanic_id = db.session.execute(_lock(query)).scalar()
+    return mechanic_id
+
+
+def pick_mechanics(service_date, count, exclude=()):
+    """Mechanic ids for `count` new tickets of `service_date`, least-loaded first.
+
+    Loads are read (and locked) once; each pick then counts towards the
+    mechanic's load for the picks after it. `exclude` optionally gives, per
+    pick, the mechanic ids already on that ticket; a pick with every mechanic
+    excluded is None.
+    """
+    heap = [(load, mechanic_id) for mechanic_id, load in db.session.execute(_lock(_loads_query(service_date)))]
+    if not heap:
+        return []
+    heapq.heapify(heap)
+    picks = []
+    for index in range(count):
+        skip = exclude[index] if index < len(exclude) else ()
+        skipped = []
+        while heap and heap[0][1] in skip:
+            skipped.append(heapq.heappop(heap))
+        if heap:
+            load, mechanic_id = heapq.heappop(heap)
+            picks.append(mechanic_id)
+            heapq.heappush(heap, (load + 1, mechanic_id))
+        else:
+            picks.append(None)
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+    return picks
@@ -0,0 +1,263 @@
+import sys
+import time
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.models import db, PartDescription
+
+# How often a worker checks the table for writes made by other workers.
+SYNC_SECONDS = 5
+# Keys per chunk of a group's sorted run; a chunk splits at twice this.
+CHUNK_SIZE = 512
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+# Match groups, best first: the full name starts with the prefix, a later word
+# of the name does, the brand (or one of its words) does.
+FULL_NAME, NAME_WORD, BRAND = range(3)
+
+
+class _SortedKeys:
+    """(key, id) pairs in sorted order, stored as a list of short sorted chunks.
+
+    Each chunk is a list of keys with a parallel array of ids; `_maxes` holds
+    every chunk's last pair, so finding the chunk for a pair is a bisect and
+    inserting or deleting only shifts one chunk. Oversized chunks split in
+    two and empty ones are dropped.
+    """
+
+    def __init__(self, pairs=()):
+        pairs = list(pairs)
+        self._chunks = []
+        for start in range(0, len(pairs), CHUNK_SIZE):
+            chunk = pairs[start:start + CHUNK_SIZE]
+            self._chunks.append(([key for key, _ in chunk], array("q", (id for _, id in chunk))))
+        self._maxes = [(keys[-1], ids[-1]) for keys, ids in self._chunks]
+        self.size = len(pairs)
+
+    def _locate(self, key, id):
+        index = min(bisect_left(self._maxes, (key, id)), len(self._chunks) - 1)
+        keys, ids = self._chunks[index]
+        low = bisect_left(keys, key)
+        high = bisect_right(keys, key, low)
+        return index, bisect_left(ids, id, low, high)
+
+    def insert(self, key, id):
+        if not self._chunks:
+            self._chunks.append(([key], array("q", [id])))
+            self._maxes.append((key, id))
+            self.size = 1
+            return
+        index, position = self._locate(key, id)
+        keys, ids = self._chunks[index]
+        keys.insert(position, key)
+        ids.insert(position, id)
+        self.size += 1
+        if len(keys) > 2 * CHUNK_SIZE:
+            self._chunks[index:index + 1] = [(keys[:CHUNK_SIZE], ids[:CHUNK_SIZE]), (keys[CHUNK_SIZE:], ids[CHUNK_SIZE:])]
+            self._maxes[index:index + 1] = [(keys[CHUNK_SIZE - 1], ids[CHUNK_SIZE - 1]), (keys[-1], ids[-1])]
+        else:
+            self._maxes[index] = (keys[-1], ids[-1])
+
+    def remove(self, key, id):
+        index, position = self._locate(key, id)
+        keys, ids = self._chunks[index]
+        del keys[position]
+        del ids[position]
+        self.size -= 1
+        if keys:
+            self._maxes[index] = (keys[-1], ids[-1])
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+
+    def starting_with(self, prefix):
+        """Ids of the keys that start with `prefix`, in key order."""
+        index = bisect_left(self._maxes, (prefix,))
+        while index < len(self._chunks):
+            keys, ids = self._chunks[index]
+            position = bisect_left(keys, prefix)
+            while position < len(keys):
+                if not keys[position].startswith(prefix):
+                    return
+                yield ids[position]
+                position += 1
+            index += 1
+
+    def keys_bytes(self):
+        return (sys.getsizeof(self._chunks) + sys.getsizeof(self._maxes)
+                + sum(sys.getsizeof(keys) + sum(sys.getsizeof(key) for key in keys) for keys, _ in self._chunks))
+
+    def ids_bytes(self):
+        return sum(sys.getsizeof(ids) for _, ids in self._chunks)
+
+
+class PrefixIndex:
+    """Prefix index over part description names and brands.
+
+    Every word-start suffix of the name and of the brand is a key ("brake pad",
+    "pad", ...). Keys are kept sorted in one chunked run per match group, so a
+    lookup is a bisect plus a short forward scan per group, and results come
+    out ranked: full-name matches, then later name words, then brands; within
+    a group in key order, so an exact match comes before longer completions
+    of it. A write inserts or deletes within one chunk per key, so its cost
+    doesn't grow with the catalog; the whole index is rebuilt only at start
+    or when rows disappear behind its back.
+    """
+
+    def __init__(self):
+        self._groups = [_SortedKeys() for _ in range(3)]
+        self._labels = {}
+        self._lock = threading.Lock()
+        self.version = None
+        self.built_at = None
+        self.synced_at = 0.0
+
+    @staticmethod
+    def index_keys(name, brand):
+        """Sorted (group, key) pairs for a description."""
+        keys = set()
+        words = normalize(name).split()
+        keys.update((FULL_NAME if start == 0 else NAME_WORD, " ".join(words[start:])) for start in range(len(words)))
+        words = normalize(brand).split()
+        keys.update((BRAND, " ".join(words[start:])) for start in range(len(words)))
+        return sorted(keys)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def build(self, rows, version=None):
+        pairs = sorted((group, key, id) for id, name, brand in rows for group, key in self.index_keys(name, brand))
+        groups = [_SortedKeys((key, id) for pair_group, key, id in pairs if pair_group == group) for group in range(3)]
+        labels = {id: (name, brand) for id, name, brand in rows}
+        with self._lock:
+            self._groups, self._labels = groups, labels
+            self.version = version
+            self.built_at = time.time()
+
+    def _remove(self, id):
+        name, brand = self._labels.pop(id)
+        for group, key in self.index_keys(name, brand):
+            self._groups[group].remove(key, id)
+
+    def put(self, id, name, brand):
+        with self._lock:
+            if id in self._labels:
+                if self._labels[id] == (name, brand):
+                    return
+                self._remove(id)
+            for group, key in self.index_keys(name, brand):
+                self._groups[group].insert(key, id)
+            self._labels[id] = (name, brand)
+
+    def discard(self, id):
+        with self._lock:
+            if id in self._labels:
+                self._remove(id)
+
+    def search(self, prefix, limit=10):
+        """Top `limit` descriptions for `prefix`, best match group first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self._lock:
+            for keys in self._groups:
+                for id in keys.starting_with(prefix):
+                    if len(found) >= limit:
+                        break
+                    found.setdefault(id, self._labels[id])
+        return [{"id": id, "name": name, "brand": brand} for id, (name, brand) in found.items()]
+
+    def stats(self):
+        with self._lock:
+            keys_bytes = sum(keys.keys_bytes() for keys in self._groups)
+            ids_bytes = sum(keys.ids_bytes() for keys in self._groups)
+            labels_bytes = sys.getsizeof(self._labels) + sum(
+                sys.getsizeof(id) + sys.getsizeof(label) + sys.getsizeof(label[0]) + sys.getsizeof(label[1])
+                for id, label in self._labels.items()
+            )
+            return {
+                "part_descriptions": len(self._labels),
+                "keys": sum(keys.size for keys in self._groups),
+                "memory_bytes": keys_bytes + ids_bytes + labels_bytes,
+                "keys_bytes": keys_bytes,
+                "ids_bytes": ids_bytes,
+                "labels_bytes": labels_bytes,
+                "built_at": self.built_at,
+            }
+
+
+def _load_rows():
+    return db.session.execute(select(PartDescription.id, PartDescription.name, PartDescription.brand)).all()
+
+
+def _table_version():
+    # Newest updated_at plus the row count: a changed count after re-applying
+    # recent writes means rows were deleted. Read every SYNC_SECONDS at most.
+    return tuple(db.session.execute(select(func.max(PartDescription.updated_at), func.count())).one())
+
+
+def get_index():
+    """This worker's index, built on first use and caught up with other workers' writes."""
+    index = current_app.extensions.get("autocomplete")
+    if index is None:
+        index = current_app.extensions["autocomplete"] = PrefixIndex()
+    now = time.monotonic()
+    if index.version is None or now - index.synced_at >= SYNC_SECONDS:
+        version = _table_version()
+        if index.version is None:
+            index.build(_load_rows(), version)
+        elif version != index.version:
+            # Re-apply rows written since the last check; a count that still
+            # disagrees afterwards means deletes, which only a rebuild can see.
+            changed = select(PartDescription.id, PartDescription.name, PartDescription.brand)
+            if index.version[0] is not None:
+                changed = changed.where(PartDescription.updated_at >= index.version[0])
+            for id, name, brand in db.session.execute(changed):
+                index.put(id, name, brand)
+            if len(index) != version[1]:
+                index.build(_load_rows(), version)
+            index.version = version
+        index.synced_at = now
+    return index
+
+
+# -------------------- Incremental Updates --------------------
+# Part description writes committed by this worker are applied to its index
+# right away; other workers pick them up on their next sync.
+@event.listens_for(Session, "after_flush")
+def collect_part_descriptions(session, flush_context):
+    pending = session.info.setdefault("autocomplete", {})
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, PartDescription):
+            pending[obj.id] = (obj.name, obj.brand)
+    for obj in session.deleted:
+        if isinstance(obj, PartDescription):
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def apply_part_descriptions(session):
+    pending = session.info.pop("autocomplete", None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get("autocomplete")
+    if index is None or index.version is None:
+        return
+    for id, label in pending.items():
+        if label is None:
+            index.discard(id)
+        else:
+            index.put(id, *label)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_part_descriptions(session, previous_transaction):
+    session.info.pop("autocomplete", None)
@@ -0,0 +1,123 @@
+import itertools
+from flask import current_app
+from marshmallow import fields, missing
+from marshmallow.utils import ensure_text_type
+
+
+# Field types whose dump logic is inlined into the generated code. Anything
+# else falls back to the marshmallow field's own serialize(), so output stays
+# identical to Schema.dump() for every field.
+def _inline_expression(field, value, namespace, counter):
+    if type(field) is fields.Integer and not field.as_string:
+        return f"int({value})"
+    if type(field) is fields.String:
+        return f"{value} if {value}.__class__ is str else _text({value})"
+    if type(field) is fields.Date and (field.format or field.DEFAULT_FORMAT) in ("iso", "iso8601"):
+        return f"{value}.isoformat()"
+    if type(field) is fields.Decimal and not field.as_string:
+        name = f"_format_{next(counter)}"
+        namespace[name] = field._format_num
+        return f"{name}({value})"
+    return None
+
+
+def _has_dump_hooks(schema):
+    return any("dump" in str(tag) and hooks for tag, hooks in schema._hooks.items())
+
+
+def _compile_schema(schema, namespace, counter, source):
+    """Emit a dump function for one (non-many) schema instance and return its name."""
+    function_name = f"_dump_{next(counter)}"
+    model = getattr(schema.opts, "model", None)
+    body = [f"def {function_name}(obj):", "    out = {}"]
+
+    for field_name, field in schema.dump_fields.items():
+        attribute = field.attribute or field_name
+        key = field.data_key or field_name
+        simple = attribute.isidentifier() and field.dump_default is missing
+        if simple and model is not None and not hasattr(model, attribute):
+            # Not an attribute of the model: marshmallow finds nothing and skips it.
+            continue
+
+        if simple and type(field) is fields.Nested:
+            nested = field.schema
+            many = nested.many or field.many
+            if _has_dump_hooks(nested):
+                nested_name = f"_nested_{next(counter)}"
+                namespace[nested_name] = nested
+                call = f"{nested_name}.dump(v, many={many})"
+            else:
+                dump_name = _compile_schema(nested, namespace, counter, source)
+                call = f"[{dump_name}(item) for item in v]" if many else f"{dump_name}(v)"
+            body.append(f"    v = obj.{attribute}")
+            body.append(f"    out[{key!r}] = None if v is None else {call}")
+            continue
+
+        expression = _inline_expression(field, "v", namespace, counter) if simple else None
+        if expression is not None:
+            body.append(f"    v = obj.{attribute}")
+            body.append(f"    out[{key!r}] = None if v is None else {expression}")
+        else:
+            field_ref = f"_field_{next(counter)}"
+            accessor_ref = f"_accessor_{next(counter)}"
+            namespace[field_ref] = field
+            namespace[accessor_ref] = schema.get_attribute
+            body.append(f"    v = {field_ref}.serialize({field_name!r}, obj, accessor={accessor_ref})")
+            body.append(f"    if v is not _missing:")
+            body.append(f"        out[{key!r}] = v")
+
+    body.append("    return out")
+    source.append("\n".join(body))
+    return function_name
+
+
+def compile_schema(schema):
+    """Generate a plain-Python dump function equivalent to schema.dump() for one object."""
+    if _has_dump_hooks(schema):
+        return lambda obj: schema.dump(obj, many=False)
+    namespace = {"_missing": missing, "_text": ensure_text_type}
+    source = []
+    counter = itertools.count()
+    entry = _compile_schema(schema, namespace, counter, source)
+    exec(compile("\n\n".join(source), f"<compiled {schema.__class__.__name__}>", "exec"), namespace)
+    return namespace[entry]
+
+
+_registry = []
+
+
+def compile_all():
+    """Generate every registered serializer; called once from create_app()."""
+    for compiled in _registry:
+        compiled.compile()
+
+
+class CompiledSchema:
+    """Fast-path stand-in for a marshmallow schema on read paths.
+
+    The dump function is generated once, at startup through compile_all() or
+    on first use for unregistered instances, for the wrapped schema's exact
+    field set. Output matches
+    schema.dump(); loading and validation still go through marshmallow.
+    """
+
+    def __init__(self, schema, register=True):
+        self.schema = schema
+        self.many = schema.many
+        self._dump_one = None
+        if register:
+            _registry.append(self)
+
+    def compile(self):
+        if self._dump_one is None:
+            self._dump_one = compile_schema(self.schema)
+        return self._dump_one
+
+    def dump(self, obj, many=None):
+        dump_one = self._dump_one or self.compile()
+        if self.many if many is None else many:
+            return [dump_one(item) for item in obj]
+        return dump_one(obj)
+
+    def jsonify(self, obj, many=None):
+        return current_app.json.response(self.dump(obj, many=many))
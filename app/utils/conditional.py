@@ -0,0 +1,44 @@
+import hashlib
+from flask import request, current_app
+from sqlalchemy import select, func
+from app.models import db
+
+
+def latest_update(model, *criteria, join=None):
+    # MAX(updated_at) over the rows of `model` matching `criteria`, as a scalar
+    # subquery for row_versions(). `join` is an optional (target, onclause).
+    query = select(func.max(model.updated_at))
+    if join is not None:
+        query = query.join(*join)
+    return query.where(*criteria).scalar_subquery()
+
+
+def row_versions(*versions):
+    # One round trip for a record's own version and those of the rows it embeds,
+    # so a detail ETag only moves when something it returns changes.
+    return tuple(db.session.execute(select(*versions)).one())
+
+
+def make_etag(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def is_not_modified(etag):
+    return request.if_none_match.contains(etag)
+
+
+def not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    return response
+
+
+def is_conditional_request():
+    # Used as `unless=` on cached routes: conditional requests skip the response
+    # cache (which ignores headers) and are answered from the ETag check instead.
+    return bool(request.if_none_match)
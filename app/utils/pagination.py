@@ -0,0 +1,90 @@
+import base64
+import json
+from datetime import date
+from flask import request
+from sqlalchemy import select, and_, or_
+from app.models import db
+
+# Largest page a keyset request is served, whatever per_page asks for.
+MAX_PER_PAGE = 100
+
+
+def is_keyset_request():
+    # Cursor mode is opt-in; page/per_page requests keep using db.paginate.
+    return 'cursor' in request.args or 'after_id' in request.args
+
+
+def keyset_args():
+    # The request's position, passed on to keyset_paginate().
+    return {"cursor": request.args.get('cursor'), "after_id": request.args.get('after_id')}
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, date) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, key_columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise ValueError("Invalid cursor.")
+    try:
+        return [
+            date.fromisoformat(value) if column.type.python_type is date else column.type.python_type(value)
+            for column, value in zip(key_columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+
+def seek_after(key_columns, values, descending=False):
+    # Expanded form of (a, b) > (x, y) so every backend can range-scan the index.
+    clauses = []
+    for i, column in enumerate(key_columns):
+        equal_prefix = [key_columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column < values[i] if descending else column > values[i]))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, key_columns, per_page, cursor=None, after_id=None, descending=False):
+    """Return (items, next_cursor) for the page after `cursor` or `after_id`.
+
+    key_columns must be unique when combined; the last one is the primary key.
+    With descending=True pages run from the highest key down. per_page is
+    capped at MAX_PER_PAGE. No COUNT(*) is issued. Raises ValueError for a
+    malformed cursor or unknown after_id.
+    """
+    if per_page < 1:
+        raise ValueError("per_page must be greater than 0.")
+    per_page = min(per_page, MAX_PER_PAGE)
+    if cursor:
+        values = decode_cursor(cursor, key_columns)
+    elif after_id is not None:
+        try:
+            after_id = int(after_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid after_id.")
+        if len(key_columns) == 1:
+            values = [after_id]
+        else:
+            values = db.session.execute(select(*key_columns).where(key_columns[-1] == after_id)).first()
+            if values is None:
+                raise ValueError("Invalid after_id.")
+    else:
+        values = None
+
+    if values is not None:
+        query = query.where(seek_after(key_columns, values, descending))
+    order = [column.desc() for column in key_columns] if descending else key_columns
+    query = query.order_by(None).order_by(*order).limit(per_page + 1)
+    items = db.session.execute(query).scalars().all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in key_columns])
+    return items, next_cursor
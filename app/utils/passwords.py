@@ -0,0 +1,61 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing and checks run on a small shared pool instead of inline on
+# every request thread. hashlib's scrypt/pbkdf2 release the GIL, so threads
+# give real parallelism, and capping them keeps a login burst from starting
+# more KDF runs (~32 MB each for scrypt) than there are cores. Work beyond the
+# pool plus a short queue is refused straight away rather than piling up.
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS") or min(os.cpu_count() or 1, 8))
+HASH_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASH_QUEUE") or 4 * HASH_WORKERS)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+class PasswordHasher:
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` on the pool and wait for it; PasswordHasherBusy when no slot is free."""
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_hasher = None
+_hasher_pid = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    """This process's hashing pool, created on first use (and again after a fork)."""
+    global _hasher, _hasher_pid
+    if _hasher is None or _hasher_pid != os.getpid():
+        with _hasher_lock:
+            if _hasher is None or _hasher_pid != os.getpid():
+                _hasher, _hasher_pid = PasswordHasher(), os.getpid()
+    return _hasher
+
+
+def hash_password(password):
+    return get_hasher().run(generate_password_hash, password)
+
+
+def verify_password(pwhash, password):
+    return get_hasher().run(check_password_hash, pwhash, password)
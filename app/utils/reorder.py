@@ -0,0 +1,61 @@
+from datetime import timedelta
+from sqlalchemy import select, func
+from app.models import db, PartDescription, SerializedPart, ServiceTicket
+
+
+def consumption_counts(start, end):
+    """Units put on tickets serviced in (start, end], per part description.
+
+    One join of serialized_parts to service_tickets, filtered on the indexed
+    service_date and grouped by desc_id.
+    """
+    return (
+        select(SerializedPart.desc_id, func.count().label("consumed"))
+        .join(ServiceTicket, ServiceTicket.id == SerializedPart.ticket_id)
+        .where(ServiceTicket.service_date > start, ServiceTicket.service_date <= end)
+        .group_by(SerializedPart.desc_id)
+        .subquery()
+    )
+
+
+def reorder_report(as_of, window_days, lead_days, include_all=False):
+    """Reorder suggestions from consumption over the `window_days` ending at `as_of`.
+
+    The daily rate is units consumed in the window over its length. A part
+    needs reordering once its available stock is at or below its threshold:
+    the larger of its reorder_point and the demand expected during its lead
+    time (lead_time_days, or `lead_days` when unset). The suggested quantity
+    restocks to the threshold plus one more lead time of demand. Most urgent
+    parts (fewest days of cover) come first.
+    """
+    consumed = consumption_counts(as_of - timedelta(days=window_days), as_of)
+    query = (
+        select(
+            PartDescription.id, PartDescription.name, PartDescription.brand, PartDescription.available_count,
+            PartDescription.reorder_point, PartDescription.lead_time_days, func.coalesce(consumed.c.consumed, 0)
+        )
+        .outerjoin(consumed, consumed.c.desc_id == PartDescription.id)
+    )
+    items = []
+    for desc_id, name, brand, available, reorder_point, lead_time_days, units in db.session.execute(query):
+        lead = lead_time_days or lead_days
+        lead_demand = -(-units * lead // window_days)
+        threshold = max(reorder_point, lead_demand)
+        reorder = threshold > 0 and available <= threshold
+        if not reorder and not include_all:
+            continue
+        items.append({
+            "desc_id": desc_id,
+            "name": name,
+            "brand": brand,
+            "available": available,
+            "consumed": units,
+            "daily_rate": round(units / window_days, 4),
+            "days_of_cover": round(available * window_days / units, 1) if units else None,
+            "lead_time_days": lead,
+            "threshold": threshold,
+            "reorder": reorder,
+            "suggested_quantity": max(threshold + lead_demand - available, 1) if reorder else 0,
+        })
+    items.sort(key=lambda item: (not item["reorder"], item["days_of_cover"] is None, item["days_of_cover"] or 0, item["desc_id"]))
+    return items
@@ -0,0 +1,82 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, update
+from sqlalchemy.schema import CreateColumn
+from app.models import db, utcnow
+from app.utils.stock import reconcile_stock
+from app.utils.workload import rebuild_workload
+
+
+def _column_ddl(connection, table, column):
+    # A NOT NULL column with no server default can't be added to a table that
+    # already has rows: add it as nullable, backfill it, then tighten it.
+    preparer = connection.dialect.identifier_preparer
+    if column.nullable or column.server_default is not None:
+        spec = CreateColumn(column).compile(dialect=connection.dialect)
+    else:
+        spec = f"{preparer.format_column(column)} {column.type.compile(dialect=connection.dialect)}"
+    return f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {spec}"
+
+
+def _backfill(connection, table, column):
+    connection.execute(update(table).where(column.is_(None)).values({column.name: utcnow()}))
+    preparer = connection.dialect.identifier_preparer
+    name, column_type = preparer.format_column(column), column.type.compile(dialect=connection.dialect)
+    dialect = connection.dialect.name
+    # SQLite can't alter a column; the ORM always sets these, so nullable is harmless there.
+    if dialect == "postgresql":
+        connection.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {name} SET NOT NULL")
+    elif dialect in ("mysql", "mariadb"):
+        connection.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} MODIFY COLUMN {name} {column_type} NOT NULL")
+
+
+def upgrade_schema():
+    """Bring a database created by an earlier release up to the current models.
+
+    create_all() only creates missing tables, so columns and indexes added to
+    existing tables since (updated_at, the stock counters and reorder fields,
+    the new indexes) are added here. Safe to run repeatedly. Returns the
+    tables, columns and indexes it created, as "kind name" strings.
+    """
+    engine = db.engine
+    changes = []
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                table.create(connection)
+                changes.append(f"table {table.name}")
+
+        inspector = inspect(connection)
+        for table in db.metadata.sorted_tables:
+            if f"table {table.name}" in changes:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                connection.exec_driver_sql(_column_ddl(connection, table, column))
+                if not column.nullable and column.server_default is None:
+                    _backfill(connection, table, column)
+                changes.append(f"column {table.name}.{column.name}")
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(f"index {index.name}")
+    return changes
+
+
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Add the tables, columns and indexes an existing database is missing."""
+    changes = upgrade_schema()
+    for change in changes:
+        click.echo(f"Added {change}")
+    # New counters start at zero and new rollups empty: fill them from the rows.
+    if "column part_descriptions.available_count" in changes:
+        click.echo(f"Recounted stock for {len(reconcile_stock())} part description(s).")
+    if "table mechanic_workloads" in changes:
+        click.echo(f"Rebuilt {rebuild_workload()} mechanic workload bucket(s).")
+    click.echo(f"Schema up to date ({len(changes)} change(s)).")
@@ -0,0 +1,169 @@
+import re
+import weakref
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, select, func, case, or_, inspect, literal_column, table, text
+from sqlalchemy.dialects import mysql
+from app.models import db, PartDescription
+
+# Catalog search over part description name/brand, on whatever full-text
+# engine the database has:
+#   sqlite      FTS5 external-content table, kept in sync by triggers
+#   mysql       FULLTEXT indexes, maintained by InnoDB
+#   postgresql  GIN indexes on to_tsvector('simple', ...), maintained by Postgres
+# Anything else (or a database whose index was never built) falls back to
+# LIKE matching ranked by CASE scoring. Every backend matches word prefixes,
+# so "brak pa" finds "Brake Pad".
+
+SEARCH_TABLE = "part_descriptions_fts"
+FULLTEXT_INDEX = "ix_part_descriptions_fulltext"
+MAX_TERMS = 8
+
+SEARCH_DDL = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        "name, brand, content='part_descriptions', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS part_descriptions_fts_insert AFTER INSERT ON part_descriptions BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}(rowid, name, brand) VALUES (new.id, new.name, new.brand); END",
+        f"CREATE TRIGGER IF NOT EXISTS part_descriptions_fts_delete AFTER DELETE ON part_descriptions BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand); END",
+        # Only name/brand edits touch the index; stock counter updates don't.
+        f"CREATE TRIGGER IF NOT EXISTS part_descriptions_fts_update AFTER UPDATE OF name, brand ON part_descriptions BEGIN "
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand); "
+        f"INSERT INTO {SEARCH_TABLE}(rowid, name, brand) VALUES (new.id, new.name, new.brand); END",
+    ],
+    "mysql": [
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON part_descriptions (name, brand)",
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX}_name ON part_descriptions (name)",
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX}_brand ON part_descriptions (brand)",
+    ],
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_part_descriptions_tsv ON part_descriptions "
+        "USING gin (to_tsvector('simple', name || ' ' || brand))",
+        "CREATE INDEX IF NOT EXISTS ix_part_descriptions_tsv_name ON part_descriptions USING gin (to_tsvector('simple', name))",
+        "CREATE INDEX IF NOT EXISTS ix_part_descriptions_tsv_brand ON part_descriptions USING gin (to_tsvector('simple', brand))",
+    ],
+}
+SEARCH_DDL["mariadb"] = SEARCH_DDL["mysql"]
+
+def _has_fts5(ddl, target, bind, **kw):
+    options = bind.exec_driver_sql("PRAGMA compile_options").scalars().all()
+    return "ENABLE_FTS5" in options
+
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        condition = _has_fts5 if dialect == "sqlite" else None
+        event.listen(PartDescription.__table__, "after_create", DDL(statement).execute_if(dialect=dialect, callable_=condition))
+event.listen(PartDescription.__table__, "before_drop", DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite"))
+
+
+def search_terms(value):
+    return re.findall(r"\w+", (value or "").lower())[:MAX_TERMS]
+
+
+_backends = weakref.WeakKeyDictionary()
+
+
+def search_backend():
+    engine = db.engine
+    if engine not in _backends:
+        dialect = engine.dialect.name
+        inspector = inspect(engine)
+        if dialect == "sqlite" and inspector.has_table(SEARCH_TABLE):
+            _backends[engine] = "fts5"
+        elif dialect in ("mysql", "mariadb") and any(index["name"] == FULLTEXT_INDEX for index in inspector.get_indexes("part_descriptions")):
+            _backends[engine] = "fulltext"
+        elif dialect == "postgresql":
+            _backends[engine] = "tsvector"
+        else:
+            _backends[engine] = "like"
+    return _backends[engine]
+
+
+def _fields(q, name, brand):
+    # (columns, terms) per requested filter; `q` searches name and brand together.
+    requested = (((PartDescription.name, PartDescription.brand), q), ((PartDescription.name,), name), ((PartDescription.brand,), brand))
+    return [(columns, search_terms(value)) for columns, value in requested if search_terms(value)]
+
+
+def _fts5(fields):
+    clauses = []
+    for columns, terms in fields:
+        expression = " AND ".join(f'"{term}"*' for term in terms)
+        clauses.append(f"({expression})" if len(columns) > 1 else f"{columns[0].key} : ({expression})")
+    fts = table(SEARCH_TABLE)
+    return (
+        select(literal_column("rowid").label("id"), literal_column(f"bm25({SEARCH_TABLE}, 2.0, 1.0)").label("rank"))
+        .select_from(fts)
+        .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=" AND ".join(clauses)))
+    )
+
+
+def _fulltext(fields):
+    scores = [
+        mysql.match(*columns, against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+        for columns, terms in fields
+    ]
+    return select(PartDescription.id, (-sum(scores[1:], scores[0])).label("rank")).where(*(score > 0 for score in scores))
+
+
+def _tsvector(fields):
+    def vector(columns):
+        document = columns[0] if len(columns) == 1 else columns[0].concat(literal_column("' '")).concat(columns[1])
+        return func.to_tsvector(literal_column("'simple'"), document)
+    matches = [
+        (vector(columns), func.to_tsquery(literal_column("'simple'"), " & ".join(f"{term}:*" for term in terms)))
+        for columns, terms in fields
+    ]
+    ranks = [func.ts_rank(document, query) for document, query in matches]
+    return (
+        select(PartDescription.id, (-sum(ranks[1:], ranks[0])).label("rank"))
+        .where(*(document.op("@@")(query) for document, query in matches))
+    )
+
+
+def _like(fields):
+    filters, scores = [], []
+    for columns, terms in fields:
+        for term in terms:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            filters.append(or_(*(column.ilike(f"%{escaped}%", escape="\\") for column in columns)))
+            # Matches at the start of a word outrank matches inside one.
+            word_start = or_(*(
+                condition for column in columns
+                for condition in (column.ilike(f"{escaped}%", escape="\\"), column.ilike(f"% {escaped}%", escape="\\"))
+            ))
+            scores.append(case((word_start, 2), else_=1))
+    return select(PartDescription.id, (-sum(scores[1:], scores[0])).label("rank")).where(*filters)
+
+
+_RANKERS = {"fts5": _fts5, "fulltext": _fulltext, "tsvector": _tsvector, "like": _like}
+
+
+def ranked_part_descriptions(q=None, name=None, brand=None):
+    """Select (id, rank) of matching part descriptions; lower rank is a better match.
+
+    Returns None when the filters contain nothing searchable.
+    """
+    fields = _fields(q, name, brand)
+    if not fields:
+        return None
+    return _RANKERS[search_backend()](fields).subquery("ranked")
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Create the catalog search index if missing and re-index every part description."""
+    engine = db.engine
+    dialect = engine.dialect.name
+    existing = {index["name"] for index in inspect(engine).get_indexes("part_descriptions")}
+    with engine.begin() as connection:
+        for statement in SEARCH_DDL.get(dialect, []):
+            if dialect in ("mysql", "mariadb") and statement.split()[3] in existing:
+                continue
+            connection.exec_driver_sql(statement)
+        if dialect == "sqlite":
+            connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    _backends.pop(engine, None)
+    click.echo(f"Catalog search index ready ({search_backend()}).")
@@ -0,0 +1,62 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, func, case, bindparam, or_
+from app.models import db, PartDescription, SerializedPart, utcnow
+
+
+def stock_counts():
+    """Per-description unit counts straight from serialized_parts.
+
+    One GROUP BY desc_id pass; `available` counts units not on a ticket.
+    COUNT(CASE ...) rather than COUNT(*) FILTER (WHERE ...): same plan, but
+    MySQL has no FILTER clause.
+    """
+    return (
+        select(
+            SerializedPart.desc_id,
+            func.count(case((SerializedPart.ticket_id.is_(None), 1))).label("available"),
+            func.count().label("total")
+        )
+        .group_by(SerializedPart.desc_id)
+        .subquery()
+    )
+
+
+def reconcile_stock(dry_run=False):
+    """Repair drift between PartDescription's stock counters and serialized_parts.
+
+    Returns (desc_id, stored_available, actual_available, stored_total, actual_total)
+    for every description that was out of step.
+    """
+    counts = stock_counts()
+    available = func.coalesce(counts.c.available, 0)
+    total = func.coalesce(counts.c.total, 0)
+    query = (
+        select(PartDescription.id, PartDescription.available_count, available, PartDescription.total_count, total)
+        .outerjoin(counts, counts.c.desc_id == PartDescription.id)
+        .where(or_(PartDescription.available_count != available, PartDescription.total_count != total))
+        .order_by(PartDescription.id)
+    )
+    drift = [tuple(row) for row in db.session.execute(query)]
+    if drift and not dry_run:
+        table = PartDescription.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("desc_id"))
+            .values(available_count=bindparam("available"), total_count=bindparam("total"), updated_at=utcnow()),
+            [{"desc_id": row[0], "available": row[2], "total": row[4]} for row in drift]
+        )
+        db.session.commit()
+    return drift
+
+
+@click.command("reconcile-stock")
+@click.option("--dry-run", is_flag=True, help="Report drift without repairing it.")
+@with_appcontext
+def reconcile_stock_command(dry_run):
+    """Recount part description stock counters from serialized_parts."""
+    drift = reconcile_stock(dry_run=dry_run)
+    for desc_id, stored_available, available, stored_total, total in drift:
+        click.echo(f"part description {desc_id}: available {stored_available} -> {available}, total {stored_total} -> {total}")
+    verb = "Found" if dry_run else "Repaired"
+    click.echo(f"{verb} {len(drift)} part description(s) with stock drift.")
@@ -0,0 +1,138 @@
+import os
+import functools
+from flask import request, has_app_context, make_response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.extensions import cache
+from app.utils.conditional import make_etag, is_conditional_request
+
+# Tag-versioned response cache on top of app.extensions.cache.
+#
+# Every tag ("part_descriptions", "part_descriptions:5") has a version token
+# in the cache, and an entry's key embeds the current token of each of its
+# tags. Invalidating a tag just replaces its token, so every entry that
+# depended on it becomes unreachable and ages out on its own. Tags are bumped
+# after a commit from the rows the session wrote, so a committed write is
+# never followed by a stale read. Share the cache backend (e.g. Redis) across
+# workers for invalidation to reach all of them.
+
+WILDCARD = "*"
+
+
+def entity_tags(model, id=None):
+    """Tags for a cached view that reads `model` rows, or just the row `id`."""
+    table = model.__tablename__
+    if id is None:
+        return [table]
+    # Row entries also follow the table's wildcard tag, which bulk (Core)
+    # writes bump because they can't say which rows they touched.
+    return [f"{table}:{id}", f"{table}:{WILDCARD}"]
+
+
+def _version_key(tag):
+    return f"tag-version/{tag}"
+
+
+def tag_versions(tags):
+    keys = [_version_key(tag) for tag in tags]
+    versions = cache.get_many(*keys)
+    missing = {key: os.urandom(6).hex() for key, version in zip(keys, versions) if version is None}
+    if missing:
+        cache.set_many(missing, timeout=0)
+        versions = [version or missing[key] for key, version in zip(keys, versions)]
+    return versions
+
+
+def invalidate_tags(tags):
+    if tags and has_app_context():
+        cache.set_many({_version_key(tag): os.urandom(6).hex() for tag in tags}, timeout=0)
+
+
+def list_etag(*sources):
+    """ETag for a list view over the tables of `sources` (models or Table objects).
+
+    Built from the tables' tag versions, which every committed write bumps,
+    so checking it costs one cache read instead of a query per table. The
+    query string is part of the tag so every page gets its own.
+    """
+    tags = [getattr(source, "__tablename__", None) or source.name for source in sources]
+    return make_etag(request.full_path, *tag_versions(tags))
+
+
+def cached_by_tags(timeout, tags):
+    """Cache a GET view's 200 responses until `timeout` or until a tag changes.
+
+    `tags` is called with the view's keyword arguments and returns the tags
+    the response depends on (see entity_tags). The query string is part of
+    the key; conditional requests bypass the cache and hit the ETag check.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if is_conditional_request():
+                return view(*args, **kwargs)
+            # Versions are read before the view runs: a write committing
+            # mid-request bumps them, so its result is stored under a dead key.
+            view_tags = sorted(tags(**kwargs))
+            key = "tagged-view/" + request.full_path + "/" + ".".join(tag_versions(view_tags))
+            hit = cache.get(key)
+            if hit is not None:
+                body, status, headers = hit
+                return make_response(body, status, headers)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, (response.get_data(), response.status_code, list(response.headers.items())), timeout=timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+# -------------------- Invalidation Hooks --------------------
+# ORM writes tag the row itself and every row it references through a foreign
+# key (old and new values), since parents embed or count their children.
+def _row_tags(obj):
+    state = inspect(obj)
+    mapper = state.mapper
+    table = mapper.local_table
+    tags = {table.name}
+    identity = mapper.primary_key_from_instance(obj)
+    if len(identity) == 1 and identity[0] is not None:
+        tags.add(f"{table.name}:{identity[0]}")
+    for column in table.columns:
+        for foreign_key in column.foreign_keys:
+            history = state.attrs[mapper.get_property_by_column(column).key].history
+            parent = foreign_key.column.table.name
+            for value in (*history.added, *history.unchanged, *history.deleted):
+                if value is not None:
+                    tags.update((parent, f"{parent}:{value}"))
+    return tags
+
+
+def _pending_tags(session):
+    return session.info.setdefault("cache_tags", set())
+
+
+@event.listens_for(Session, "after_flush")
+def collect_flushed_tags(session, flush_context):
+    pending = _pending_tags(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        pending.update(_row_tags(obj))
+
+
+# Core INSERT/UPDATE/DELETE through the session (bulk reservations, stock
+# counter updates) don't go through the flush, so they bump the whole table.
+@event.listens_for(Session, "do_orm_execute")
+def collect_statement_tags(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table.name
+        _pending_tags(orm_execute_state.session).update((table, f"{table}:{WILDCARD}"))
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed_tags(session):
+    invalidate_tags(session.info.pop("cache_tags", None))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_pending_tags(session, previous_transaction):
+    session.info.pop("cache_tags", None)
@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
 from jose import jwt
 import jose
+import hashlib
+import threading
+import time
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
 from dotenv import load_dotenv
 import os
 
@@ -21,56 +25,67 @@ def encode_token(user_id, role="user"):
     token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
     return token
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        # Look for the token in the Authorization header
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split()[1]
-            
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
+# -------------------- Token Verification --------------------
+# Verified tokens are kept in a bounded LRU keyed by a SHA-256 digest of the
+# token, so repeat callers skip the HMAC check and claims parsing. Only tokens
+# that passed jwt.decode are stored, and an entry stops being served at the
+# token's own exp.
+TOKEN_CACHE_SIZE = 4096
+_verified_tokens = OrderedDict()
+_verified_tokens_lock = threading.Lock()
 
-        try:
-            # Decode the token
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            request.userid = int(data['sub'])  # Fetch the user ID
-            if not data['role'] == "user":
-                return jsonify({'message': 'Access denied!'}), 403
-        except jose.exceptions.ExpiredSignatureError:
-             return jsonify({'message': 'Token has expired!'}), 401
-        except jose.exceptions.JWTError:
-             return jsonify({'message': 'Invalid token!'}), 401
-
-        return f(*args, **kwargs)
-    return decorated
+def decode_token(token):
+    key = hashlib.sha256(token.encode()).digest()
+    with _verified_tokens_lock:
+        entry = _verified_tokens.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if expires_at >= time.time():
+                _verified_tokens.move_to_end(key)
+                return claims
+            del _verified_tokens[key]
+            raise jose.exceptions.ExpiredSignatureError("Signature has expired.")
+    claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    if 'exp' in claims:
+        with _verified_tokens_lock:
+            _verified_tokens[key] = (claims, claims['exp'])
+            if len(_verified_tokens) > TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+    return claims
 
-def mechanic_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        # Look for the token in the Authorization header
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split()[1]
-            
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
+# Decodes the request's bearer token once and keeps the outcome in flask.g:
+# (claims, None) on success, (None, (error, status)) otherwise.
+def request_auth():
+    if 'auth' not in g:
+        parts = request.headers.get('Authorization', '').split()
+        if len(parts) < 2:
+            g.auth = (None, ('Token is missing!', 401))
+        else:
+            try:
+                g.auth = (decode_token(parts[1]), None)
+            except jose.exceptions.ExpiredSignatureError:
+                g.auth = (None, ('Token has expired!', 401))
+            except jose.exceptions.JWTError:
+                g.auth = (None, ('Invalid token!', 401))
+    return g.auth
 
-        try:
-            # Decode the token
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            request.userid = int(data['sub'])  # Fetch the user ID
-            if not data['role'] == "mechanic":
+def role_required(role):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            claims, error = request_auth()
+            if error:
+                message, status = error
+                return jsonify({'message': message}), status
+            request.userid = int(claims['sub'])  # Fetch the user ID
+            if not claims['role'] == role:
                 return jsonify({'message': 'Access denied!'}), 403
-        except jose.exceptions.ExpiredSignatureError:
-             return jsonify({'message': 'Token has expired!'}), 401
-        except jose.exceptions.JWTError:
-             return jsonify({'message': 'Invalid token!'}), 401
-
-        return f(*args, **kwargs)
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
 
-    return decorated
+token_required = role_required("user")
+mechanic_required = role_required("mechanic")
 
 # def role_required(*roles):
 #     def decorator(f):
@@ -0,0 +1,100 @@
+import numpy as np
+from decimal import Decimal
+from sqlalchemy import select
+from app.models import db, PartDescription, SerializedPart, ServiceTicket
+
+# Inventory valuation reports. Columns are pulled in bulk (filtered in SQL,
+# no ORM objects) and aggregated as NumPy arrays: lookups are fancy
+# indexing and grouping is np.unique + np.bincount. Money is handled in
+# integer cents.
+
+
+def _cents(price):
+    return int(price * 100)
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _column(values):
+    return np.fromiter(values, dtype=np.int64)
+
+
+def _group_sum(keys, values):
+    """{key: (count, sum of values)} for parallel key/value arrays."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(unique))
+    totals = np.bincount(inverse, weights=values, minlength=len(unique))
+    return {key.item(): (int(count), int(round(total))) for key, count, total in zip(unique, counts, totals)}
+
+
+def _descriptions():
+    """Dense lookup arrays indexed by part description id: price in cents, name and brand."""
+    rows = db.session.execute(select(PartDescription.id, PartDescription.price, PartDescription.name, PartDescription.brand)).all()
+    size = max((row[0] for row in rows), default=0) + 1
+    prices = [0] * size
+    labels = {}
+    for desc_id, price, name, brand in rows:
+        prices[desc_id] = _cents(price)
+        labels[desc_id] = (name, brand)
+    return _column(prices), labels
+
+
+def stock_valuation(group_by="part"):
+    """Value of units in stock (not on a ticket), grouped by part or by brand."""
+    prices, labels = _descriptions()
+    desc_ids = _column(db.session.execute(select(SerializedPart.desc_id).where(SerializedPart.ticket_id.is_(None))).scalars())
+    values = prices[desc_ids]
+    if group_by == "brand":
+        brands = sorted({brand for _, brand in labels.values()})
+        brand_index = {brand: index for index, brand in enumerate(brands)}
+        brand_of = [0] * len(prices)
+        for desc_id, (_, brand) in labels.items():
+            brand_of[desc_id] = brand_index[brand]
+        groups = _group_sum(_column(brand_of)[desc_ids], values)
+        items = [
+            {"brand": brands[key], "units": count, "value": _money(total)}
+            for key, (count, total) in groups.items()
+        ]
+    else:
+        groups = _group_sum(desc_ids, values)
+        items = [
+            {"desc_id": key, "name": labels[key][0], "brand": labels[key][1], "units": count,
+             "unit_price": _money(prices[key]), "value": _money(total)}
+            for key, (count, total) in groups.items()
+        ]
+    items.sort(key=lambda item: item["value"], reverse=True)
+    return {
+        "group_by": group_by,
+        "units": sum(item["units"] for item in items),
+        "total": sum((item["value"] for item in items), Decimal("0.00")),
+        "items": items,
+    }
+
+
+def consumption_value(start_date=None, end_date=None):
+    """Value of units put on tickets, per month of the ticket's service date."""
+    prices, _ = _descriptions()
+    units = select(SerializedPart.desc_id, ServiceTicket.service_date).join(ServiceTicket, ServiceTicket.id == SerializedPart.ticket_id)
+    if start_date:
+        units = units.where(ServiceTicket.service_date >= start_date)
+    if end_date:
+        units = units.where(ServiceTicket.service_date <= end_date)
+    rows = db.session.execute(units).all()
+    values = prices[_column(row[0] for row in rows)]
+    # Months since 1970-01, straight from the datetime64 dates.
+    months = np.array([row[1] for row in rows], dtype="datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+    groups = _group_sum(months, values)
+    items = [
+        {"month": f"{1970 + key // 12:04d}-{key % 12 + 1:02d}", "units": count, "value": _money(total)}
+        for key, (count, total) in sorted(groups.items())
+    ]
+    return {
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+        "units": sum(item["units"] for item in items),
+        "total": sum((item["value"] for item in items), Decimal("0.00")),
+        "items": items,
+    }
@@ -0,0 +1,73 @@
+import click
+from datetime import timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import select, delete, insert, func, case
+from app.models import db, Mechanic, MechanicWorkload, ServiceTicket, service_mechanic
+
+LAST_DAYS = 30
+
+
+def workload_counts():
+    """Tickets per (mechanic, service day) straight from service_mechanic."""
+    return (
+        select(service_mechanic.c.mechanic_id, ServiceTicket.service_date, func.count().label("ticket_count"))
+        .join(ServiceTicket, ServiceTicket.id == service_mechanic.c.ticket_id)
+        .group_by(service_mechanic.c.mechanic_id, ServiceTicket.service_date)
+    )
+
+
+def mechanic_workload(as_of, start_date=None, end_date=None, mechanic_id=None):
+    """Ticket counts per mechanic for today, this week (from Monday) and the last 30 days.
+
+    With `start_date` and `end_date`, also the count for that window. Every
+    window is summed from the daily rollups in one pass over the buckets
+    between the earliest start and the latest end.
+    """
+    windows = {
+        "today": (as_of, as_of),
+        "this_week": (as_of - timedelta(days=as_of.weekday()), as_of),
+        f"last_{LAST_DAYS}_days": (as_of - timedelta(days=LAST_DAYS - 1), as_of),
+    }
+    if start_date and end_date:
+        windows["window"] = (start_date, end_date)
+    lower = min(start for start, _ in windows.values())
+    upper = max(end for _, end in windows.values())
+    day = MechanicWorkload.service_date
+    sums = (
+        select(MechanicWorkload.mechanic_id, *(
+            func.sum(case((day.between(start, end), MechanicWorkload.ticket_count), else_=0)).label(name)
+            for name, (start, end) in windows.items()
+        ))
+        .where(day.between(lower, upper))
+        .group_by(MechanicWorkload.mechanic_id)
+        .subquery()
+    )
+    query = (
+        select(Mechanic.id, Mechanic.name, *(func.coalesce(sums.c[name], 0).label(name) for name in windows))
+        .outerjoin(sums, sums.c.mechanic_id == Mechanic.id)
+        .order_by(Mechanic.id)
+    )
+    if mechanic_id is not None:
+        query = query.where(Mechanic.id == mechanic_id)
+    return [
+        {"mechanic_id": row[0], "name": row[1], **{name: int(count) for name, count in zip(windows, row[2:])}}
+        for row in db.session.execute(query)
+    ]
+
+
+def rebuild_workload():
+    """Recompute every workload rollup from service_mechanic; returns the number of buckets."""
+    table = MechanicWorkload.__table__
+    db.session.execute(delete(table))
+    result = db.session.execute(
+        insert(table).from_select(["mechanic_id", "service_date", "ticket_count"], workload_counts())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@click.command("rebuild-workload")
+@with_appcontext
+def rebuild_workload_command():
+    """Recompute mechanic workload rollups from service ticket assignments."""
+    click.echo(f"Rebuilt {rebuild_workload()} mechanic workload bucket(s).")
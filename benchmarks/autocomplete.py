@@ -0,0 +1,50 @@
+# Lookup and update cost of the part description autocomplete index over a
+# synthetic 500k-description catalog.
+#
+# The index is built in memory (no database) so only the index is timed.
+#   python benchmarks/autocomplete.py
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.autocomplete import PrefixIndex
+
+DESCRIPTIONS = int(os.environ.get("DESCRIPTIONS", 500000))
+LOOKUPS = int(os.environ.get("LOOKUPS", 20000))
+WORDS = ["brake", "pad", "rotor", "filter", "oil", "spark", "plug", "belt", "hose", "clamp",
+         "gasket", "sensor", "pump", "valve", "bearing", "caliper", "strut", "mount", "wiper", "blade"]
+BRANDS = ["Bosch", "Acme", "Brembo", "Denso", "NGK", "Gates", "Valeo", "Monroe", "Moog", "Dayco"]
+
+
+def main():
+    random.seed(7)
+    rows = [
+        (i, f"{' '.join(random.sample(WORDS, 2))} {random.randint(1, 99999)}", random.choice(BRANDS))
+        for i in range(1, DESCRIPTIONS + 1)
+    ]
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.build(rows)
+    built = time.perf_counter() - start
+
+    prefixes = [random.choice(WORDS + [brand.lower() for brand in BRANDS])[: random.randint(1, 5)] for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        index.search(prefix, 10)
+    lookup = (time.perf_counter() - start) / LOOKUPS
+
+    start = time.perf_counter()
+    for i in range(1, 1001):
+        index.put(i, f"renamed part {i}", "Acme")
+    update = (time.perf_counter() - start) / 1000
+
+    stats = index.stats()
+    print(f"descriptions={stats['part_descriptions']} keys={stats['keys']} memory={stats['memory_bytes'] / 2**20:.1f} MiB")
+    print(f"build={built:.2f}s top-10 lookup={lookup * 1e6:.1f} us update={update * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Per-row dump cost of the marshmallow read schemas versus their compiled
+# fast-path serializers, on 10k fully populated service tickets.
+#
+# Objects are built in memory (no database) so only serialization is timed.
+#   python benchmarks/compiled_serializers.py
+import os
+import sys
+import time
+import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import create_app
+from app.models import Customer, Mechanic, PartDescription, SerializedPart, ServiceTicket
+from app.blueprints.service_tickets.schemas import service_tickets_schema, compiled_service_tickets_schema
+from app.blueprints.mechanics.schemas import mechanics_schema_with_tickets, compiled_mechanics_schema_with_tickets
+from app.blueprints.serialized_parts.schemas import serialized_parts_schema_no_ticket, compiled_serialized_parts_schema_no_ticket
+
+TICKETS = int(os.environ.get("TICKETS", 10000))
+REPEAT = int(os.environ.get("REPEAT", 3))
+
+
+def build():
+    customer = Customer(id=1, name="Fleet Co", email="fleet@email.com", phone="0", password="x")
+    mechanics = [
+        Mechanic(id=i, name=f"Mechanic {i}", email=f"m{i}@email.com", phone="0", salary=Decimal("50000.00"), password="x")
+        for i in range(1, 4)
+    ]
+    descriptions = [PartDescription(id=i, name=f"Part {i}", brand="BrandX", price=Decimal("19.99")) for i in range(1, 6)]
+    tickets, parts = [], []
+    for i in range(1, TICKETS + 1):
+        ticket = ServiceTicket(
+            id=i, vin=f"VIN{i}", service_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365),
+            service_desc="Routine service", customer_id=1, customer=customer
+        )
+        ticket.mechanics.extend(mechanics[: 1 + i % 3])
+        for j in range(i % 4):
+            part = SerializedPart(id=len(parts) + 1, desc_id=descriptions[j].id, description=descriptions[j], ticket_id=i)
+            ticket.ticket_items.append(part)
+            parts.append(part)
+        tickets.append(ticket)
+    return tickets, mechanics, parts
+
+
+def best_of(dump, objects):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        dump(objects)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    create_app("ProductionConfig")
+    tickets, mechanics, parts = build()
+    cases = [
+        ("ServiceTicketSchema", service_tickets_schema, compiled_service_tickets_schema, tickets),
+        ("MechanicSchema (with tickets)", mechanics_schema_with_tickets, compiled_mechanics_schema_with_tickets, mechanics),
+        ("SerializedPartSchema", serialized_parts_schema_no_ticket, compiled_serialized_parts_schema_no_ticket, parts),
+    ]
+    print(f"{'schema':32} {'rows':>7} {'marshmallow us/row':>19} {'compiled us/row':>16} {'speedup':>8}")
+    for name, schema, compiled, objects in cases:
+        assert compiled.dump(objects) == schema.dump(objects), f"{name}: output differs"
+        slow = best_of(schema.dump, objects)
+        fast = best_of(compiled.dump, objects)
+        rows = len(objects)
+        print(f"{name:32} {rows:>7} {slow / rows * 1e6:>19.1f} {fast / rows * 1e6:>16.1f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Login throughput at 8/32/128 concurrent clients: password checks inline on
+# each request thread versus the bounded hashing pool.
+#
+# Reports completed logins per second, p95 latency, requests shed with 503 and
+# the peak number of KDF runs in flight (each scrypt run holds ~32 MB).
+#   python benchmarks/login_throughput.py
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "logins.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from app import create_app
+from app.models import db, Customer
+from app.blueprints.customers import routes as customer_routes
+from app.utils import passwords
+
+CONCURRENCY = [int(value) for value in os.environ.get("CONCURRENCY", "8,32,128").split(",")]
+LOGINS_PER_CLIENT = int(os.environ.get("LOGINS_PER_CLIENT", 3))
+PASSWORD = "password123"
+
+
+class InFlight:
+    """Wraps a password check and records the peak number running at once."""
+
+    def __init__(self, check):
+        self.check, self.running, self.peak = check, 0, 0
+        self.lock = threading.Lock()
+
+    def __call__(self, pwhash, password):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return self.check(pwhash, password)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def seed(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Customer(name="Bench", email="bench@email.com", phone="0", password=generate_password_hash(PASSWORD)))
+        db.session.commit()
+
+
+def run(app, clients):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def client(_):
+        test_client = app.test_client()
+        for _ in range(LOGINS_PER_CLIENT):
+            start = time.perf_counter()
+            response = test_client.post("/customers/login", json={"email": "bench@email.com", "password": PASSWORD})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    ok = statuses.count(200)
+    return ok / elapsed, latencies[int(len(latencies) * 0.95) - 1] * 1000, statuses.count(503)
+
+
+def main():
+    app = create_app("ProductionConfig")
+    app.config["RATELIMIT_ENABLED"] = False
+    seed(app)
+    print(f"cpus={os.cpu_count()} pool workers={passwords.HASH_WORKERS} queue={passwords.HASH_QUEUE_SIZE} logins/client={LOGINS_PER_CLIENT}")
+    print(f"{'mode':8} {'clients':>8} {'logins/s':>9} {'p95 ms':>8} {'shed 503':>9} {'peak KDFs':>10}")
+    for clients in CONCURRENCY:
+        inline = InFlight(check_password_hash)
+        customer_routes.verify_password = inline
+        rate, p95, shed = run(app, clients)
+        print(f"{'inline':8} {clients:>8} {rate:>9.1f} {p95:>8.0f} {shed:>9} {inline.peak:>10}")
+
+        pooled = InFlight(check_password_hash)
+        customer_routes.verify_password = lambda pwhash, password: passwords.get_hasher().run(pooled, pwhash, password)
+        rate, p95, shed = run(app, clients)
+        print(f"{'pool':8} {clients:>8} {rate:>9.1f} {p95:>8.0f} {shed:>9} {pooled.peak:>10}")
+    customer_routes.verify_password = passwords.verify_password
+
+
+if __name__ == "__main__":
+    main()
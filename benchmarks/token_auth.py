@@ -0,0 +1,73 @@
+# Per-request auth overhead for a repeat caller: the previous token_required
+# (full jwt.decode on every request) versus the verified-token cache.
+#
+# Each request runs a no-op view inside its own request context; the cost of
+# the context and view alone is measured too and subtracted.
+#   python benchmarks/token_auth.py
+import os
+import sys
+import time
+from functools import wraps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from flask import request, jsonify
+from jose import jwt
+import jose
+from app import create_app
+from app.utils import util
+
+REQUESTS = int(os.environ.get("REQUESTS", 20000))
+
+
+def legacy_token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+        if 'Authorization' in request.headers:
+            token = request.headers['Authorization'].split()[1]
+        if not token:
+            return jsonify({'message': 'Token is missing!'}), 401
+        try:
+            data = jwt.decode(token, util.SECRET_KEY, algorithms=['HS256'])
+            request.userid = int(data['sub'])
+            if not data['role'] == "user":
+                return jsonify({'message': 'Access denied!'}), 403
+        except jose.exceptions.ExpiredSignatureError:
+            return jsonify({'message': 'Token has expired!'}), 401
+        except jose.exceptions.JWTError:
+            return jsonify({'message': 'Invalid token!'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+def view():
+    return "ok"
+
+
+def per_request(app, handler, headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        with app.test_request_context("/", headers=headers):
+            handler()
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    app = create_app("ProductionConfig")
+    headers = {"Authorization": f"Bearer {util.encode_token(1, role='user')}"}
+    util._verified_tokens.clear()
+    baseline = per_request(app, view, headers)
+    before = per_request(app, legacy_token_required(view), headers) - baseline
+    after = per_request(app, util.token_required(view), headers) - baseline
+    print(f"requests={REQUESTS} (same token; context + view alone {baseline:.1f} us/request)")
+    print(f"{'auth':28} {'overhead us/request':>20}")
+    print(f"{'jwt.decode every request':28} {before:>20.1f}")
+    print(f"{'verified-token cache':28} {after:>20.1f}")
+    print(f"{'speedup':28} {before / after:>19.1f}x")
+
+
+if __name__ == "__main__":
+    main()
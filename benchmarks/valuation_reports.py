@@ -0,0 +1,103 @@
+# Stock valuation and consumed-parts value reports: the bulk column + array
+# grouping implementation versus walking ORM objects, over 1M serialized parts.
+#
+# Both sides must produce the same totals. Runs against a temporary SQLite file
+# unless DATABASE_URL is set:
+#   python benchmarks/valuation_reports.py
+import os
+import sys
+import tempfile
+import time
+import random
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "valuation.db")
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+from app import create_app
+from app.models import db, Customer, PartDescription, SerializedPart, ServiceTicket
+from app.utils import valuation
+
+UNITS = int(os.environ.get("UNITS", 1000000))
+DESCRIPTIONS = int(os.environ.get("DESCRIPTIONS", 2000))
+TICKETS = int(os.environ.get("TICKETS", 50000))
+BRANDS = ["Bosch", "Acme", "Brembo", "Denso", "NGK", "Gates", "Valeo", "Monroe", "Moog", "Dayco"]
+
+
+def seed(app):
+    random.seed(7)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Customer(name="Bench", email="bench@email.com", phone="0", password="x"))
+        db.session.flush()
+        # Core inserts: seeding is not what is being measured.
+        db.session.execute(insert(PartDescription), [
+            {"name": f"Part {i}", "brand": random.choice(BRANDS), "price": Decimal(random.randint(100, 99999)) / 100}
+            for i in range(1, DESCRIPTIONS + 1)
+        ])
+        db.session.execute(insert(ServiceTicket), [
+            {"customer_id": 1, "vin": f"VIN{i}", "service_desc": "Bench",
+             "service_date": datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 730)}
+            for i in range(1, TICKETS + 1)
+        ])
+        for start in range(0, UNITS, 100000):
+            db.session.execute(insert(SerializedPart), [
+                {"desc_id": random.randint(1, DESCRIPTIONS), "ticket_id": random.randint(1, TICKETS) if random.random() < 0.3 else None}
+                for _ in range(start, min(start + 100000, UNITS))
+            ])
+        db.session.commit()
+
+
+def orm_stock_by_brand():
+    groups = defaultdict(lambda: [0, Decimal("0.00")])
+    for description in db.session.scalars(select(PartDescription).options(selectinload(PartDescription.serial_items))):
+        for unit in description.serial_items:
+            if unit.ticket_id is None:
+                groups[description.brand][0] += 1
+                groups[description.brand][1] += description.price
+    return sum(units for units, _ in groups.values()), sum((value for _, value in groups.values()), Decimal("0.00"))
+
+
+def orm_consumption_by_month():
+    groups = defaultdict(lambda: [0, Decimal("0.00")])
+    tickets = select(ServiceTicket).options(selectinload(ServiceTicket.ticket_items).selectinload(SerializedPart.description))
+    for ticket in db.session.scalars(tickets):
+        month = ticket.service_date.strftime("%Y-%m")
+        for unit in ticket.ticket_items:
+            groups[month][0] += 1
+            groups[month][1] += unit.description.price
+    return sum(units for units, _ in groups.values()), sum((value for _, value in groups.values()), Decimal("0.00"))
+
+
+def timed(report):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    result = report()
+    return result, time.perf_counter() - start
+
+
+def main():
+    app = create_app("ProductionConfig")
+    seed(app)
+    cases = [
+        ("stock value by brand", orm_stock_by_brand, lambda: valuation.stock_valuation("brand")),
+        ("consumed value by month", orm_consumption_by_month, lambda: valuation.consumption_value()),
+    ]
+    print(f"units={UNITS} descriptions={DESCRIPTIONS} tickets={TICKETS}")
+    print(f"{'report':26} {'orm loop s':>11} {'vectorized s':>13} {'speedup':>8}")
+    with app.app_context():
+        for name, orm_report, report in cases:
+            expected, slow = timed(orm_report)
+            result, fast = timed(report)
+            assert (result["units"], result["total"]) == expected, f"{name}: totals differ"
+            print(f"{name:26} {slow:>11.2f} {fast:>13.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from app import create_app
 from app.models import db
+from app.utils.autocomplete import get_index
 from flask import redirect
 
 app = create_app('ProductionConfig')
@@ -11,5 +12,6 @@ def index():
 with app.app_context():
     # db.drop_all()
     db.create_all()
+    get_index() # Build the part description autocomplete index at worker start
 
     
@@ -0,0 +1,74 @@
+import unittest
+from app import create_app
+from app.models import db, Customer, Mechanic, PartDescription, SerializedPart, ServiceTicket
+from app.blueprints.service_tickets.schemas import service_ticket_schema, service_tickets_schema, compiled_service_ticket_schema, compiled_service_tickets_schema, sparse_service_ticket_plan
+from app.blueprints.mechanics.schemas import mechanic_schema_with_tickets, mechanics_schema_with_tickets, compiled_mechanic_schema_with_tickets, compiled_mechanics_schema_with_tickets
+from app.blueprints.serialized_parts.schemas import serialized_part_schema_no_ticket, serialized_parts_schema_no_ticket, compiled_serialized_part_schema_no_ticket, compiled_serialized_parts_schema_no_ticket
+from app.blueprints.service_tickets.schemas import ServiceTicketSchema
+from app.utils.compiled_schema import CompiledSchema
+from sqlalchemy import select
+import datetime
+
+class TestCompiledSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        with self.app.app_context():
+            db.drop_all() # Drop all tables before creating new ones
+            db.create_all() # Create all tables
+
+            customer = Customer(name="Fred Tuazon", email="ft@email.com", phone="1234567890", password="x")
+            mechanics = [
+                Mechanic(name="Mike Smith", email="mk@email.com", phone="1234567890", salary=50000, password="x"),
+                Mechanic(name="Jane Doe", email="jane@email.com", phone="0987654321", salary=60000.5, password="x")
+            ]
+            part = PartDescription(name="Brake Pad", brand="BrandX", price=99.99)
+            db.session.add_all([customer, part, *mechanics])
+            db.session.flush()
+
+            for i in range(3):
+                ticket = ServiceTicket(
+                    customer_id=customer.id,
+                    vin=f"VIN{i}",
+                    service_date=datetime.date(2025, 3, 20 + i),
+                    service_desc="Parity ticket"
+                )
+                ticket.mechanics.extend(mechanics[:i])
+                ticket.ticket_items.extend(SerializedPart(desc_id=part.id) for _ in range(i))
+                db.session.add(ticket)
+            db.session.add(SerializedPart(desc_id=part.id))
+            db.session.commit()
+
+    def assertParity(self, schema, compiled, obj): # Compiled output must equal marshmallow output exactly
+        self.assertEqual(compiled.dump(obj), schema.dump(obj))
+
+    def test_service_ticket_parity(self): # Test ServiceTicketSchema parity for single and many
+        with self.app.app_context():
+            tickets = db.session.execute(select(ServiceTicket)).scalars().all()
+            self.assertParity(service_tickets_schema, compiled_service_tickets_schema, tickets)
+            for ticket in tickets:
+                self.assertParity(service_ticket_schema, compiled_service_ticket_schema, ticket)
+
+    def test_mechanic_parity(self): # Test MechanicSchema with nested tickets parity
+        with self.app.app_context():
+            mechanics = db.session.execute(select(Mechanic)).scalars().all()
+            self.assertParity(mechanics_schema_with_tickets, compiled_mechanics_schema_with_tickets, mechanics)
+            self.assertParity(mechanic_schema_with_tickets, compiled_mechanic_schema_with_tickets, mechanics[1])
+
+    def test_serialized_part_parity(self): # Test SerializedPartSchema parity, including unassigned parts
+        with self.app.app_context():
+            parts = db.session.execute(select(SerializedPart)).scalars().all()
+            self.assertParity(serialized_parts_schema_no_ticket, compiled_serialized_parts_schema_no_ticket, parts)
+            self.assertParity(serialized_part_schema_no_ticket, compiled_serialized_part_schema_no_ticket, parts[-1])
+
+    def test_sparse_schema_parity(self): # Test compiled sparse field sets match marshmallow with `only`
+        with self.app.app_context():
+            tickets = db.session.execute(select(ServiceTicket)).scalars().all()
+            compiled, options = sparse_service_ticket_plan("id,vin", "mechanics", many=True)
+            self.assertParity(ServiceTicketSchema(only=("id", "vin", "mechanics"), many=True), compiled, tickets)
+
+    def test_none_values_parity(self): # Test unset columns and relationships serialize like marshmallow
+        ticket = ServiceTicket(vin=None, service_date=None, service_desc="No data")
+        self.assertParity(service_ticket_schema, CompiledSchema(service_ticket_schema, register=False), ticket)
+        part = SerializedPart(desc_id=None)
+        self.assertParity(serialized_part_schema_no_ticket, CompiledSchema(serialized_part_schema_no_ticket, register=False), part)
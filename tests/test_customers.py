@@ -1,9 +1,14 @@
 import unittest
 from app import create_app
-from app.models import db, Customer
+from app.models import db, Customer, Mechanic, ServiceTicket
 from marshmallow import ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils import util, passwords
 from app.utils.util import encode_token
+from app.blueprints.customers.schemas import my_tickets_schema
+from unittest import mock
+from sqlalchemy import event
+import datetime
 
 
 class TestCustomer(unittest.TestCase):
@@ -88,6 +93,33 @@ class TestCustomer(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['customer']['name'], payLoad["name"])
         
+    def test_update_customer_password_rehash(self): # An update hashes the submitted password with a single KDF run
+        
+        headers = {'Authorization': f'Bearer {self.token}'}
+        payLoad = self.payLoad.copy()
+        payLoad["password"] = "newpassword789"
+        with mock.patch.object(passwords.PasswordHasher, 'run', autospec=True, side_effect=lambda hasher, fn, *args: fn(*args)) as run:
+            response = self.client.put('customers/', json=payLoad, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[1].__name__ for call in run.call_args_list], ["generate_password_hash"])
+        with self.app.app_context():
+            self.assertTrue(check_password_hash(db.session.get(Customer, 1).password, "newpassword789"))
+        
+    def test_login_hasher_busy(self): # Logins fail fast with 503 once the hashing pool and queue are full
+        
+        hasher = passwords.PasswordHasher(workers=1, queue_size=0)
+        hasher._slots.acquire()
+        login_payload = {"email": self.payLoad["email"], "password": self.payLoad["password"]}
+        with mock.patch.object(passwords, 'get_hasher', return_value=hasher):
+            response = self.client.post('/customers/login', json=login_payload)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], "1")
+        hasher._slots.release()
+        with mock.patch.object(passwords, 'get_hasher', return_value=hasher):
+            response = self.client.post('/customers/login', json=login_payload)
+        self.assertEqual(response.status_code, 200)
+        hasher.shutdown()
+        
     def test_delete_customer(self): # Deleting an existing customer
         
         headers = {'Authorization': f'Bearer {self.token}'}
@@ -95,18 +127,74 @@ class TestCustomer(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['status'], "success")
         
+    def test_token_verified_once_for_repeat_caller(self): # Repeat requests with the same token reuse the verified claims
+        
+        util._verified_tokens.clear()
+        headers = {'Authorization': f'Bearer {self.token}'}
+        with mock.patch.object(util.jwt, 'decode', wraps=util.jwt.decode) as decode:
+            for _ in range(3):
+                response = self.client.get('/customers/my-tickets', headers=headers)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+        
+    def test_cached_token_expires(self): # A cached token stops being accepted at its exp
+        
+        util._verified_tokens.clear()
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 200)
+        for key, (claims, _) in list(util._verified_tokens.items()):
+            util._verified_tokens[key] = (claims, 0)
+        response = self.client.get('/customers/my-tickets', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json['message'], "Token has expired!")
+        self.assertEqual(len(util._verified_tokens), 0)
+        
+    def test_rejected_tokens(self): # Missing, tampered and wrong-role tokens
+        
+        response = self.client.get('/customers/my-tickets')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json['message'], "Token is missing!")
+        response = self.client.get('/customers/my-tickets', headers={'Authorization': f'Bearer {self.token[:-2]}xx'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json['message'], "Invalid token!")
+        response = self.client.get('/customers/my-tickets', headers={'Authorization': f'Bearer {encode_token(1, role="mechanic")}'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json['message'], "Access denied!")
+        
     def test_get_all_customers(self): # Get all customers with pagination
         
         response = self.client.get('/customers/', query_string={'page': 1, 'per_page': 10})
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json['customers'], list)
     
+    def test_get_all_customers_with_after_id(self): # Get customers with keyset pagination
+        
+        response = self.client.get('/customers/', query_string={'after_id': 0, 'per_page': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['customers'][0]['id'], 1)
+        self.assertIsNone(response.json['next_cursor'])
+    
+    def test_get_all_customers_keyset_per_page_capped(self): # Keyset pages are capped and bad after_ids rejected
+        
+        response = self.client.get('/customers/', query_string={'cursor': '', 'per_page': 5000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['per_page'], 100)
+        response = self.client.get('/customers/', query_string={'after_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Invalid after_id.")
+    
     def test_get_customer_by_id(self): # Get a valid customer by ID
         
         response = self.client.get('/customers/1')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['name'], self.payLoad["name"])
     
+    def test_get_customer_not_modified(self): # Get a customer with a matching ETag
+        
+        response = self.client.get('/customers/1')
+        response = self.client.get('/customers/1', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        
     def test_get_customer_by_invalid_id(self): # Get a customer does not exist
         
         response = self.client.get('/customers/9999')
@@ -120,6 +208,60 @@ class TestCustomer(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("customer", response.json)
     
+    def add_tickets(self, count): # One ticket per day from 2025-03-01, each with a mechanic
+        with self.app.app_context():
+            mechanic = Mechanic(name="Mike Smith", email="ms@email.com", phone="1", salary=50000, password="x")
+            db.session.add_all(
+                ServiceTicket(customer_id=1, vin=f"VIN{i}", service_date=datetime.date(2025, 3, 1) + datetime.timedelta(days=i),
+                              service_desc="Fleet service", mechanics=[mechanic])
+                for i in range(count)
+            )
+            db.session.commit()
+
+    def test_get_customer_tickets_pages(self): # Walk the customer's tickets newest first with the cursor
+        self.add_tickets(5)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        dates, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get('/customers/my-tickets', headers=headers, query_string={"per_page": 2, "cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['customer']['id'], 1)
+            dates += [ticket['service_date'] for ticket in response.json['service_tickets']]
+            cursor = response.json['next_cursor']
+        self.assertEqual(dates, ["2025-03-05", "2025-03-04", "2025-03-03", "2025-03-02", "2025-03-01"])
+        response = self.client.get('/customers/my-tickets', headers=headers, query_string={"start_date": "2025-03-02", "end_date": "2025-03-03", "per_page": 10})
+        self.assertEqual([t['service_date'] for t in response.json['service_tickets']], ["2025-03-03", "2025-03-02"])
+        self.assertEqual(response.json['service_tickets'][0]['mechanics'][0]['name'], "Mike Smith")
+
+    def test_get_customer_tickets_invalid_params(self): # Bad cursors and dates are rejected
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self.assertEqual(self.client.get('/customers/my-tickets?cursor=abc', headers=headers).status_code, 400)
+        self.assertEqual(self.client.get('/customers/my-tickets?start_date=03-01-2025', headers=headers).status_code, 400)
+
+    def test_get_customer_tickets_query_count(self): # The first page costs the same number of queries for any history
+        self.add_tickets(30)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        with self.app.app_context():
+            statements = []
+            event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        response = self.client.get('/customers/my-tickets', headers=headers, query_string={"per_page": 10})
+        self.assertEqual(len(response.json['service_tickets']), 10)
+        self.assertLessEqual(len(statements), 5)
+
+    def test_get_customer_tickets_unpaginated(self): # Without paging parameters every ticket comes back, as before
+        self.add_tickets(12)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        response = self.client.get('/customers/my-tickets', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['service_tickets']), 12)
+        with self.app.app_context():
+            expected = my_tickets_schema.dump(db.session.get(Customer, 1))['service_tickets']
+            self.assertEqual(response.json['service_tickets'], self.app.json.loads(self.app.json.dumps(expected)))
+        self.assertEqual(response.json['service_tickets'][0]['service_date'], "2025-03-01")
+        self.assertNotIn('next_cursor', response.json)
+        response = self.client.get('/customers/my-tickets', headers=headers, query_string={"per_page": 500})
+        self.assertEqual(response.json['per_page'], 100)
+
     def test_search_customer_by_name(self): # Searching a customer by name 
         
         response = self.client.get('/customers/search', query_string={"name": self.payLoad['name']})
@@ -1,9 +1,12 @@
 import unittest
 from app import create_app
-from app.models import db, Mechanic
+from app.models import db, Mechanic, MechanicWorkload, Customer, ServiceTicket
+from sqlalchemy import delete
 from marshmallow import ValidationError
-from werkzeug.security import generate_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash
 from app.utils.util import encode_token
+from app.blueprints.mechanics.routes import dump_with_recent_tickets
+import datetime
 
 
 class TestMechanic(unittest.TestCase):
@@ -87,6 +90,16 @@ class TestMechanic(unittest.TestCase):
         self.assertEqual(response.json['message'], "Successfully updated mechanic")
         self.assertEqual(response.json['mechanic']['name'], "Updated Name")
         
+    def test_update_mechanic_password_rehash(self): # An update stores a fresh hash of the submitted password
+        
+        headers = {'Authorization': f'Bearer {self.token}'}
+        payLoad = self.payLoad.copy()
+        payLoad["password"] = "newpassword789"
+        response = self.client.put('mechanics/', json=payLoad, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertTrue(check_password_hash(db.session.get(Mechanic, 1).password, "newpassword789"))
+        
     def test_delete_mechanic(self): # Deleting an existing mechanic
         headers = {'Authorization': f'Bearer {self.token}'}
         response = self.client.delete('mechanics/', headers=headers)
@@ -116,6 +129,124 @@ class TestMechanic(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json, list)
     
+    def add_assigned_tickets(self): # Mechanic 2 gets three tickets (one in April), mechanic 1 gets one
+        with self.app.app_context():
+            db.session.add(Customer(name="Fred Tuazon", email="ft@email.com", phone="1234567890", password="x"))
+            db.session.add(Mechanic(name="Roger Johnson", email="rj@email.com", phone="123456789", salary=50000, password="x"))
+            db.session.flush()
+            mike, roger = db.session.get(Mechanic, 1), db.session.get(Mechanic, 2)
+            for day, mechanics in ((1, [roger]), (2, [roger, mike]), (20, [roger])):
+                month = 4 if day == 20 else 3
+                db.session.add(ServiceTicket(
+                    customer_id=1, vin="CMD12456", service_date=datetime.date(2025, month, day),
+                    service_desc="Test description", mechanics=mechanics
+                ))
+            db.session.commit()
+
+    def test_popular_mechanic_counts(self): # Popular mechanics are ranked by ticket count without embedding tickets
+        self.add_assigned_tickets()
+        response = self.client.get('/mechanics/popular')
+        self.assertEqual([(m['id'], m['ticket_counts']) for m in response.json], [(2, 3), (1, 1)])
+        self.assertNotIn('service_tickets', response.json[0])
+        response = self.client.get('/mechanics/popular', query_string={"limit": 1})
+        self.assertEqual([m['id'] for m in response.json], [2])
+
+    def test_popular_mechanic_date_window(self): # Only tickets serviced inside the window are counted
+        self.add_assigned_tickets()
+        response = self.client.get('/mechanics/popular', query_string={"start_date": "2025-03-02", "end_date": "2025-03-31"})
+        self.assertEqual([(m['id'], m['ticket_counts']) for m in response.json], [(1, 1), (2, 1)])
+
+    def test_popular_mechanic_includes_idle_mechanics(self): # Mechanics without tickets still rank, with 0
+        self.add_assigned_tickets()
+        with self.app.app_context():
+            db.session.add(Mechanic(name="Idle Ian", email="ii@email.com", phone="1", salary=40000, password="x"))
+            db.session.commit()
+        response = self.client.get('/mechanics/popular')
+        self.assertEqual([(m['id'], m['ticket_counts']) for m in response.json], [(2, 3), (1, 1), (3, 0)])
+        response = self.client.get('/mechanics/popular', query_string={"start_date": "2025-04-01"})
+        self.assertEqual([(m['id'], m['ticket_counts']) for m in response.json], [(2, 1), (1, 0), (3, 0)])
+
+    def test_popular_mechanic_invalid_params(self): # Limit and dates are validated
+        self.assertEqual(self.client.get('/mechanics/popular?limit=0').status_code, 400)
+        response = self.client.get('/mechanics/popular?start_date=03-01-2025')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Dates must use the YYYY-MM-DD format.")
+
+    def test_mechanic_workload(self): # Workload windows are summed from the daily rollups
+        self.add_assigned_tickets()
+        response = self.client.get('/mechanics/workload', query_string={"as_of": "2025-03-02"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['mechanics'], [
+            {"mechanic_id": 1, "name": "Mike Smith", "today": 1, "this_week": 1, "last_30_days": 1},
+            {"mechanic_id": 2, "name": "Roger Johnson", "today": 1, "this_week": 2, "last_30_days": 2},
+        ])
+        response = self.client.get('/mechanics/workload', query_string={
+            "as_of": "2025-04-20", "start_date": "2025-03-01", "end_date": "2025-04-30", "mechanic_id": 2
+        })
+        self.assertEqual(response.json['mechanics'], [
+            {"mechanic_id": 2, "name": "Roger Johnson", "today": 1, "this_week": 1, "last_30_days": 1, "window": 3}
+        ])
+
+    def test_mechanic_workload_invalid_params(self): # Windows need both dates, in order
+        self.assertEqual(self.client.get('/mechanics/workload?as_of=03-01-2025').status_code, 400)
+        self.assertEqual(self.client.get('/mechanics/workload?start_date=2025-03-01').status_code, 400)
+        self.assertEqual(self.client.get('/mechanics/workload?start_date=2025-03-02&end_date=2025-03-01').status_code, 400)
+
+    def test_rebuild_workload_command(self): # The rebuild command recomputes lost rollups
+        self.add_assigned_tickets()
+        with self.app.app_context():
+            db.session.execute(delete(MechanicWorkload))
+            db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=["rebuild-workload"])
+        self.assertIn("Rebuilt 4 mechanic workload bucket(s).", result.output)
+        response = self.client.get('/mechanics/workload', query_string={"as_of": "2025-03-02"})
+        self.assertEqual([m['last_30_days'] for m in response.json['mechanics']], [1, 2])
+
+    def test_get_mechanic_recent_tickets(self): # Nested tickets are capped to the most recent, with the full count
+        self.add_assigned_tickets()
+        response = self.client.get('/mechanics/2', query_string={"recent_tickets": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['service_date'] for t in response.json['service_tickets']], ["2025-04-20", "2025-03-02"])
+        self.assertEqual((response.json['ticket_count'], response.json['tickets_url']), (3, "/mechanics/2/tickets"))
+        response = self.client.get('/mechanics/', query_string={"recent_tickets": 1})
+        self.assertEqual([(len(m['service_tickets']), m['ticket_count']) for m in response.json['mechanics']], [(1, 1), (1, 3)])
+        response = self.client.get('/mechanics/search', query_string={"name": "Roger", "recent_tickets": 0})
+        self.assertEqual((response.json[0]['service_tickets'], response.json[0]['ticket_count']), ([], 3))
+        self.assertEqual(self.client.get('/mechanics/1?recent_tickets=1000').status_code, 400)
+
+    def test_recent_tickets_leave_loaded_mechanics_alone(self): # Dumping the window doesn't truncate the session's collections
+        self.add_assigned_tickets()
+        with self.app.test_request_context():
+            mechanic = db.session.get(Mechanic, 2)
+            data = dump_with_recent_tickets([mechanic], 1)
+            self.assertEqual(len(data[0]['service_tickets']), 1)
+            self.assertEqual(len(mechanic.service_tickets), 3)
+
+    def test_get_mechanic_tickets(self): # A mechanic's full ticket history is paginated, most recent first
+        self.add_assigned_tickets()
+        response = self.client.get('/mechanics/2/tickets', query_string={"per_page": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['service_date'] for t in response.json['tickets']], ["2025-04-20", "2025-03-02"])
+        self.assertEqual((response.json['total'], response.json['pages']), (3, 2))
+        response = self.client.get('/mechanics/2/tickets', query_string={"per_page": 2, "page": 2})
+        self.assertEqual([t['service_date'] for t in response.json['tickets']], ["2025-03-01"])
+        self.assertEqual(self.client.get('/mechanics/99/tickets').status_code, 404)
+
+    def test_get_mechanic_tickets_etag_scoped_to_mechanic(self): # Only the mechanic's own tickets move its ETags
+        self.add_assigned_tickets()
+        etags = {path: self.client.get(path).headers['ETag'] for path in ('/mechanics/1', '/mechanics/1/tickets')}
+        with self.app.app_context():
+            db.session.get(ServiceTicket, 1).service_desc = "Roger only"
+            db.session.commit()
+        for path, etag in etags.items():
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 304)
+        with self.app.app_context():
+            ticket = db.session.get(ServiceTicket, 2)
+            ticket.mechanics.remove(db.session.get(Mechanic, 1))
+            db.session.commit()
+        for path, etag in etags.items():
+            self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 200)
+
     def test_search_mechanic_by_name(self): # Searching a mechanic by name 
         
         response = self.client.get('/mechanics/search', query_string={"name": self.payLoad['name']})
@@ -2,6 +2,8 @@ import unittest
 from app import create_app
 from app.models import db, PartDescription
 from marshmallow import ValidationError
+from app.utils import search
+from app.utils.autocomplete import PrefixIndex, CHUNK_SIZE
 
 
 class TestPartDescription(unittest.TestCase):
@@ -94,6 +96,91 @@ class TestPartDescription(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json, list)
 
+    def add_catalog(self): # Extra part descriptions for ranking tests
+        with self.app.app_context():
+            db.session.add_all([
+                PartDescription(name="Brake Pad", brand="Bosch", price=40),
+                PartDescription(name="Pad Brake Kit", brand="Acme", price=60),
+                PartDescription(name="Oil Filter", brand="Bosch", price=10),
+            ])
+            db.session.commit()
+
+    def search_names(self, **params):
+        response = self.client.get('/part_descriptions/search', query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json]
+
+    def test_search_part_description_prefix_and_rank(self): # Search matches word prefixes with best matches first
+        self.add_catalog()
+        self.assertEqual(self.search_names(name="brak pa"), ["Brake Pad", "Pad Brake Kit"])
+        self.assertEqual(self.search_names(q="bosch"), ["Brake Pad", "Oil Filter"])
+        self.assertEqual(self.search_names(name="brake", brand="bosch"), ["Brake Pad"])
+        self.assertEqual(self.search_names(name="%"), [])
+
+    def test_search_part_description_paginated(self): # Search with page/per_page returns a paginated object
+        self.add_catalog()
+        response = self.client.get('/part_descriptions/search', query_string={"name": "brake", "per_page": 2})
+        self.assertEqual(response.json['total'], 3)
+        self.assertEqual(len(response.json['items']), 2)
+
+    def test_search_part_description_follows_writes(self): # Search index stays in sync on update and delete
+        self.client.put('/part_descriptions/1', json={"name": "Rotor", "brand": "Brand A", "price": 100.00})
+        self.assertEqual(self.search_names(name="brakes"), [])
+        self.assertEqual(self.search_names(name="rotor"), ["Rotor"])
+        self.client.delete('/part_descriptions/1')
+        self.assertEqual(self.search_names(name="rotor"), [])
+
+    def test_search_part_description_like_fallback(self): # Search without a full-text index uses the LIKE fallback
+        self.add_catalog()
+        with self.app.app_context():
+            search._backends[db.engine] = "like"
+        self.assertEqual(self.search_names(name="brak pa"), ["Brake Pad", "Pad Brake Kit"])
+        self.assertEqual(self.search_names(q="bosch"), ["Brake Pad", "Oil Filter"])
+
+    def autocomplete_names(self, prefix, **params):
+        response = self.client.get('/part_descriptions/autocomplete', query_string={"prefix": prefix, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json]
+
+    def test_autocomplete_part_description(self): # Autocomplete ranks full-name matches, then later name words, then brands
+        self.add_catalog()
+        self.assertEqual(self.autocomplete_names("bra"), ["Brake Pad", "Brakes", "Pad Brake Kit"])
+        self.assertEqual(self.autocomplete_names("PAD"), ["Pad Brake Kit", "Brake Pad"])
+        self.assertEqual(self.autocomplete_names("bosch"), ["Brake Pad", "Oil Filter"])
+        self.assertEqual(self.autocomplete_names("bra", limit=1), ["Brake Pad"])
+        self.assertEqual(self.autocomplete_names("brakes"), ["Brakes"])
+        self.assertEqual(self.autocomplete_names("brake"), ["Brake Pad", "Brakes", "Pad Brake Kit"])
+        self.assertEqual(self.autocomplete_names(""), [])
+
+    def test_autocomplete_follows_writes(self): # Autocomplete index is updated on create, update and delete
+        self.assertEqual(self.autocomplete_names("brakes"), ["Brakes"])
+        self.client.post('/part_descriptions/', json={"name": "Spark Plug", "brand": "NGK", "price": 5})
+        self.assertEqual(self.autocomplete_names("spa"), ["Spark Plug"])
+        self.client.put('/part_descriptions/1', json={"name": "Rotor", "brand": "Brand A", "price": 100.00})
+        self.assertEqual(self.autocomplete_names("brakes"), [])
+        self.assertEqual(self.autocomplete_names("rot"), ["Rotor"])
+        self.client.delete('/part_descriptions/1')
+        self.assertEqual(self.autocomplete_names("rot"), [])
+
+    def test_autocomplete_stats(self): # Stats report index size and memory footprint
+        response = self.client.get('/part_descriptions/autocomplete/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['part_descriptions'], 1)
+        self.assertEqual(response.json['keys'], 3)
+        self.assertGreater(response.json['memory_bytes'], 0)
+
+    def test_autocomplete_index_chunks(self): # Index stays sorted across chunk splits and keeps any character in labels
+        index = PrefixIndex()
+        index.build([(1, "Brake\x1fPad", "Bosch")])
+        for id in range(2, 2 + 3 * CHUNK_SIZE):
+            index.put(id, f"Part {id:05d}", "Acme")
+        self.assertEqual(index.search("brake"), [{"id": 1, "name": "Brake\x1fPad", "brand": "Bosch"}])
+        self.assertEqual([item["id"] for item in index.search("part 0", limit=3)], [2, 3, 4])
+        for id in range(2, 2 + 2 * CHUNK_SIZE):
+            index.discard(id)
+        self.assertEqual([item["id"] for item in index.search("part", limit=2)], [2 + 2 * CHUNK_SIZE, 3 + 2 * CHUNK_SIZE])
+        self.assertEqual(index.stats()["part_descriptions"], 1 + CHUNK_SIZE)
+
     def test_search_part_description_no_params(self): # Searching a part description with no parameters
     
         response = self.client.get('/part_descriptions/search')
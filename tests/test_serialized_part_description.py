@@ -2,8 +2,10 @@ import unittest
 from app import create_app
 from app.models import db, Customer, Mechanic, PartDescription, SerializedPart, ServiceTicket
 from marshmallow import ValidationError
+from sqlalchemy import update
 from werkzeug.security import generate_password_hash
 import datetime
+from unittest import mock
 
 class TestSerializedPartDescription(unittest.TestCase):
     
@@ -72,6 +74,50 @@ class TestSerializedPartDescription(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.json['message'], "Successfully created serialized part")
     
+    def test_receive_serialized_parts(self): # Test receiving a delivery in one call returns the id range
+        response = self.client.post('/serialized_parts/receive', json={"desc_id": 1, "quantity": 400})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json['first_id'], response.json['last_id']), (2, 401))
+        self.assertCounters(401, 401)
+
+    def test_receive_serialized_parts_list_of_pairs(self): # Test receiving several lines, as objects or pairs
+        with self.app.app_context():
+            db.session.add(PartDescription(name="Oil Filter", brand="BrandY", price=9.99))
+            db.session.commit()
+        response = self.client.post('/serialized_parts/receive', json=[[2, 3], {"desc_id": 1, "quantity": 2}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['received'], [
+            {"desc_id": 2, "quantity": 3, "first_id": 2, "last_id": 4},
+            {"desc_id": 1, "quantity": 2, "first_id": 5, "last_id": 6}
+        ])
+        response = self.client.get('/serialized_parts/inventory/2')
+        self.assertEqual(response.json['stock'], 3)
+
+    def test_receive_serialized_parts_without_returning(self): # Test ids are read back on databases without RETURNING
+        with self.app.app_context():
+            db.session.add(PartDescription(name="Oil Filter", brand="BrandY", price=9.99))
+            db.session.commit()
+            dialect = db.engine.dialect
+        with mock.patch.object(dialect, 'insert_executemany_returning_sort_by_parameter_order', False):
+            response = self.client.post('/serialized_parts/receive', json=[[1, 2], [2, 3], [1, 1]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['received'], [
+            {"desc_id": 1, "quantity": 2, "first_id": 2, "last_id": 3},
+            {"desc_id": 2, "quantity": 3, "first_id": 4, "last_id": 6},
+            {"desc_id": 1, "quantity": 1, "first_id": 7, "last_id": 7}
+        ])
+        self.assertCounters(4, 4)
+
+    def test_receive_serialized_parts_invalid(self): # Test an unknown description or bad quantity saves nothing
+        response = self.client.post('/serialized_parts/receive', json=[{"desc_id": 1, "quantity": 5}, {"desc_id": 999, "quantity": 1}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json['errors']['1']['desc_id'][0], "Part description not found")
+        response = self.client.post('/serialized_parts/receive', json={"desc_id": 1, "quantity": 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/serialized_parts/receive', json=[])
+        self.assertEqual(response.status_code, 400)
+        self.assertCounters(1, 1)
+
     def test_fields_required(self): # Test required fields are present in the payload
         
         response = self.client.post('/serialized_parts/', json={})
@@ -141,11 +187,181 @@ class TestSerializedPartDescription(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json, list)
     
+    def test_get_inventory_counts_unassigned_only(self): # Test stock excludes parts on tickets and includes empty parts
+        with self.app.app_context():
+            db.session.add(PartDescription(name="Oil Filter", brand="BrandY", price=9.99))
+            db.session.add_all([SerializedPart(desc_id=1), SerializedPart(desc_id=1, ticket_id=1)])
+            db.session.commit()
+        response = self.client.get('/serialized_parts/inventory')
+        self.assertEqual(response.status_code, 200)
+        stock = {item['part_description']['name']: item['stock'] for item in response.json}
+        self.assertEqual(stock, {"Brake Pad": 2, "Oil Filter": 0})
+
+    def test_get_inventory_filters(self): # Test brand/name filters and stock bounds
+        with self.app.app_context():
+            db.session.add(PartDescription(name="Oil Filter", brand="BrandY", price=9.99))
+            db.session.commit()
+        response = self.client.get('/serialized_parts/inventory?brand=brandy')
+        self.assertEqual([item['part_description']['name'] for item in response.json], ["Oil Filter"])
+        response = self.client.get('/serialized_parts/inventory?min_stock=1')
+        self.assertEqual([item['part_description']['name'] for item in response.json], ["Brake Pad"])
+        response = self.client.get('/serialized_parts/inventory?max_stock=0&name=oil')
+        self.assertEqual([item['part_description']['name'] for item in response.json], ["Oil Filter"])
+
+    def test_get_inventory_invalid_stock_bounds(self): # Test malformed stock bounds are rejected instead of ignored
+        for query in ('min_stock=ten', 'max_stock=1.5', 'min_stock='):
+            response = self.client.get(f'/serialized_parts/inventory?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json['message'], "min_stock and max_stock must be integers.")
+
+    def test_get_inventory_paginated(self): # Test page/per_page returns a paginated object
+        with self.app.app_context():
+            db.session.add_all(PartDescription(name=f"Part {i}", brand="BrandZ", price=1) for i in range(4))
+            db.session.commit()
+        response = self.client.get('/serialized_parts/inventory?page=2&per_page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['total'], 5)
+        self.assertEqual(response.json['pages'], 3)
+        self.assertEqual([item['part_description']['id'] for item in response.json['items']], [3, 4])
+
+    def assertCounters(self, available, total): # Counters on part description 1 must match serialized_parts
+        with self.app.app_context():
+            part = db.session.get(PartDescription, 1)
+            self.assertEqual((part.available_count, part.total_count), (available, total))
+
+    def test_stock_counters_follow_part_routes(self): # Test counters through create, assign, add/remove, cart and delete
+        self.assertCounters(1, 1)
+        self.client.post('/serialized_parts/', json={"desc_id": 1})
+        self.client.post('/serialized_parts/', json={"desc_id": 1})
+        self.assertCounters(3, 3)
+        self.client.put('/serialized_parts/1', json={"desc_id": 1, "ticket_id": 1})
+        self.assertCounters(2, 3)
+        self.client.put('/service-tickets/1/remove-part/1')
+        self.assertCounters(3, 3)
+        self.client.put('/service-tickets/1/add-part/2')
+        self.assertCounters(2, 3)
+        self.client.put('/service-tickets/1/add-to-cart/1', json={"quantity": 2})
+        self.assertCounters(0, 3)
+        response = self.client.put('/service-tickets/1/add-to-cart/1')
+        self.assertEqual(response.json['message'], "Only 0 stock(s) available for this part.")
+        self.client.delete('/serialized_parts/3')
+        self.assertCounters(0, 2)
+        self.client.delete('/service-tickets/1')
+        self.assertCounters(2, 2)
+
+    def test_get_inventory_by_parts_id_reads_counter(self): # Test individual stock comes from available_count
+        response = self.client.get('/serialized_parts/inventory/1')
+        self.assertEqual(response.json['stock'], 1)
+        self.assertEqual(response.json['part_description']['available_count'], 1)
+
+    def test_reconcile_stock_command(self): # Test the reconcile command repairs drifted counters
+        with self.app.app_context():
+            db.session.execute(update(PartDescription).values(available_count=7, total_count=0))
+            db.session.commit()
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["reconcile-stock", "--dry-run"])
+        self.assertIn("available 7 -> 1, total 0 -> 1", result.output)
+        self.assertCounters(7, 0)
+        result = runner.invoke(args=["reconcile-stock"])
+        self.assertIn("Repaired 1 part description(s)", result.output)
+        self.assertCounters(1, 1)
+
+    def test_upgrade_db_command(self): # Test upgrading a database created before the new columns and tables
+        legacy = [
+            "CREATE TABLE part_descriptions (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, brand VARCHAR(255) NOT NULL, price NUMERIC(10, 2) NOT NULL)",
+            "CREATE TABLE serialized_parts (id INTEGER PRIMARY KEY, desc_id INTEGER NOT NULL, ticket_id INTEGER)",
+            "INSERT INTO part_descriptions (id, name, brand, price) VALUES (1, 'Brake Pad', 'BrandX', 99.99)",
+            "INSERT INTO serialized_parts (id, desc_id) VALUES (1, 1), (2, 1)",
+        ]
+        with self.app.app_context():
+            db.drop_all()
+            with db.engine.begin() as connection:
+                for statement in legacy:
+                    connection.exec_driver_sql(statement)
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=["upgrade-db"])
+        self.assertIn("Added table mechanic_workloads", result.output)
+        self.assertIn("Added column part_descriptions.updated_at", result.output)
+        self.assertIn("Added column part_descriptions.reorder_point", result.output)
+        self.assertIn("Added index ix_serialized_parts_desc_ticket", result.output)
+        self.assertIn("Recounted stock for 1 part description(s).", result.output)
+        self.assertCounters(2, 2)
+        with self.app.app_context():
+            self.assertIsNotNone(db.session.get(SerializedPart, 1).updated_at)
+        result = runner.invoke(args=["upgrade-db"])
+        self.assertIn("Schema up to date (0 change(s)).", result.output)
+
+    def test_search_serialized_parts(self): # Test searching serialized parts through their description
+        self.client.put('/serialized_parts/1', json={"desc_id": 1, "ticket_id": 1})
+        self.client.post('/serialized_parts/', json={"desc_id": 1})
+        response = self.client.get('/serialized_parts/search', query_string={"name": "brake"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json], [1, 2])
+        self.assertEqual(response.json[0]['ticket']['id'], 1)
+        response = self.client.get('/serialized_parts/search', query_string={"q": "brandx", "in_stock": "true", "per_page": 5})
+        self.assertEqual([item['id'] for item in response.json['items']], [2])
+        response = self.client.get('/serialized_parts/search')
+        self.assertEqual(response.status_code, 400)
+
+    def add_consumed_parts(self, quantity): # Put units of part 1 on ticket 1 (serviced 2025-03-21)
+        with self.app.app_context():
+            db.session.add_all(SerializedPart(desc_id=1, ticket_id=1) for _ in range(quantity))
+            db.session.commit()
+
+    def test_reorder_report(self): # Test reorder suggestions from consumption over the window
+        self.add_consumed_parts(9)
+        response = self.client.get('/serialized_parts/reorder', query_string={"as_of": "2025-03-31", "window_days": 30, "lead_days": 14})
+        self.assertEqual(response.status_code, 200)
+        item = response.json['items'][0]
+        self.assertEqual((item['consumed'], item['daily_rate'], item['available']), (9, 0.3, 1))
+        self.assertEqual((item['threshold'], item['suggested_quantity'], item['days_of_cover']), (5, 9, 3.3))
+        self.assertTrue(item['reorder'])
+
+    def test_reorder_report_thresholds(self): # Test per-part reorder point and lead time
+        self.add_consumed_parts(9)
+        query = {"as_of": "2025-06-30", "window_days": 30}
+        self.assertEqual(self.client.get('/serialized_parts/reorder', query_string=query).json['items'], [])
+        self.assertEqual(len(self.client.get('/serialized_parts/reorder', query_string={**query, "all": "true"}).json['items']), 1)
+        self.client.put('/part_descriptions/1', json={"name": "Brake Pad", "brand": "BrandX", "price": 99.99, "reorder_point": 2})
+        item = self.client.get('/serialized_parts/reorder', query_string=query).json['items'][0]
+        self.assertEqual((item['threshold'], item['suggested_quantity']), (2, 1))
+        self.client.put('/part_descriptions/1', json={"name": "Brake Pad", "brand": "BrandX", "price": 99.99, "lead_time_days": 30})
+        item = self.client.get('/serialized_parts/reorder', query_string={"as_of": "2025-03-31", "window_days": 30}).json['items'][0]
+        self.assertEqual((item['lead_time_days'], item['threshold']), (30, 9))
+
+    def test_reorder_report_invalid_params(self): # Test reorder report parameter validation
+        self.assertEqual(self.client.get('/serialized_parts/reorder?as_of=03-31-2025').status_code, 400)
+        self.assertEqual(self.client.get('/serialized_parts/reorder?window_days=0').status_code, 400)
+
+    def test_stock_valuation(self): # Test stock value by part and by brand
+        self.client.post('/serialized_parts/receive', json=[{"desc_id": 1, "quantity": 2}])
+        self.add_consumed_parts(4)
+        response = self.client.get('/serialized_parts/valuation')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json['units'], response.json['total']), (3, "299.97"))
+        self.assertEqual(response.json['items'][0]['unit_price'], "99.99")
+        response = self.client.get('/serialized_parts/valuation?group_by=brand')
+        self.assertEqual(response.json['items'], [{"brand": "BrandX", "units": 3, "value": "299.97"}])
+        self.assertEqual(self.client.get('/serialized_parts/valuation?group_by=mechanic').status_code, 400)
+
+    def test_consumption_value(self): # Test consumed parts value per month of service date
+        self.add_consumed_parts(4)
+        response = self.client.get('/serialized_parts/consumption-value', query_string={"start_date": "2025-03-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['items'], [{"month": "2025-03", "units": 4, "value": "399.96"}])
+        response = self.client.get('/serialized_parts/consumption-value', query_string={"end_date": "2025-02-28"})
+        self.assertEqual((response.json['units'], response.json['total']), (0, "0.00"))
+        self.assertEqual(self.client.get('/serialized_parts/consumption-value?start_date=03-01-2025').status_code, 400)
+
     def test_get_inventory_by_parts_id(self):
         response = self.client.get('/serialized_parts/inventory/1')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['part_description']['id'], 1)
         
+    def test_get_inventory_by_parts_id_rate_limited_when_cached(self): # Test cache hits still count towards the rate limit
+        statuses = [self.client.get('/serialized_parts/inventory/1').status_code for _ in range(11)]
+        self.assertEqual(statuses, [200] * 10 + [429])
+
     def test_get_inventory_by_invalid_parts_id(self):
         response = self.client.get('/serialized_parts/inventory/999')
         self.assertEqual(response.status_code, 404)
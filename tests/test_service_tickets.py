@@ -1,9 +1,14 @@
 import unittest
 from app import create_app
-from app.models import db, Customer, Mechanic, PartDescription, SerializedPart, ServiceTicket
+from app.models import db, Customer, Mechanic, MechanicWorkload, PartDescription, SerializedPart, ServiceTicket, adjust_workload
+from app.utils.workload import workload_counts
+from app.utils.assignment import pick_mechanic, pick_mechanics
 from marshmallow import ValidationError
 from werkzeug.security import generate_password_hash
+from sqlalchemy import event
+from unittest import mock
 import datetime
+import json
 
 class TestServiceTicket(unittest.TestCase):
     
@@ -106,6 +111,53 @@ class TestServiceTicket(unittest.TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.json['id'], 2)
         
+    def test_create_service_tickets_bulk(self): # Test bulk create service tickets in one call
+        payLoad = []
+        for i in range(3):
+            ticket = self.payLoad.copy()
+            ticket["mechanic_ids"] = [1, 2]
+            payLoad.append(ticket)
+        response = self.client.post('/service-tickets/bulk', json=payLoad)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['ids'], [2, 3, 4])
+        response = self.client.get('/service-tickets/4')
+        self.assertEqual(len(response.json['mechanics']), 2)
+
+    def test_create_service_tickets_bulk_invalid_items(self): # Test bulk create reports errors per item and saves nothing
+        valid = self.payLoad.copy()
+        invalid_customer = self.payLoad.copy()
+        invalid_customer["customer_id"] = 999
+        invalid_mechanic = self.payLoad.copy()
+        invalid_mechanic["mechanic_ids"] = [1, 999]
+        response = self.client.post('/service-tickets/bulk', json=[valid, invalid_customer, invalid_mechanic])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['errors']['1']['customer_id'][0], "Invalid customer id")
+        self.assertEqual(response.json['errors']['2']['mechanic_ids'][0], "Invalid mechanic id 999")
+        self.assertNotIn('0', response.json['errors'])
+        response = self.client.get('/service-tickets/2')
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_service_tickets_bulk_auto_assign(self): # Test bulk auto assign spreads picks and skips each ticket's own mechanics
+        payLoad = [
+            {**self.payLoad, "service_date": "2025-03-21", "mechanic_ids": [1]},
+            {**self.payLoad, "service_date": "2025-03-21", "mechanic_ids": [1], "auto_assign": True},
+            {**self.payLoad, "service_date": "2025-03-21", "auto_assign": True},
+            {**self.payLoad, "service_date": "2025-03-21", "auto_assign": True},
+        ]
+        response = self.client.post('/service-tickets/bulk', json=payLoad)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(m['id'] for m in self.client.get('/service-tickets/3').json['mechanics']), [1, 2])
+        self.assertEqual([m['id'] for m in self.client.get('/service-tickets/4').json['mechanics']], [2])
+        self.assertEqual([m['id'] for m in self.client.get('/service-tickets/5').json['mechanics']], [1])
+        self.assertWorkload({(1, "2025-03-21"): 3, (2, "2025-03-21"): 2})
+
+    def test_create_service_tickets_bulk_auto_assign_unavailable(self): # Test bulk auto assign with no free mechanic saves nothing
+        payLoad = [{**self.payLoad, "mechanic_ids": [1, 2], "auto_assign": True}]
+        response = self.client.post('/service-tickets/bulk', json=payLoad)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "No mechanic available to assign.")
+        self.assertEqual(self.client.get('/service-tickets/2').status_code, 404)
+
     def test_fields_required(self): # Test required fields are present in the payload
         
         for field in list(self.payLoad.keys()):
@@ -120,11 +172,171 @@ class TestServiceTicket(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json['tickets'], list)
     
+    def test_get_all_service_tickets_query_count(self): # Test a page of tickets is loaded in a fixed number of queries
+        with self.app.app_context():
+            for i in range(20):
+                ticket = ServiceTicket(
+                    customer_id=1,
+                    vin=f"VIN{i}",
+                    service_date=datetime.date.fromisoformat("2025-03-22"),
+                    service_desc="Bulk ticket"
+                )
+                ticket.mechanics.append(db.session.get(Mechanic, 1 + i % 2))
+                db.session.add(ticket)
+            db.session.commit()
+            statements = []
+            event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        response = self.client.get('/service-tickets/', query_string={'page': 1, 'per_page': 25})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['tickets']), 21)
+        self.assertEqual(response.json['tickets'][1]['customer']['id'], 1)
+        self.assertLessEqual(len(statements), 5)
+
+    def test_get_service_tickets_with_cursor(self): # Test walking service tickets with keyset pagination
+        for i in range(4):
+            payLoad = self.payLoad.copy()
+            payLoad["service_date"] = f"2025-03-1{i}"
+            self.client.post('/service-tickets/', json=payLoad)
+        seen = []
+        response = self.client.get('/service-tickets/', query_string={'cursor': '', 'per_page': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('total', response.json)
+            seen.extend(ticket['id'] for ticket in response.json['tickets'])
+            if not response.json['next_cursor']:
+                break
+            response = self.client.get('/service-tickets/', query_string={'cursor': response.json['next_cursor'], 'per_page': 2})
+        self.assertEqual(seen, [2, 3, 4, 5, 1])
+
+        response = self.client.get('/service-tickets/', query_string={'after_id': 4, 'per_page': 10})
+        self.assertEqual([ticket['id'] for ticket in response.json['tickets']], [5, 1])
+
+    def test_get_service_tickets_with_invalid_cursor(self): # Test keyset pagination with a malformed cursor
+        response = self.client.get('/service-tickets/', query_string={'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Invalid cursor.")
+
+    def test_get_service_tickets_sparse_fields(self): # Test retrieve service tickets with only some fields
+        response = self.client.get('/service-tickets/', query_string={'fields': 'id,vin,service_date'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['tickets'][0], {"id": 1, "vin": "CMD12456", "service_date": "2025-03-21"})
+        
+        response = self.client.get('/service-tickets/1', query_string={'fields': 'id', 'include': 'customer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json.keys()), {"id", "customer"})
+        self.assertEqual(response.json['customer']['id'], 1)
+        
+    def test_get_service_tickets_sparse_fields_invalid(self): # Test retrieve service tickets with unknown fields
+        response = self.client.get('/service-tickets/', query_string={'fields': 'id,password', 'include': 'mechanics'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Unknown field(s): password")
+
+    def test_export_service_tickets(self): # Test streaming service tickets as NDJSON
+        payLoad = self.payLoad.copy()
+        payLoad["service_date"] = "2025-04-01"
+        self.client.post('/service-tickets/', json=payLoad)
+        
+        response = self.client.get('/service-tickets/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([ticket['id'] for ticket in lines], [1, 2])
+        self.assertEqual(lines[0]['customer']['id'], 1)
+        
+        response = self.client.get('/service-tickets/export', query_string={'start_date': '2025-03-25', 'customer_id': 1, 'fields': 'id'})
+        self.assertEqual([json.loads(line) for line in response.get_data(as_text=True).splitlines()], [{"id": 2}])
+        
+    def test_export_service_tickets_invalid_date(self): # Test exporting service tickets with an invalid date filter
+        response = self.client.get('/service-tickets/export', query_string={'start_date': '03/25/2025'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Dates must use the YYYY-MM-DD format.")
+
+    def test_export_service_tickets_invalid_customer(self): # Test a malformed customer_id is rejected instead of exporting everything
+        for value in ('abc', ''):
+            response = self.client.get('/service-tickets/export', query_string={'customer_id': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json['message'], "customer_id must be an integer.")
+
+    def test_get_service_ticket_invoice(self): # Test retrieve service ticket invoice with SQL totals
+        self.client.put('/service-tickets/1/add-to-cart/1', json={'quantity': 2})
+        response = self.client.get('/service-tickets/1/invoice')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['parts_count'], 2)
+        self.assertEqual(response.json['total'], "199.98")
+        self.assertEqual(response.json['items'][0]['name'], "Brake Pad")
+        self.assertEqual(response.json['items'][0]['quantity'], 2)
+        
+        response = self.client.get('/service-tickets/999/invoice')
+        self.assertEqual(response.status_code, 404)
+        
+    def test_get_all_service_tickets_with_totals(self): # Test retrieve service tickets with parts totals
+        self.client.put('/service-tickets/1/add-part/1')
+        self.client.post('/service-tickets/', json=self.payLoad)
+        response = self.client.get('/service-tickets/', query_string={'with_totals': 'true', 'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['tickets'][0], {"id": 1, "parts_count": 1, "parts_total": "99.99"})
+        self.assertEqual(response.json['tickets'][1]['parts_count'], 0)
+
+    def test_get_service_tickets_with_totals_without_id(self): # Totals work when `fields` leaves out id
+        self.client.put('/service-tickets/1/add-part/1')
+        response = self.client.get('/service-tickets/', query_string={'with_totals': 'true', 'fields': 'vin'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['tickets'][0], {"vin": "CMD12456", "parts_count": 1, "parts_total": "99.99"})
+        response = self.client.get('/service-tickets/', query_string={'with_totals': 'true', 'fields': 'vin', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['tickets'][0]['parts_count'], 1)
+
     def test_get_service_ticket_by_id(self): # Test retrieve service ticket by ID
         response = self.client.get('/service-tickets/1')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['id'], 1)
         
+    def test_get_service_ticket_not_modified(self): # Test conditional GET on a service ticket
+        response = self.client.get('/service-tickets/1')
+        etag = response.headers['ETag']
+        response = self.client.get('/service-tickets/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        
+        self.client.put('/service-tickets/1/add-mechanic/1')
+        response = self.client.get('/service-tickets/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['mechanics'][0]['id'], 1)
+        
+    def test_get_service_ticket_etag_scoped_to_ticket(self): # Test the detail ETag ignores writes to rows the ticket doesn't embed
+        self.client.post('/service-tickets/', json=self.payLoad)
+        self.client.put('/service-tickets/1/add-mechanic/1')
+        etag = self.client.get('/service-tickets/1').headers['ETag']
+        self.client.put('/service-tickets/2/add-part/1')
+        self.client.put('/service-tickets/2/add-mechanic/2')
+        response = self.client.get('/service-tickets/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        with self.app.app_context():
+            db.session.get(Mechanic, 1).name = "Mike Renamed"
+            db.session.commit()
+        response = self.client.get('/service-tickets/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['mechanics'][0]['name'], "Mike Renamed")
+
+    def test_get_all_service_tickets_not_modified(self): # Test conditional GET on the service ticket list
+        response = self.client.get('/service-tickets/')
+        etag = response.headers['ETag']
+        response = self.client.get('/service-tickets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        
+        self.client.put('/service-tickets/1/edit-mechanics', json={"add_mechanic_ids": [2]})
+        response = self.client.get('/service-tickets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_all_service_tickets_etag_skipped_for_cursor(self): # Test cursor pages carry no ETag and deletes move the list ETag
+        response = self.client.get('/service-tickets/?cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+        etag = self.client.get('/service-tickets/').headers['ETag']
+        self.assertEqual(self.client.delete('/service-tickets/1').status_code, 200)
+        response = self.client.get('/service-tickets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
     def test_get_invalid_service_ticket_by_id(self): # Test retrieve service ticket does not exist
         response = self.client.get('/service-tickets/9999')
         self.assertEqual(response.status_code, 404)
@@ -155,6 +367,128 @@ class TestServiceTicket(unittest.TestCase):
             self.assertEqual(response.status_code, 400)
             self.assertEqual(response.json['status'], "error")
             
+    def test_service_ticket_edit_mechanics_add_and_remove(self): # Test adding and removing mechanics in one edit
+        response = self.client.put('/service-tickets/1/edit-mechanics', json={"add_mechanic_ids": [1, 2]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(m['id'] for m in response.json['mechanics']), [1, 2])
+        
+        response = self.client.put('/service-tickets/1/edit-mechanics', json={"remove_mechanic_ids": [1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.json['mechanics']], [2])
+        
+        response = self.client.put('/service-tickets/1/edit-mechanics', json={"add_mechanic_ids": [2]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "The mechanic 2 already exists in this ticket.")
+
+    def test_update_service_ticket_with_mechanics(self): # Test updating a service ticket and adding mechanics
+        payLoad = self.payLoad.copy()
+        payLoad["mechanic_ids"] = [1, 2]
+        response = self.client.put('/service-tickets/1', json=payLoad)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(m['id'] for m in response.json['mechanics']), [1, 2])
+        
+        payLoad["mechanic_ids"] = [999]
+        response = self.client.put('/service-tickets/1', json=payLoad)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Invalid mechanic id")
+
+    def assertWorkload(self, expected): # Rollups match both the expected counts and a recount of service_mechanic
+        with self.app.app_context():
+            rollups = {
+                (row.mechanic_id, row.service_date.isoformat()): row.ticket_count
+                for row in db.session.execute(db.select(MechanicWorkload)).scalars() if row.ticket_count
+            }
+            recount = {(row[0], row[1].isoformat()): row[2] for row in db.session.execute(workload_counts())}
+        self.assertEqual(rollups, expected)
+        self.assertEqual(recount, expected)
+
+    def test_mechanic_workload_rollups(self): # Test every assignment route keeps the workload rollups in step
+        payLoad = {**self.payLoad, "mechanic_ids": [1, 2]}
+        self.assertEqual(self.client.post('/service-tickets/', json=payLoad).status_code, 201)
+        self.assertWorkload({(1, "2025-03-20"): 1, (2, "2025-03-20"): 1})
+        self.client.put('/service-tickets/1/edit-mechanics', json={"add_mechanic_ids": [1]})
+        self.assertWorkload({(1, "2025-03-20"): 1, (2, "2025-03-20"): 1, (1, "2025-03-21"): 1})
+        # Moving ticket 1 to the 20th moves mechanic 1 with it and adds mechanic 2 there
+        self.client.put('/service-tickets/1', json={**self.payLoad, "mechanic_ids": [2]})
+        self.assertWorkload({(1, "2025-03-20"): 2, (2, "2025-03-20"): 2})
+        self.client.put('/service-tickets/1/remove-mechanic/1')
+        self.assertWorkload({(1, "2025-03-20"): 1, (2, "2025-03-20"): 2})
+        self.client.put('/service-tickets/1/add-mechanic/1')
+        self.assertWorkload({(1, "2025-03-20"): 2, (2, "2025-03-20"): 2})
+        self.client.delete('/service-tickets/2')
+        self.assertWorkload({(1, "2025-03-20"): 1, (2, "2025-03-20"): 1})
+
+    def test_create_service_ticket_auto_assign(self): # Test auto assign picks the least-loaded mechanic for the day
+        payLoad = {**self.payLoad, "auto_assign": True}
+        picked = [self.client.post('/service-tickets/', json=payLoad).json['mechanics'][0]['id'] for _ in range(2)]
+        self.assertEqual(picked, [1, 2])
+        response = self.client.post('/service-tickets/', json={**payLoad, "mechanic_ids": [1]})
+        self.assertEqual(sorted(m['id'] for m in response.json['mechanics']), [1, 2])
+        response = self.client.put('/service-tickets/4/edit-mechanics', json={"auto_assign": True})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "No mechanic available to assign.")
+
+    def test_auto_assign_mechanic_to_ticket(self): # Test auto assigning mechanics to an existing ticket
+        response = self.client.put('/service-tickets/1/edit-mechanics', json={"auto_assign": True})
+        self.assertEqual([m['id'] for m in response.json['mechanics']], [1])
+        response = self.client.put('/service-tickets/1/auto-assign')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(m['id'] for m in response.json['service_ticket']['mechanics']), [1, 2])
+        self.assertEqual(self.client.put('/service-tickets/1/auto-assign').status_code, 400)
+        self.assertEqual(self.client.put('/service-tickets/99/auto-assign').status_code, 404)
+        self.assertWorkload({(1, "2025-03-21"): 1, (2, "2025-03-21"): 1})
+
+    def test_auto_assign_day(self): # Test batch assigning every unassigned ticket of a day
+        self.client.post('/service-tickets/', json={**self.payLoad, "service_date": "2025-03-21", "mechanic_ids": [1]})
+        self.client.post('/service-tickets/bulk', json=[{**self.payLoad, "service_date": "2025-03-21"}] * 3)
+        response = self.client.post('/service-tickets/auto-assign', json={"service_date": "2025-03-21"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['ticket_id'], row['mechanic_id']) for row in response.json['assignments']],
+            [(1, 2), (3, 1), (4, 2), (5, 1)]
+        )
+        self.assertWorkload({(1, "2025-03-21"): 3, (2, "2025-03-21"): 2})
+        response = self.client.post('/service-tickets/auto-assign', json={"service_date": "2025-03-21"})
+        self.assertEqual(response.json['assignments'], [])
+        self.assertEqual(self.client.post('/service-tickets/auto-assign', json={}).status_code, 400)
+
+    def test_auto_assign_reads_committed_loads(self): # Test picks follow the rollups, including rows written elsewhere
+        service_date = datetime.date(2025, 3, 21)
+        with self.app.app_context():
+            self.assertEqual(pick_mechanic(service_date), 1)
+            db.session.add(MechanicWorkload(mechanic_id=1, service_date=service_date, ticket_count=2))
+            db.session.commit()
+            self.assertEqual(pick_mechanic(service_date), 2)
+            self.assertEqual(pick_mechanic(service_date, exclude={2}), 1)
+            self.assertEqual(pick_mechanic(service_date, exclude={1, 2}), None)
+            self.assertEqual(pick_mechanics(service_date, 4), [2, 2, 1, 2])
+            self.assertEqual(pick_mechanics(service_date, 3, exclude=[{2}, {1, 2}]), [1, None, 2])
+
+    def test_adjust_workload_without_upsert(self): # Test the update-then-insert fallback, including a bucket created in between
+        service_date = datetime.date(2025, 3, 22)
+        with self.app.app_context():
+            dialect = db.engine.dialect
+            with mock.patch.object(dialect, "name", "oracle"):
+                adjust_workload(1, service_date, 1)
+
+                raced = []
+
+                def create_bucket(conn, cursor, statement, parameters, context, executemany):
+                    # Another transaction creates mechanic 2's bucket right after our UPDATE missed it.
+                    if statement.startswith("UPDATE mechanic_workloads") and not cursor.rowcount and not raced:
+                        raced.append(True)
+                        conn.connection.cursor().execute("INSERT INTO mechanic_workloads (mechanic_id, service_date, ticket_count) VALUES (2, ?, 1)", (service_date.isoformat(),))
+                event.listen(db.engine, "after_cursor_execute", create_bucket)
+                try:
+                    adjust_workload(2, service_date, 1)
+                finally:
+                    event.remove(db.engine, "after_cursor_execute", create_bucket)
+                self.assertEqual(raced, [True])
+                adjust_workload(1, service_date, 2)
+            db.session.commit()
+            counts = {row.mechanic_id: row.ticket_count for row in db.session.execute(db.select(MechanicWorkload).where(MechanicWorkload.service_date == service_date)).scalars()}
+        self.assertEqual(counts, {1: 3, 2: 2})
+
     def test_update_service_ticket_details(self): # Test editing  a service ticket details
       
         response = self.client.put('/service-tickets/99/edit-mechanics', json={})
@@ -286,6 +620,22 @@ class TestServiceTicket(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json['message'], "Only 2 stock(s) available for this part.")    
     
+    def test_edit_service_ticket_add_to_cart_all_stock(self): # Test reserving all stock then running out
+        
+        response = self.client.put('/service-tickets/1/add-to-cart/1', json={'quantity': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['service_ticket']['ticket_items']), 2)
+        
+        response = self.client.put('/service-tickets/1/add-to-cart/1')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Only 0 stock(s) available for this part.")
+    
+    def test_edit_service_ticket_add_to_cart_invalid_quantity(self): # Test add parts descriptions to cart with invalid quantity
+        
+        response = self.client.put('/service-tickets/1/add-to-cart/1', json={'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], "Quantity must be a positive integer.")
+    
     def test_edit_service_ticket_add_to_cart_invalid_ticket_id(self): # Test add parts descriptions to cart with invalid ticket id
         
         response = self.client.put('/service-tickets/9999/add-to-cart/1')
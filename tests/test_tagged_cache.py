@@ -0,0 +1,56 @@
+import unittest
+from app import create_app
+from app.models import db, Customer, PartDescription, SerializedPart, ServiceTicket
+from sqlalchemy import update
+import datetime
+
+class TestTaggedCache(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        with self.app.app_context():
+            db.drop_all() # Drop all tables before creating new ones
+            db.create_all() # Create all tables
+
+            db.session.add(Customer(name="Fred Tuazon", email="ft@email.com", phone="1234567890", password="x"))
+            db.session.add(PartDescription(name="Brake Pad", brand="BrandX", price=99.99))
+            db.session.flush()
+            db.session.add(SerializedPart(desc_id=1))
+            db.session.add(ServiceTicket(customer_id=1, vin="VIN1", service_date=datetime.date(2025, 3, 21), service_desc="Cache ticket"))
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def write_behind_session(self, statement): # Write straight to the database, invisible to the session hooks
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(statement)
+
+    def test_cached_until_orm_write(self): # Test stock is served from cache until a committed ORM write
+        self.assertEqual(self.client.get('/serialized_parts/inventory/1').json['stock'], 1)
+        self.write_behind_session(update(PartDescription).values(available_count=50))
+        self.assertEqual(self.client.get('/serialized_parts/inventory/1').json['stock'], 1)
+        self.client.post('/serialized_parts/', json={"desc_id": 1})
+        self.assertEqual(self.client.get('/serialized_parts/inventory/1').json['stock'], 51)
+
+    def test_invalidated_by_core_write(self): # Test bulk reservations invalidate the inventory list
+        self.assertEqual(self.client.get('/serialized_parts/inventory').json[0]['stock'], 1)
+        self.client.put('/service-tickets/1/add-to-cart/1')
+        self.assertEqual(self.client.get('/serialized_parts/inventory').json[0]['stock'], 0)
+
+    def test_invalidated_by_part_description_update(self): # Test updating a description invalidates its cached read
+        self.assertEqual(self.client.get('/part_descriptions/1').json['name'], "Brake Pad")
+        self.client.put('/part_descriptions/1', json={"name": "Brake Rotor", "brand": "BrandX", "price": 99.99})
+        self.assertEqual(self.client.get('/part_descriptions/1').json['name'], "Brake Rotor")
+
+    def test_query_string_and_errors(self): # Test pages are cached separately and 404s are not cached
+        first = self.client.get('/serialized_parts/?page=1&per_page=1').json
+        second = self.client.get('/serialized_parts/?page=1&per_page=2').json
+        self.assertEqual((first['per_page'], second['per_page']), (1, 2))
+        self.assertEqual(self.client.get('/part_descriptions/2').status_code, 404)
+        self.client.post('/part_descriptions/', json={"name": "Oil Filter", "brand": "BrandY", "price": 9.99})
+        self.assertEqual(self.client.get('/part_descriptions/2').status_code, 200)
+
+    def test_conditional_request_bypasses_cache(self): # Test If-None-Match still gets a 304 with caching on
+        response = self.client.get('/serialized_parts/inventory/1')
+        response = self.client.get('/serialized_parts/inventory/1', headers={"If-None-Match": response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)